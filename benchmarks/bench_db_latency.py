@@ -0,0 +1,78 @@
+"""
+Latence des handlers sous charge : pymongo appelé directement sur la boucle d'événements
+contre la couche core.database (pool de threads borné).
+
+Les updates arrivent à débit constant (UPDATES_PER_SECOND) ; la latence d'un handler est
+mesurée depuis l'arrivée de son update jusqu'à sa réponse, attente de la boucle comprise.
+La base est simulée : chaque requête bloque le thread appelant pendant QUERY_LATENCY,
+et une requête sur SLOW_EVERY dure SLOW_LATENCY (scan non indexé, réseau lent...).
+
+Usage : python -m benchmarks.bench_db_latency [nombre_d_updates]
+"""
+import sys
+import time
+import asyncio
+import statistics
+
+from core.database import AsyncCollection
+
+QUERY_LATENCY = 0.002
+SLOW_LATENCY = 0.2
+SLOW_EVERY = 50
+UPDATES_PER_SECOND = 200
+
+
+class BlockingCollection:
+    """Imite une collection pymongo : chaque appel bloque le thread courant"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def find_one(self, query):
+        self.calls += 1
+        time.sleep(SLOW_LATENCY if self.calls % SLOW_EVERY == 0 else QUERY_LATENCY)
+        return {"telegram_id": query["telegram_id"], "trophies": 0}
+
+
+async def blocking_handler(collection, telegram_id):
+    return collection.find_one({"telegram_id": telegram_id})
+
+
+async def async_handler(collection, telegram_id):
+    return await collection.find_one({"telegram_id": telegram_id})
+
+
+async def run(handler, collection, n_updates):
+    latencies = []
+    start = time.perf_counter()
+
+    async def timed(telegram_id, arrival):
+        await handler(collection, telegram_id)
+        latencies.append(time.perf_counter() - arrival)
+
+    tasks = []
+    for i in range(n_updates):
+        arrival = start + i / UPDATES_PER_SECOND
+        await asyncio.sleep(max(arrival - time.perf_counter(), 0))
+        tasks.append(asyncio.create_task(timed(i, arrival)))
+    await asyncio.gather(*tasks)
+    return latencies, time.perf_counter() - start
+
+
+def report(label, latencies, elapsed):
+    latencies.sort()
+    p50 = statistics.median(latencies) * 1000
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+    print(f"{label:<22} p50={p50:8.1f} ms  p99={p99:8.1f} ms  total={elapsed:6.2f} s")
+
+
+async def main(n_updates):
+    print(f"{n_updates} updates à {UPDATES_PER_SECOND}/s, 1 requête lente sur {SLOW_EVERY}")
+    latencies, elapsed = await run(blocking_handler, BlockingCollection(), n_updates)
+    report("pymongo direct", latencies, elapsed)
+    latencies, elapsed = await run(async_handler, AsyncCollection(BlockingCollection()), n_updates)
+    report("core.database", latencies, elapsed)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000))
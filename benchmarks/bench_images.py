@@ -0,0 +1,72 @@
+"""
+Prétraitement des photos avant Cloudinary (utils/image_processor.py) : octets économisés et temps par image.
+
+Sans argument, les images sont générées : photo de profil et logo au format des photos Telegram
+(1280 px, JPEG qualité 87 avec EXIF) et capture de jeu en 2560 x 1440. On peut aussi passer
+de vraies images : chacune est traitée pour les trois usages.
+
+Usage : python -m benchmarks.bench_images [--repeat N] [fichier ...]
+"""
+import io
+import sys
+import time
+
+from PIL import Image, ImageDraw
+
+from utils.image_processor import IMAGE_SPECS, process_image
+
+
+def sample_image(size, quality=87):
+    """Dégradé, formes et bruit : se compresse comme une photo réelle, pas comme un aplat"""
+    width, height = size
+    image = Image.linear_gradient("L").resize(size).convert("RGB")
+    draw = ImageDraw.Draw(image)
+    for i in range(0, width, max(width // 12, 1)):
+        draw.ellipse([i, height // 4, i + width // 10, height // 4 + width // 10], fill=(i % 255, 80, 200))
+        draw.rectangle([i, height * 2 // 3, i + width // 20, height - 10], fill=(240, 190, i % 255))
+    noise = Image.effect_noise(size, 24).convert("RGB")
+    image = Image.blend(image, noise, 0.25)
+    exif = Image.Exif()
+    exif[0x010F] = "Telephone"  # Make
+    exif[0x0132] = "2024:01:01 12:00:00"  # DateTime
+    output = io.BytesIO()
+    image.save(output, "JPEG", quality=quality, exif=exif.tobytes())
+    return output.getvalue()
+
+
+def samples(paths):
+    if paths:
+        for path in paths:
+            with open(path, "rb") as f:
+                data = f.read()
+            for use_case in IMAGE_SPECS:
+                yield f"{path} ({use_case})", use_case, data
+        return
+    yield "profil 1280x1280", "profile", sample_image((1280, 1280))
+    yield "logo 1280x1280", "logo", sample_image((1280, 1280))
+    yield "capture 2560x1440", "screenshot", sample_image((2560, 1440))
+
+
+def run(paths, repeat):
+    print(f"{'image':<28} {'avant':>10} {'après':>10} {'économie':>9} {'temps':>10}")
+    total_in = total_out = 0
+    for label, use_case, data in samples(paths):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            output = process_image(data, use_case)
+        elapsed = (time.perf_counter() - start) / repeat
+        total_in += len(data)
+        total_out += len(output)
+        print(f"{label:<28} {len(data):>10} {len(output):>10} {1 - len(output) / len(data):>8.1%} "
+              f"{elapsed * 1e3:>7.1f} ms")
+    print(f"{'total':<28} {total_in:>10} {total_out:>10} {1 - total_out / total_in:>8.1%}")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    repeat = 5
+    if "--repeat" in args:
+        i = args.index("--repeat")
+        repeat = int(args[i + 1])
+        del args[i:i + 2]
+    run(args, repeat)
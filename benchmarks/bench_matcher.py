@@ -0,0 +1,85 @@
+"""
+Appariement de joueurs en file : utils.matcher.MatchQueue contre un parcours linéaire de la file.
+
+N salles en recherche (modes et trophées aléatoires, attentes de 0 à 30 min) sont mises en file,
+puis N joueurs cherchent chacun l'adversaire acceptable le plus proche ; chaque salle trouvée
+est retirée de la file. Le parcours linéaire n'est mesuré que sur LINEAR_SAMPLE joueurs.
+
+Usage : python -m benchmarks.bench_matcher [nombre_de_joueurs]
+"""
+import sys
+import time
+import random
+from datetime import datetime
+
+from utils.matcher import MatchQueue, match_window
+
+# Modes proposés par /findmatch (handlers/matchmaking.py)
+MODES = ["1v1", "2v2", "3v3"]
+MAX_TROPHIES = 60000
+MAX_WAIT = 1800
+LINEAR_SAMPLE = 500
+
+
+def make_lobbies(n, now):
+    rng = random.Random(42)
+    return [
+        (str(i), rng.choice(MODES), rng.randint(0, MAX_TROPHIES), i, now - rng.uniform(0, MAX_WAIT))
+        for i in range(n)
+    ]
+
+
+def make_joiners(n):
+    rng = random.Random(7)
+    return [(rng.choice(MODES), rng.randint(0, MAX_TROPHIES), -1 - i) for i in range(n)]
+
+
+def linear_find(lobbies, mode, trophies, exclude, now):
+    best = None
+    for match_id, lobby_mode, lobby_trophies, telegram_id, since in lobbies.values():
+        gap = abs(lobby_trophies - trophies)
+        if lobby_mode != mode or telegram_id == exclude or gap > match_window(now - since):
+            continue
+        if best is None or (gap, since) < best[:2]:
+            best = (gap, since, match_id)
+    return best[2] if best else None
+
+
+def main(n):
+    now = datetime.utcnow()
+    ts = now.timestamp()
+    lobbies = make_lobbies(n, ts)
+    joiners = make_joiners(n)
+    print(f"{n} salles en file, {n} joueurs à apparier, {len(MODES)} modes")
+
+    queue = MatchQueue()
+    start = time.perf_counter()
+    for match_id, mode, trophies, telegram_id, since in lobbies:
+        queue.enqueue(match_id, mode, trophies, telegram_id, since)
+    enqueue_time = time.perf_counter() - start
+
+    paired = 0
+    start = time.perf_counter()
+    for mode, trophies, telegram_id in joiners:
+        match_id = queue.find_opponent(mode, trophies, exclude=telegram_id, now=now)
+        if match_id:
+            queue.remove(match_id)
+            paired += 1
+    pair_time = time.perf_counter() - start
+    print(f"{'MatchQueue':<16} mise en file={enqueue_time:6.2f} s  appariement={pair_time:6.2f} s  "
+          f"({pair_time / n * 1e6:6.1f} µs/joueur, {paired} paires)")
+
+    pending = {lobby[0]: lobby for lobby in lobbies}
+    sample = joiners[:LINEAR_SAMPLE]
+    start = time.perf_counter()
+    for mode, trophies, telegram_id in sample:
+        match_id = linear_find(pending, mode, trophies, telegram_id, ts)
+        if match_id:
+            del pending[match_id]
+    linear_time = (time.perf_counter() - start) / len(sample)
+    print(f"{'parcours linéaire':<16} {linear_time * 1e6:10.1f} µs/joueur "
+          f"(≈ {linear_time * n:6.1f} s estimés pour {n} joueurs)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,104 @@
+"""
+Taille des documents joueurs lus par les commandes : document complet contre projections nommées
+(models.players.Player.PROJECTIONS).
+
+Le joueur type porte ce que la collection accumule avec le temps : liste de brawlers, photo,
+clés de résultats appliqués (utils/match_results.py), préférences de notifications...
+Pour chaque vue, on mesure la taille BSON transférée et le temps de décodage côté bot.
+
+Avec --live, les lectures sont aussi chronométrées sur la base configurée (MONGO_URI, DB_NAME),
+dans une collection temporaire bench_players supprimée à la fin.
+
+Usage : python -m benchmarks.bench_projections [--live] [nombre_de_lectures]
+"""
+import sys
+import time
+import random
+from datetime import datetime
+
+import bson
+
+from models.players import Player
+
+BRAWLERS = [f"Brawler{i}" for i in range(80)]
+
+
+def sample_player(telegram_id):
+    rng = random.Random(telegram_id)
+    return {
+        "_id": bson.ObjectId(),
+        "telegram_id": telegram_id,
+        "username": f"joueur_{telegram_id}",
+        "username_lc": f"joueur_{telegram_id}",
+        "trophies": rng.randint(0, 50000),
+        "main_brawler": rng.choice(BRAWLERS),
+        "country": "France",
+        "phone": "+33600000000",
+        "profile_photo": "https://res.cloudinary.com/demo/image/upload/v1700000000/brawlstars_profiles/abcdefghijklmnopqrst.jpg",
+        "brawlers": [
+            {"name": name, "power": rng.randint(1, 11), "trophies": rng.randint(0, 1000), "gadgets": ["g1", "g2"]}
+            for name in BRAWLERS
+        ],
+        "match_alerts": ["1v1", "2v2", "3v3"],
+        "match_delivery": "instant",
+        "applied_results": [f"match:{bson.ObjectId()}" for _ in range(50)],
+        "team_id": bson.ObjectId(),
+        "matches_played": 120, "wins": 70, "defeats": 50, "win_rate": 0.58,
+        "registered_at": datetime.utcnow(), "last_active": datetime.utcnow(), "created_at": datetime.utcnow(),
+    }
+
+
+def project(doc, projection):
+    fields = [f for f, v in projection.items() if v and f != "_id"]
+    projected = {f: doc[f] for f in fields if f in doc}
+    if projection.get("_id", 1):
+        projected["_id"] = doc["_id"]
+    return projected
+
+
+def decode_time(payload, n_reads):
+    start = time.perf_counter()
+    for _ in range(n_reads):
+        bson.decode(payload)
+    return (time.perf_counter() - start) / n_reads
+
+
+def offline(n_reads):
+    doc = sample_player(1)
+    full = bson.encode(doc)
+    full_decode = decode_time(full, n_reads)
+    print(f"{'vue':<12} {'octets':>8} {'réduction':>10} {'décodage':>12}")
+    print(f"{'complet':<12} {len(full):>8} {'':>10} {full_decode * 1e6:>9.1f} µs")
+    for view, projection in Player.PROJECTIONS.items():
+        payload = bson.encode(project(doc, projection))
+        print(f"{view:<12} {len(payload):>8} {1 - len(payload) / len(full):>9.1%} "
+              f"{decode_time(payload, n_reads) * 1e6:>9.1f} µs")
+
+
+def live(n_reads):
+    from core.database import get_client
+    from core import config
+
+    collection = get_client()[config.DB_NAME]["bench_players"]
+    collection.drop()
+    collection.insert_many([sample_player(i) for i in range(1, 1001)])
+    collection.create_index("telegram_id", unique=True)
+    ids = [random.randint(1, 1000) for _ in range(n_reads)]
+    try:
+        for view, projection in [("complet", None)] + list(Player.PROJECTIONS.items()):
+            start = time.perf_counter()
+            for telegram_id in ids:
+                collection.find_one({"telegram_id": telegram_id}, projection)
+            elapsed = (time.perf_counter() - start) / n_reads
+            print(f"{view:<12} {elapsed * 1e3:8.2f} ms/lecture (base réelle)")
+    finally:
+        collection.drop()
+
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if a != "--live"]
+    n = int(args[0]) if args else 10000
+    print(f"{n} lectures par vue")
+    offline(n)
+    if "--live" in sys.argv:
+        live(min(n, 2000))
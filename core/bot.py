@@ -2,7 +2,7 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from dotenv import load_dotenv
-from telegram.ext import ApplicationBuilder, CommandHandler
+from telegram.ext import ApplicationBuilder, CommandHandler, CallbackQueryHandler
 
 # Charger les variables d'environnement
 load_dotenv()
@@ -15,15 +15,17 @@ from handlers.registration import setup as setup_registration
 # Import du handler /profile
 from handlers.profile import profile
 # Import du handler /findall
-from handlers.findall import findall
+from handlers.findall import findall, setup_findall, ensure_findall_indexes
 # Import du handler /search
-from handlers.search import search
+from handlers.search import search, setup_search
 # Import du handler /news
 from handlers.news import news
+# Import du handler /leaderboard
+from handlers.leaderboard import setup_leaderboard
 # Import du handler /findmatch
-from handlers.matchmaking import find_match, setup_handlers as setup_matchmaking
+from handlers.matchmaking import find_match, setup_handlers as setup_matchmaking, ensure_matchmaking_indexes
 
-from handlers.admin import ban, broadcast, stats
+from handlers.admin import ban, handle_ban_pick, broadcast, broadcast_status, broadcast_cancel, stats, playercache, start_broadcast_worker
 
 from handlers.freindly import setup_freindly_handlers
 
@@ -31,23 +33,58 @@ from handlers.findTeams import setup_team_finders
 from handlers.registrationTeams import setup_team_registration
 from handlers.tournaments import setup_tournament_handlers
 from handlers.scrim import setup_scrim 
+from handlers.notifications import setup_notification_handlers
+from handlers.activity import setup_activity_tracking
+from core.database import check_connection, get_database
+from utils.names import ensure_name_indexes
+from utils.name_search import load_search_indexes
+from utils.matcher import match_queue
+from utils.leaderboard import leaderboard, start_leaderboard_refresh
+from utils.registered import registered_players
+from models.teams import ensure_team_indexes
+from utils.scheduler import start_expiry_sweeper
+
+
+async def post_init(application):
+    await check_connection()
+    await registered_players.load(get_database())
+    await ensure_name_indexes(get_database())
+    await ensure_findall_indexes(get_database())
+    await ensure_matchmaking_indexes(get_database())
+    await ensure_team_indexes(get_database())
+    await load_search_indexes(get_database())
+    await match_queue.load(get_database())
+    await leaderboard.load(get_database())
+    # Tâches de fond lancées au démarrage
+    start_broadcast_worker(application)
+    start_expiry_sweeper(application, get_database())
+    start_leaderboard_refresh(application, get_database())
 
 
 def main():
-    app = ApplicationBuilder().token(TOKEN).build()
+    app = ApplicationBuilder().token(TOKEN).post_init(post_init).build()
+    setup_activity_tracking(app)
     app.add_handler(CommandHandler("ban", ban))
+    app.add_handler(CallbackQueryHandler(handle_ban_pick, pattern=r"^ban_\d+$"))
     app.add_handler(CommandHandler("broadcast", broadcast))
+    app.add_handler(CommandHandler("broadcaststatus", broadcast_status))
+    app.add_handler(CommandHandler("broadcastcancel", broadcast_cancel))
     app.add_handler(CommandHandler("stats", stats))
+    app.add_handler(CommandHandler("playercache", playercache))
     app.add_handler(CommandHandler("profile", profile))
     app.add_handler(CommandHandler("findall", findall))
+    setup_findall(app)
     app.add_handler(CommandHandler("search", search))
+    setup_search(app)
     app.add_handler(CommandHandler("news", news))
+    setup_leaderboard(app)
     setup_scrim(app)
     setup_team_finders(app)
     setup_team_registration(app)
     setup_tournament_handlers(app)
     setup_matchmaking(app)
     setup_freindly_handlers(app)
+    setup_notification_handlers(app)
     app.add_handler(CommandHandler("start", start))
     setup_registration(app)  # Ajoute le ConversationHandler pour /register
     print("Bot démarré !")
@@ -1,12 +1,255 @@
+import os
+import asyncio
+import functools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
 from pymongo import MongoClient
-from models.players import Player
-from models.match import Match
-from models.tournament import Tournament
+from pymongo.errors import PyMongoError
+
+from core import config
+
+logger = logging.getLogger(__name__)
+
+# Les appels pymongo sont bloquants : ils s'exécutent dans un pool de threads borné
+# pour ne jamais bloquer la boucle d'événements qui sert les autres joueurs.
+DB_EXECUTOR_WORKERS = int(os.getenv("DB_EXECUTOR_WORKERS", "16"))
+CURSOR_BATCH_SIZE = 100
+
+_executor = ThreadPoolExecutor(max_workers=DB_EXECUTOR_WORKERS, thread_name_prefix="mongo")
+
+
+async def run_sync(func, *args, **kwargs) -> Any:
+    """Exécute un appel bloquant (pymongo, cloudinary...) dans le pool de threads"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
+
+
+class AsyncCursor:
+    """Curseur pymongo parcouru par lots dans le pool de threads"""
+
+    def __init__(self, cursor, batch_size: int = CURSOR_BATCH_SIZE):
+        self.sync = cursor
+        self._batch_size = batch_size
+        self._buffer: List[Dict] = []
+        self._exhausted = False
+
+    def sort(self, *args, **kwargs) -> "AsyncCursor":
+        self.sync.sort(*args, **kwargs)
+        return self
+
+    def limit(self, limit: int) -> "AsyncCursor":
+        self.sync.limit(limit)
+        return self
+
+    def skip(self, skip: int) -> "AsyncCursor":
+        self.sync.skip(skip)
+        return self
+
+    def _next_batch(self) -> List[Dict]:
+        batch = []
+        for doc in self.sync:
+            batch.append(doc)
+            if len(batch) >= self._batch_size:
+                break
+        return batch
+
+    async def to_list(self, length: Optional[int] = None) -> List[Dict]:
+        docs = self._buffer
+        self._buffer = []
+        if length is None:
+            docs.extend(await run_sync(list, self.sync))
+            self._exhausted = True
+        while length is not None and len(docs) < length and not self._exhausted:
+            batch = await run_sync(self._next_batch)
+            self._exhausted = not batch
+            docs.extend(batch)
+        if length is not None:
+            docs, self._buffer = docs[:length], docs[length:]
+        return docs
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> Dict:
+        if not self._buffer and not self._exhausted:
+            self._buffer = await run_sync(self._next_batch)
+            self._exhausted = not self._buffer
+        if not self._buffer:
+            raise StopAsyncIteration
+        return self._buffer.pop(0)
+
+
+class AsyncCollection:
+    """Collection pymongo dont chaque opération est attendue (await) au lieu de bloquer"""
+
+    def __init__(self, collection):
+        self.sync = collection
+
+    @property
+    def name(self) -> str:
+        return self.sync.name
+
+    def find(self, *args, **kwargs) -> AsyncCursor:
+        return AsyncCursor(self.sync.find(*args, **kwargs))
+
+    def aggregate(self, pipeline, **kwargs) -> AsyncCursor:
+        # aggregate() exécute déjà la commande : on le diffère jusqu'au premier lot
+        return AsyncCursor(_LazyCursor(self.sync.aggregate, pipeline, **kwargs))
+
+    async def find_one(self, *args, **kwargs):
+        return await run_sync(self.sync.find_one, *args, **kwargs)
+
+    async def insert_one(self, *args, **kwargs):
+        return await run_sync(self.sync.insert_one, *args, **kwargs)
+
+    async def insert_many(self, *args, **kwargs):
+        return await run_sync(self.sync.insert_many, *args, **kwargs)
+
+    async def update_one(self, *args, **kwargs):
+        return await run_sync(self.sync.update_one, *args, **kwargs)
+
+    async def update_many(self, *args, **kwargs):
+        return await run_sync(self.sync.update_many, *args, **kwargs)
+
+    async def delete_one(self, *args, **kwargs):
+        return await run_sync(self.sync.delete_one, *args, **kwargs)
+
+    async def delete_many(self, *args, **kwargs):
+        return await run_sync(self.sync.delete_many, *args, **kwargs)
+
+    async def find_one_and_update(self, *args, **kwargs):
+        return await run_sync(self.sync.find_one_and_update, *args, **kwargs)
+
+    async def find_one_and_delete(self, *args, **kwargs):
+        return await run_sync(self.sync.find_one_and_delete, *args, **kwargs)
+
+    async def count_documents(self, *args, **kwargs) -> int:
+        return await run_sync(self.sync.count_documents, *args, **kwargs)
+
+    async def distinct(self, *args, **kwargs):
+        return await run_sync(self.sync.distinct, *args, **kwargs)
+
+    async def bulk_write(self, *args, **kwargs):
+        return await run_sync(self.sync.bulk_write, *args, **kwargs)
+
+    async def create_index(self, *args, **kwargs):
+        return await run_sync(self.sync.create_index, *args, **kwargs)
+
+    async def create_indexes(self, *args, **kwargs):
+        return await run_sync(self.sync.create_indexes, *args, **kwargs)
+
+    async def drop_index(self, *args, **kwargs):
+        return await run_sync(self.sync.drop_index, *args, **kwargs)
+
+
+class _LazyCursor:
+    """Itérable qui n'exécute l'agrégation qu'au premier parcours (dans le pool de threads)"""
+
+    def __init__(self, func, *args, **kwargs):
+        self._call = functools.partial(func, *args, **kwargs)
+        self._cursor = None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._cursor is None:
+            self._cursor = self._call()
+        return next(self._cursor)
+
+
+class AsyncDatabase:
+    """Base pymongo exposant des collections asynchrones (db.players, db["teams"]...)"""
+
+    def __init__(self, database):
+        self.sync = database
+        self._collections: Dict[str, AsyncCollection] = {}
+
+    def __getitem__(self, name: str) -> AsyncCollection:
+        if name not in self._collections:
+            self._collections[name] = AsyncCollection(self.sync[name])
+        return self._collections[name]
+
+    def __getattr__(self, name: str) -> AsyncCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    async def command(self, *args, **kwargs):
+        return await run_sync(self.sync.command, *args, **kwargs)
+
+
+_client: Optional[MongoClient] = None
+_database: Optional[AsyncDatabase] = None
+_transactions: Optional[bool] = None
+_lock = threading.Lock()
+
+
+def get_client() -> MongoClient:
+    """Client MongoDB unique du processus, créé au premier appel"""
+    global _client
+    with _lock:
+        if _client is None:
+            _client = MongoClient(
+                config.MONGO_URI,
+                maxPoolSize=config.MONGO_MAX_POOL_SIZE,
+                minPoolSize=config.MONGO_MIN_POOL_SIZE,
+                maxIdleTimeMS=config.MONGO_MAX_IDLE_TIME_MS,
+                connectTimeoutMS=config.MONGO_CONNECT_TIMEOUT_MS,
+                serverSelectionTimeoutMS=config.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+                socketTimeoutMS=config.MONGO_SOCKET_TIMEOUT_MS,
+                compressors=config.MONGO_COMPRESSORS,
+                appname="brawl-telegram-bot",
+            )
+            logger.info(f"Client MongoDB créé (pool max {config.MONGO_MAX_POOL_SIZE})")
+        return _client
+
+
+def get_database() -> AsyncDatabase:
+    """Base du bot (DB_NAME) sur le client partagé"""
+    global _database
+    if _database is None:
+        _database = AsyncDatabase(get_client()[config.DB_NAME])
+    return _database
+
+
+async def check_connection() -> None:
+    """Vérifie la connexion une seule fois au démarrage (au lieu d'un ping par module)"""
+    try:
+        await get_database().command("ping")
+        logger.info("Connexion MongoDB établie avec succès")
+    except Exception as e:
+        logger.critical(f"Échec de connexion à MongoDB: {e}")
+        raise
+
+
+def _transactions_supported() -> bool:
+    """Les transactions exigent un replica set ou un cluster shardé (Atlas), pas un serveur seul"""
+    global _transactions
+    if _transactions is None:
+        try:
+            hello = get_client().admin.command("hello")
+            _transactions = bool(hello.get("setName")) or hello.get("msg") == "isdbgrid"
+        except PyMongoError as e:
+            logger.warning(f"Support des transactions inconnu, écritures sans transaction: {e}")
+            _transactions = False
+        if not _transactions:
+            logger.warning("MongoDB sans replica set : les écritures multi-documents ne sont pas transactionnelles")
+    return _transactions
 
-client = MongoClient(os.getenv("MONGO_URI"))
-db = client.brawl_stars_prod  # Ou brawl_stars_dev
 
-# Initialisation
-players_model = Player(db)
-matches_model = Match(db)
-tournaments_model = Tournament(db)
\ No newline at end of file
+async def run_transaction(callback: Callable[[Any], Any]) -> Any:
+    """
+    Exécute callback(session) dans une transaction multi-documents, réessayée sur erreur transitoire.
+    Le callback tourne dans le pool de threads et utilise l'API synchrone (db.teams.sync..., session=session).
+    Sans replica set, il est appelé avec session=None : il doit alors compenser ses écritures en cas d'échec.
+    """
+    def _run():
+        if not _transactions_supported():
+            return callback(None)
+        with get_client().start_session() as session:
+            return session.with_transaction(callback)
+    return await run_sync(_run)
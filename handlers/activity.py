@@ -0,0 +1,41 @@
+import time
+from datetime import datetime
+from core.database import get_database
+from telegram import Update
+from telegram.ext import ContextTypes, TypeHandler
+from dotenv import load_dotenv
+from utils.reachability import unreachable_chats
+from utils.player_index import player_index
+from utils.registered import registered_players
+
+load_dotenv()
+db = get_database()
+
+# last_active n'est réécrit qu'une fois par heure et par joueur
+ACTIVITY_TOUCH_INTERVAL = 3600
+_last_touch = {}
+
+async def track_activity(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Exécuté avant tous les handlers : un joueur qui écrit au bot redevient joignable"""
+    user = update.effective_user
+    if not user:
+        return
+
+    await unreachable_chats.mark_reachable(user.id)
+
+    if registered_players.surely_absent(user.id):
+        return
+
+    now = time.monotonic()
+    # time.monotonic() part d'une origine arbitraire : "jamais écrit" ne peut pas valoir 0
+    if now - _last_touch.get(user.id, float("-inf")) < ACTIVITY_TOUCH_INTERVAL:
+        return
+    _last_touch[user.id] = now
+    last_active = datetime.utcnow()
+    result = await db.players.update_one({"telegram_id": user.id}, {"$set": {"last_active": last_active}})
+    if result.matched_count:
+        player_index.upsert({"telegram_id": user.id, "last_active": last_active})
+
+def setup_activity_tracking(application):
+    unreachable_chats.attach(db.players)
+    application.add_handler(TypeHandler(Update, track_activity), group=-1)
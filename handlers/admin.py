@@ -1,12 +1,23 @@
 import os
-from pymongo import MongoClient
+from core.database import get_database
 from telegram import Update
 from telegram.ext import ContextTypes
 from dotenv import load_dotenv
+from utils.player_index import player_index
+from utils.names import normalize_name
+from utils.name_search import player_search
+from utils.leaderboard import leaderboard
+from utils.player_cache import player_cache
+from utils.formatters import profile_cards
+from utils.registered import registered_players
+from models.teams import remove_player_from_team
+from utils.keyboards import suggestions_keyboard
+from utils.broadcast_queue import (
+    BroadcastWorker, enqueue_broadcast, latest_broadcast, cancel_broadcast, throughput
+)
 
 load_dotenv()
-client = MongoClient(os.getenv('MONGO_URI'))
-db = client[os.getenv("DB_NAME", "brawlbase")]
+db = get_database()
 
 # Liste des ID Telegram des admins (à personnaliser)
 ADMINS = [int(x) for x in os.getenv("ADMINS", "").split(",") if x.strip()]
@@ -14,6 +25,18 @@ ADMINS = [int(x) for x in os.getenv("ADMINS", "").split(",") if x.strip()]
 def is_admin(user_id: int) -> bool:
     return user_id in ADMINS
 
+async def forget_player(deleted):
+    """Retire un joueur banni de sa team et des index/caches mémoire"""
+    telegram_id = deleted["telegram_id"]
+    if deleted.get("team_id"):
+        await remove_player_from_team(deleted["team_id"], telegram_id)
+    player_index.remove(telegram_id)
+    player_search.remove(telegram_id)
+    leaderboard.remove(telegram_id)
+    player_cache.invalidate([telegram_id])
+    profile_cards.bump([telegram_id])
+    registered_players.discard(telegram_id)
+
 async def ban(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
     if not is_admin(user.id):
@@ -25,12 +48,40 @@ async def ban(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     username = " ".join(context.args).strip()
-    result = db.players.delete_one({"username": {"$regex": f"^{username}$", "$options": "i"}})
-    if result.deleted_count:
+    deleted = await db.players.find_one_and_delete(
+        {"username_lc": normalize_name(username)},
+        projection={"telegram_id": 1, "team_id": 1}
+    )
+    if deleted:
+        await forget_player(deleted)
         await update.message.reply_text(f"✅ Joueur '{username}' banni et supprimé.")
+        return
+
+    await player_search.ensure_loaded(db)
+    matches = player_search.search(username)
+    if matches:
+        await update.message.reply_text(
+            f"❌ Joueur '{username}' introuvable. Pseudos proches :",
+            reply_markup=suggestions_keyboard(matches, "ban_", "Bannir {}")
+        )
     else:
         await update.message.reply_text(f"❌ Joueur '{username}' introuvable.")
 
+async def handle_ban_pick(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+    if not is_admin(query.from_user.id):
+        return
+    deleted = await db.players.find_one_and_delete(
+        {"telegram_id": int(query.data.split("_")[1])},
+        projection={"telegram_id": 1, "username": 1, "team_id": 1}
+    )
+    if not deleted:
+        await query.edit_message_text("❌ Joueur introuvable.")
+        return
+    await forget_player(deleted)
+    await query.edit_message_text(f"✅ Joueur '{deleted.get('username')}' banni et supprimé.")
+
 async def broadcast(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
     if not is_admin(user.id):
@@ -42,14 +93,60 @@ async def broadcast(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     message = " ".join(context.args)
-    count = 0
-    for player in db.players.find():
-        try:
-            await context.bot.send_message(chat_id=player["telegram_id"], text=f"[Annonce admin]\n{message}")
-            count += 1
-        except Exception:
-            continue
-    await update.message.reply_text(f"✅ Message envoyé à {count} joueurs.")
+    job = await enqueue_broadcast(db, message, user.id)
+    worker = context.application.bot_data.get("broadcast_worker")
+    if worker:
+        worker.wake()
+    await update.message.reply_text(
+        f"📨 Diffusion programmée pour {job['total']} joueurs.\n"
+        f"Suis sa progression avec /broadcaststatus ou arrête-la avec /broadcastcancel."
+    )
+
+async def broadcast_status(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user = update.effective_user
+    if not is_admin(user.id):
+        await update.message.reply_text("⛔️ Commande réservée aux admins.")
+        return
+
+    job = await latest_broadcast(db)
+    if not job:
+        await update.message.reply_text("Aucune diffusion enregistrée.")
+        return
+
+    processed = job["sent"] + job["failed"] + job["skipped"]
+    rate = throughput(job)
+    remaining = max(job["total"] - processed, 0)
+    eta = f"{int(remaining / rate)}s" if rate and job["status"] == "running" else "N/A"
+    await update.message.reply_text(
+        f"📨 Diffusion du {job['created_at'].strftime('%d/%m/%Y %H:%M')}\n"
+        f"• Statut : {job['status']}\n"
+        f"• Progression : {processed}/{job['total']}\n"
+        f"• Envoyés : {job['sent']}\n"
+        f"• Échecs : {job['failed']}\n"
+        f"• Ignorés : {job['skipped']}\n"
+        f"• Débit : {rate:.1f} msg/s\n"
+        f"• Temps restant estimé : {eta}"
+    )
+
+async def broadcast_cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user = update.effective_user
+    if not is_admin(user.id):
+        await update.message.reply_text("⛔️ Commande réservée aux admins.")
+        return
+
+    job = await cancel_broadcast(db)
+    if job:
+        await update.message.reply_text(
+            f"🛑 Diffusion annulée après {job['sent']} envoi(s) sur {job['total']}."
+        )
+    else:
+        await update.message.reply_text("Aucune diffusion en cours.")
+
+def start_broadcast_worker(application):
+    """Démarre le worker de diffusion ; les diffusions interrompues par un redémarrage reprennent"""
+    worker = BroadcastWorker(db, application.bot)
+    application.bot_data["broadcast_worker"] = worker
+    application.create_task(worker.run())
 
 async def stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
@@ -57,12 +154,31 @@ async def stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("⛔️ Commande réservée aux admins.")
         return
 
-    n_players = db.players.count_documents({})
-    n_matches = db.matches.count_documents({})
-    n_screens = db.match_screens.count_documents({})
+    n_players = await db.players.count_documents({})
+    n_matches = await db.matches.count_documents({})
+    n_screens = await db.match_screens.count_documents({})
     await update.message.reply_text(
         f"📊 Statistiques :\n"
         f"• Joueurs : {n_players}\n"
         f"• Matchs : {n_matches}\n"
-        f"• Captures : {n_screens}"
-    )
\ No newline at end of file
+        f"• Captures : {n_screens}\n"
+        f"{format_cache_stats()}"
+    )
+
+def format_cache_stats():
+    cache = player_cache.stats()
+    return (
+        f"• Cache joueurs : {'actif' if cache['enabled'] else 'désactivé'}, {cache['size']} entrées, "
+        f"{cache['hits']} hits / {cache['misses']} miss ({cache['hit_rate']:.0%}), {cache['evictions']} évictions"
+    )
+
+async def playercache(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/playercache [on|off] : compteurs du cache joueurs, activation pour le débogage"""
+    user = update.effective_user
+    if not is_admin(user.id):
+        await update.message.reply_text("⛔️ Commande réservée aux admins.")
+        return
+
+    if context.args and context.args[0].lower() in ("on", "off"):
+        player_cache.set_enabled(context.args[0].lower() == "on")
+    await update.message.reply_text(format_cache_stats())
\ No newline at end of file
@@ -1,30 +1,33 @@
-import os
-from pymongo import MongoClient
+from core.database import get_database
 from telegram import Update
-from telegram.ext import ContextTypes, CommandHandler
+from telegram.ext import ContextTypes, CommandHandler, CallbackQueryHandler
 from dotenv import load_dotenv
+from utils.media import send_listing, send_photo_cached
+from utils.names import normalize_name
+from utils.name_search import team_search
+from utils.keyboards import suggestions_keyboard
+from models.players import find_player
+from utils.team_snapshots import team_snapshots
 
 load_dotenv()
-client = MongoClient(os.getenv('MONGO_URI'))
-db = client[os.getenv("DB_NAME", "brawlbase")]
+db = get_database()
+
+MAX_SEARCH_RESULTS = 10
 
 async def profileteam(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
-    player = db.players.find_one({"telegram_id": user.id})
+    player = await find_player(db.players, user.id, "team")
     if not player or not player.get("team_id"):
         await update.message.reply_text("❌ Tu n'es membre d'aucune team.")
         return
 
-    team = db.teams.find_one({"_id": player["team_id"]})
+    # Instantané de la team : membres compris, sans requête supplémentaire
+    team = await team_snapshots.get(db, player["team_id"])
     if not team:
         await update.message.reply_text("❌ Team introuvable.")
         return
 
-    members = db.players.find({"telegram_id": {"$in": team["member_ids"]}})
-    member_list = "\n".join([
-        f"- {m.get('username', str(m['telegram_id']))} ({m.get('trophies', 0)} trophées)"
-        for m in members
-    ])
+    member_list = format_members(team)
 
     msg = (
         f"🏆 **Profil de ta team**\n"
@@ -32,7 +35,7 @@ async def profileteam(update: Update, context: ContextTypes.DEFAULT_TYPE):
         f"• Membres :\n{member_list}\n"
     )
     if team.get("logo_url"):
-        await update.message.reply_photo(photo=team["logo_url"], caption=msg)
+        await send_photo_cached(context.bot, db, update.effective_chat.id, team["logo_url"], caption=msg)
     else:
         await update.message.reply_text(msg)
 
@@ -40,7 +43,7 @@ async def findallteam(update: Update, context: ContextTypes.DEFAULT_TYPE):
     teams = db.teams.find()
     msg = "📋 **Liste des teams enregistrées :**\n"
     found = False
-    for team in teams:
+    async for team in teams:
         found = True
         msg += f"\n• {team.get('name', 'Inconnu')} ({len(team.get('member_ids', []))} membres)"
     if not found:
@@ -53,27 +56,54 @@ async def searchteam(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("Utilisation : /searchteam <nom de la team>")
         return
     search = " ".join(args)
-    team = db.teams.find_one({"name": {"$regex": search, "$options": "i"}})
-    if not team:
+    await team_search.ensure_loaded(db)
+    matches = team_search.search(search, MAX_SEARCH_RESULTS)
+    if not matches:
         await update.message.reply_text("Aucune team trouvée avec ce nom.")
         return
-    members = db.players.find({"telegram_id": {"$in": team["member_ids"]}})
-    member_list = "\n".join([
-        f"- {m.get('username', str(m['telegram_id']))} ({m.get('trophies', 0)} trophées)"
-        for m in members
-    ])
-    msg = (
-        f"🔎 **Résultat de la recherche :**\n"
-        f"• Nom : {team.get('name', 'Inconnu')}\n"
-        f"• Pays : {team.get('country', 'N/A')}\n"
-        f"• Membres :\n{member_list}\n"
+
+    if normalize_name(matches[0][1]) == normalize_name(search):
+        team = await team_snapshots.get(db, matches[0][0])
+        if team:
+            await send_team_results(context, update.effective_chat.id, [team])
+            return
+    await update.message.reply_text(
+        "Teams correspondantes :",
+        reply_markup=suggestions_keyboard(matches, "searchteam_")
     )
-    if team.get("logo_url"):
-        await update.message.reply_photo(photo=team["logo_url"], caption=msg)
-    else:
-        await update.message.reply_text(msg)
+
+async def handle_searchteam_pick(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+    team = await team_snapshots.get(db, query.data.split("_")[1])
+    if not team:
+        await query.edit_message_text("❌ Cette team n'existe plus.")
+        return
+    await send_team_results(context, query.message.chat_id, [team])
+
+def format_members(team):
+    """Liste des membres depuis le résumé dénormalisé de l'instantané"""
+    return "\n".join([
+        f"- {m.get('username') or str(m['telegram_id'])} ({m.get('trophies', 0)} trophées)"
+        for m in team.get("members", [])
+    ])
+
+async def send_team_results(context, chat_id, teams):
+    """Affiche des instantanés de team (utils/team_snapshots.py) : les membres y sont déjà"""
+    entries = []
+    for team in teams:
+        member_list = format_members(team)
+        msg = (
+            f"🔎 **Résultat de la recherche :**\n"
+            f"• Nom : {team.get('name', 'Inconnu')}\n"
+            f"• Pays : {team.get('country', 'N/A')}\n"
+            f"• Membres :\n{member_list}\n"
+        )
+        entries.append((team.get("logo_url"), msg))
+    await send_listing(context.bot, chat_id, entries, db=db)
 
 def setup_team_finders(application):
     application.add_handler(CommandHandler("profileteam", profileteam))
     application.add_handler(CommandHandler("findallteam", findallteam))
-    application.add_handler(CommandHandler("searchteam", searchteam))
\ No newline at end of file
+    application.add_handler(CommandHandler("searchteam", searchteam))
+    application.add_handler(CallbackQueryHandler(handle_searchteam_pick, pattern="^searchteam_[0-9a-f]{24}$"))
\ No newline at end of file
@@ -1,38 +1,116 @@
-import os
-from pymongo import MongoClient
-from telegram import Update
-from telegram.ext import ContextTypes
+from pymongo import ASCENDING, DESCENDING
+from core.database import get_database
+from telegram import Update, InlineKeyboardMarkup, InlineKeyboardButton
+from telegram.ext import ContextTypes, CallbackQueryHandler
 from dotenv import load_dotenv
-from datetime import datetime
+from datetime import datetime, timedelta
+from bson import ObjectId
+from utils.media import send_listing
+from utils.formatters import profile_cards
 
 load_dotenv()
-client = MongoClient(os.getenv('MONGO_URI'))
-db = client[os.getenv("DB_NAME", "brawlbase")]
+db = get_database()
+
+PAGE_SIZE = 10
+# La page ne lit que la clé de pagination ; le contenu vient des fiches pré-rendues (utils/formatters.py)
+PAGE_PROJECTION = {"telegram_id": 1, "registered_at": 1}
+EPOCH = datetime(1970, 1, 1)
+
+async def ensure_findall_indexes(db) -> None:
+    """Index de la pagination par clé (registered_at, _id), du plus récent au plus ancien"""
+    await db.players.create_index([("registered_at", DESCENDING), ("_id", DESCENDING)], name="registered_at_id")
+
+def encode_key(player):
+    """Clé de pagination compacte pour callback_data (64 octets max)"""
+    ms = int((player["registered_at"] - EPOCH) / timedelta(milliseconds=1))
+    return f"{ms}_{player['_id']}"
+
+def decode_key(ms, oid):
+    return EPOCH + timedelta(milliseconds=int(ms)), ObjectId(oid)
+
+async def fetch_page(direction=None, key=None, projection=PAGE_PROJECTION):
+    """
+    Récupère une page de joueurs en une requête indexée
+    :param direction: None (première page), "n" (page suivante), "p" (page précédente)
+                      ou "c" (page courante, pour l'album photo)
+    :param key: (registered_at, _id) du dernier joueur (n) ou du premier joueur (p, c) de la page
+    :return: (joueurs, page précédente disponible, page suivante disponible)
+    """
+    query = {"registered_at": {"$ne": None}}
+    order = DESCENDING
+    if direction:
+        registered_at, oid = key
+        op = "$gt" if direction == "p" else "$lt"
+        id_op = "$lte" if direction == "c" else op
+        query = {"$or": [
+            {"registered_at": {op: registered_at}},
+            {"registered_at": registered_at, "_id": {id_op: oid}}
+        ]}
+        if direction == "p":
+            order = ASCENDING
+
+    players = await (
+        db.players.find(query, projection)
+        .sort([("registered_at", order), ("_id", order)])
+        .limit(PAGE_SIZE + 1)
+        .to_list()
+    )
+    has_more = len(players) > PAGE_SIZE
+    players = players[:PAGE_SIZE]
+    if direction == "p":
+        players.reverse()
+        return players, has_more, True
+    return players, direction in ("n", "c"), has_more
+
+def render_page(players, cards, page, has_prev, has_next):
+    """
+    :param cards: {telegram_id: fiche} pour les joueurs de la page (voir profile_cards.get_many)
+    """
+    lines = [cards[p["telegram_id"]]["line"] for p in players if p["telegram_id"] in cards]
+    msg = f"📋 Joueurs inscrits — page {page}\n\n" + "\n".join(lines)
+
+    buttons = []
+    if has_prev:
+        buttons.append(InlineKeyboardButton("⬅️ Précédent", callback_data=f"findall_p_{page - 1}_{encode_key(players[0])}"))
+    if has_next:
+        buttons.append(InlineKeyboardButton("Suivant ➡️", callback_data=f"findall_n_{page + 1}_{encode_key(players[-1])}"))
+    keyboard = [buttons] if buttons else []
+    keyboard.append([InlineKeyboardButton("📷 Photos de la page", callback_data=f"findall_c_{page}_{encode_key(players[0])}")])
+    return msg, InlineKeyboardMarkup(keyboard)
 
 async def findall(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    players = db.players.find().sort("registered_at", -1)
-    found = False
-    for player in players:
-        found = True
-        team_name = None
-        if player.get("team_id"):
-            team = db.teams.find_one({"_id": player["team_id"]})
-            if team:
-                team_name = team.get("name")
-        msg = (
-            f"👤 Pseudo : {player.get('username', 'Inconnu')}\n"
-            f"• Pays : {player.get('country', 'N/A')}\n"
-            f"• Team : {team_name if team_name else 'Aucune'}\n"
-            f"• Trophées : {player.get('trophies', 'N/A')}\n"
-            f"• Brawler principal : {player.get('main_brawler', 'N/A')}\n"
-            f"• Victoires : {player.get('wins', 0)}\n"
-            f"• Défaites : {player.get('defeats', 0)}\n"
-            f"• Matchs joués : {player.get('matches_played', 0)}\n"
-            f"• Inscrit le : {player.get('registered_at', datetime.utcnow()).strftime('%d/%m/%Y %H:%M')}\n"
-        )
-        if player.get("profile_photo"):
-            await update.message.reply_photo(photo=player["profile_photo"], caption=msg)
-        else:
-            await update.message.reply_text(msg)
-    if not found:
-        await update.message.reply_text("Aucun joueur inscrit pour le moment.")
\ No newline at end of file
+    players, has_prev, has_next = await fetch_page()
+    if not players:
+        await update.message.reply_text("Aucun joueur inscrit pour le moment.")
+        return
+    cards = await profile_cards.get_many(db, [p["telegram_id"] for p in players])
+    msg, keyboard = render_page(players, cards, 1, has_prev, has_next)
+    await update.message.reply_text(msg, reply_markup=keyboard)
+
+async def handle_findall_page(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+    _, direction, page, ms, oid = query.data.split("_")
+    if direction == "c":
+        await send_page_photos(context, query.message.chat_id, decode_key(ms, oid))
+        return
+    players, has_prev, has_next = await fetch_page(direction, decode_key(ms, oid))
+    if not players:
+        await query.edit_message_text("Aucun autre joueur à afficher.")
+        return
+    cards = await profile_cards.get_many(db, [p["telegram_id"] for p in players])
+    msg, keyboard = render_page(players, cards, int(page), has_prev, has_next)
+    await query.edit_message_text(msg, reply_markup=keyboard)
+
+async def send_page_photos(context, chat_id, key):
+    """Envoie les profils de la page courante en albums plutôt qu'une photo par joueur"""
+    players, _, _ = await fetch_page("c", key)
+    cards = await profile_cards.get_many(db, [p["telegram_id"] for p in players])
+    entries = [
+        (cards[p["telegram_id"]]["photo"], cards[p["telegram_id"]]["text"])
+        for p in players if p["telegram_id"] in cards
+    ]
+    await send_listing(context.bot, chat_id, entries, db=db)
+
+def setup_findall(application):
+    application.add_handler(CallbackQueryHandler(handle_findall_page, pattern="^findall_[npc]_"))
@@ -1,4 +1,3 @@
-import os
 from dotenv import load_dotenv
 from telegram import Update, InlineKeyboardMarkup, InlineKeyboardButton
 from telegram.ext import (
@@ -7,12 +6,13 @@ from telegram.ext import (
 )
 from datetime import datetime
 import logging
-from pymongo import MongoClient
+from core.database import get_database
 from bson import ObjectId
+from utils.fanout import fan_out, spawn_fan_out
+from utils.reachability import REACHABLE_FILTER
+from utils.names import normalize_name
 
 load_dotenv()
-MONGO_URI = os.getenv("MONGO_URI")
-DB_NAME = os.getenv("DB_NAME", "brawlbase")
 
 logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
@@ -20,13 +20,7 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-try:
-    client = MongoClient(MONGO_URI)
-    db = client[DB_NAME]
-    db.command('ping')
-except Exception as e:
-    logger.critical(f"Échec de connexion à MongoDB: {e}")
-    raise
+db = get_database()
 
 MAX_PLAYERS = 5  # 1 créateur + 4 amis max
 
@@ -66,35 +60,35 @@ async def handle_freindly_invites(update: Update, context: ContextTypes.DEFAULT_
         await update.message.reply_text(f"Merci d'envoyer entre 1 et {MAX_PLAYERS-1} pseudo(s).")
         return WAITING_FRIENDS
 
-    invited = []
-    for pseudo in pseudos:
-        player = db.players.find_one({"username": {"$regex": f"^{pseudo}$", "$options": "i"}})
-        if player:
-            invited.append(player["telegram_id"])
-        else:
+    # Une seule requête indexée pour tous les pseudos
+    keys = [normalize_name(pseudo) for pseudo in pseudos]
+    found = {
+        p["username_lc"]: p["telegram_id"]
+        async for p in db.players.find({"username_lc": {"$in": keys}}, {"username_lc": 1, "telegram_id": 1})
+    }
+    for pseudo, key in zip(pseudos, keys):
+        if key not in found:
             await update.message.reply_text(f"❌ Joueur '{pseudo}' introuvable.")
             return WAITING_FRIENDS
+    invited = [found[key] for key in keys]
 
-    match_id = db.freindly_matches.insert_one({
+    match_id = (await db.freindly_matches.insert_one({
         "creator_id": user.id,
         "creator_username": user.username,
         "invited_ids": invited,
         "joined_ids": [user.id],
         "status": "waiting",
         "created_at": datetime.utcnow()
-    }).inserted_id
-
-    for tid in invited:
-        try:
-            await context.bot.send_message(
-                chat_id=tid,
-                text=f"🎉 {user.full_name} (@{user.username}) t'invite à une partie amicale !",
-                reply_markup=InlineKeyboardMarkup([
-                    [InlineKeyboardButton("Rejoindre la Game Room", callback_data=f"freindly_join_{match_id}")]
-                ])
-            )
-        except Exception:
-            continue
+    })).inserted_id
+
+    await fan_out(
+        context.bot,
+        invited,
+        text=f"🎉 {user.full_name} (@{user.username}) t'invite à une partie amicale !",
+        reply_markup=InlineKeyboardMarkup([
+            [InlineKeyboardButton("Rejoindre la Game Room", callback_data=f"freindly_join_{match_id}")]
+        ])
+    )
 
     await update.message.reply_text("Invitations envoyées à tes amis. Ils doivent accepter pour rejoindre la Game Room.")
     return ConversationHandler.END
@@ -105,27 +99,25 @@ async def handle_invite_all(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = query.from_user
     context.user_data["freindly_mode"] = "all"
 
-    match_id = db.freindly_matches.insert_one({
+    match_id = (await db.freindly_matches.insert_one({
         "creator_id": user.id,
         "creator_username": user.username,
         "invited_ids": [],
         "joined_ids": [user.id],
         "status": "waiting_all",
         "created_at": datetime.utcnow()
-    }).inserted_id
-
-    # Notifie tous les joueurs sauf le créateur
-    for player in db.players.find({"telegram_id": {"$ne": user.id}}):
-        try:
-            await context.bot.send_message(
-                chat_id=player["telegram_id"],
-                text=f"🎉 {user.full_name} (@{user.username}) organise une partie amicale ! Clique pour rejoindre (places limitées à {MAX_PLAYERS} joueurs) :",
-                reply_markup=InlineKeyboardMarkup([
-                    [InlineKeyboardButton("Rejoindre la Game Room", callback_data=f"freindly_join_{match_id}")]
-                ])
-            )
-        except Exception:
-            continue
+    })).inserted_id
+
+    # Notifie tous les joueurs sauf le créateur, en tâche de fond
+    spawn_fan_out(
+        context,
+        (p["telegram_id"] async for p in db.players.find({"telegram_id": {"$ne": user.id}, **REACHABLE_FILTER}, {"telegram_id": 1})),
+        f"freindly {match_id}",
+        text=f"🎉 {user.full_name} (@{user.username}) organise une partie amicale ! Clique pour rejoindre (places limitées à {MAX_PLAYERS} joueurs) :",
+        reply_markup=InlineKeyboardMarkup([
+            [InlineKeyboardButton("Rejoindre la Game Room", callback_data=f"freindly_join_{match_id}")]
+        ])
+    )
 
     await query.edit_message_text("Invitation envoyée à tout le monde ! Les premiers à accepter rejoindront la Game Room.")
     return ConversationHandler.END
@@ -136,7 +128,7 @@ async def handle_freindly_join(update: Update, context: ContextTypes.DEFAULT_TYP
     user = query.from_user
     match_id = query.data.split("_")[2]
 
-    match = db.freindly_matches.find_one({"_id": ObjectId(match_id)})
+    match = await db.freindly_matches.find_one({"_id": ObjectId(match_id)})
     if not match or user.id in match.get("joined_ids", []):
         await query.edit_message_text("Impossible de rejoindre cette Game Room.")
         return
@@ -146,15 +138,15 @@ async def handle_freindly_join(update: Update, context: ContextTypes.DEFAULT_TYP
         await query.edit_message_text("La Game Room est déjà complète.")
         return
 
-    db.freindly_matches.update_one(
+    await db.freindly_matches.update_one(
         {"_id": ObjectId(match_id)},
         {"$addToSet": {"joined_ids": user.id}}
     )
 
     # Affiche au créateur la liste des joueurs et combien il en manque
-    match = db.freindly_matches.find_one({"_id": ObjectId(match_id)})
+    match = await db.freindly_matches.find_one({"_id": ObjectId(match_id)})
     joined_ids = match["joined_ids"]
-    joined_players = list(db.players.find({"telegram_id": {"$in": joined_ids}}))
+    joined_players = await db.players.find({"telegram_id": {"$in": joined_ids}}).to_list()
     joined_usernames = [p.get("username", str(p["telegram_id"])) for p in joined_players]
     nb_restants = MAX_PLAYERS - len(joined_ids)
 
@@ -164,7 +156,7 @@ async def handle_freindly_join(update: Update, context: ContextTypes.DEFAULT_TYP
             chat_id=match["creator_id"],
             text=f"Tous les joueurs sont prêts !\nParticipants : {', '.join(joined_usernames)}\nLance un salon vocal dans un groupe Telegram et envoie ici le lien d'invitation du salon vocal."
         )
-        db.freindly_matches.update_one(
+        await db.freindly_matches.update_one(
             {"_id": ObjectId(match_id)},
             {"$set": {"status": "waiting_voice"}}
         )
@@ -179,30 +171,26 @@ async def handle_freindly_join(update: Update, context: ContextTypes.DEFAULT_TYP
 async def handle_voice_link(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
     text = update.message.text
-    match = db.freindly_matches.find_one({"creator_id": user.id, "status": "waiting_voice"})
+    match = await db.freindly_matches.find_one({"creator_id": user.id, "status": "waiting_voice"})
     if not match:
         return ConversationHandler.END
 
-    db.freindly_matches.update_one(
+    await db.freindly_matches.update_one(
         {"_id": match["_id"]},
         {"$set": {"voice_link": text, "status": "voice_ready"}}
     )
 
-    all_ids = set(match["joined_ids"])
-    for pid in all_ids:
-        try:
-            await context.bot.send_message(
-                chat_id=pid,
-                text=f"🔊 Salon vocal lancé ! Rejoignez la discussion ici :\n{text}"
-            )
-        except Exception:
-            continue
+    await fan_out(
+        context.bot,
+        match["joined_ids"],
+        text=f"🔊 Salon vocal lancé ! Rejoignez la discussion ici :\n{text}"
+    )
 
     await context.bot.send_message(
         chat_id=match["creator_id"],
         text="Envoie maintenant le lien de la Game Room Brawl Stars pour que tout le monde puisse rejoindre la partie."
     )
-    db.freindly_matches.update_one(
+    await db.freindly_matches.update_one(
         {"_id": match["_id"]},
         {"$set": {"status": "waiting_brawl_link"}}
     )
@@ -211,24 +199,20 @@ async def handle_voice_link(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def handle_brawl_link(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
     text = update.message.text
-    match = db.freindly_matches.find_one({"creator_id": user.id, "status": "waiting_brawl_link"})
+    match = await db.freindly_matches.find_one({"creator_id": user.id, "status": "waiting_brawl_link"})
     if not match:
         return ConversationHandler.END
 
-    db.freindly_matches.update_one(
+    await db.freindly_matches.update_one(
         {"_id": match["_id"]},
         {"$set": {"brawl_link": text, "status": "ready"}}
     )
 
-    all_ids = set(match["joined_ids"])
-    for pid in all_ids:
-        try:
-            await context.bot.send_message(
-                chat_id=pid,
-                text=f"🎮 Voici le lien de la Game Room Brawl Stars :\n{text}"
-            )
-        except Exception:
-            continue
+    await fan_out(
+        context.bot,
+        match["joined_ids"],
+        text=f"🎮 Voici le lien de la Game Room Brawl Stars :\n{text}"
+    )
     return ConversationHandler.END
 
 def setup_freindly_handlers(application):
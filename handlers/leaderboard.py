@@ -0,0 +1,63 @@
+from core.database import get_database
+from telegram import Update, InlineKeyboardMarkup, InlineKeyboardButton
+from telegram.ext import ContextTypes, CommandHandler, CallbackQueryHandler
+from dotenv import load_dotenv
+from utils.leaderboard import leaderboard, LEADERBOARD_SIZE
+
+load_dotenv()
+db = get_database()
+
+MEDALS = {1: "🥇", 2: "🥈", 3: "🥉"}
+SCOPE_TITLES = {"global": "🌍 Classement mondial", "country": "🏳️ Classement {}", "brawler": "🎯 Classement {}"}
+
+def leaderboard_keyboard():
+    return InlineKeyboardMarkup([[
+        InlineKeyboardButton("🌍 Mondial", callback_data="lb_global"),
+        InlineKeyboardButton("🏳️ Mon pays", callback_data="lb_country"),
+        InlineKeyboardButton("🎯 Mon brawler", callback_data="lb_brawler"),
+    ]])
+
+def render_leaderboard(scope, telegram_id):
+    """Texte du classement demandé, avec le rang du joueur s'il n'est pas dans le top"""
+    me = leaderboard.player(telegram_id)
+    value = ""
+    if scope != "global":
+        value = (me or {}).get("main_brawler" if scope == "brawler" else "country") or ""
+        if not value:
+            return "❌ Renseigne ton pays et ton brawler principal avec /register pour voir ce classement."
+
+    rows = leaderboard.top(scope, value, LEADERBOARD_SIZE)
+    if not rows:
+        return "Aucun joueur classé pour le moment."
+
+    lines = [SCOPE_TITLES[scope].format(value), ""]
+    for row in rows:
+        lines.append(
+            f"{MEDALS.get(row['rank'], str(row['rank']) + '.')} {row.get('username') or 'Inconnu'} — "
+            f"{row.get('trophies') or 0} 🏆 • {row.get('wins') or 0} victoires"
+        )
+
+    rank = leaderboard.rank_of(telegram_id, scope)
+    if rank:
+        lines += ["", f"📍 Ton rang : {rank[0]} / {rank[1]}"]
+    return "\n".join(lines)
+
+async def show_leaderboard(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await leaderboard.ensure_loaded(db)
+    await update.message.reply_text(
+        render_leaderboard("global", update.effective_user.id),
+        reply_markup=leaderboard_keyboard()
+    )
+
+async def handle_leaderboard_scope(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+    await leaderboard.ensure_loaded(db)
+    scope = query.data.split("_", 1)[1]
+    text = render_leaderboard(scope, query.from_user.id)
+    if text != query.message.text:
+        await query.edit_message_text(text, reply_markup=leaderboard_keyboard())
+
+def setup_leaderboard(application):
+    application.add_handler(CommandHandler("leaderboard", show_leaderboard))
+    application.add_handler(CallbackQueryHandler(handle_leaderboard_scope, pattern=r"^lb_(global|country|brawler)$"))
@@ -5,34 +5,50 @@ from telegram.ext import (
     ContextTypes, CallbackQueryHandler, CommandHandler, MessageHandler,
     filters, ConversationHandler
 )
-from datetime import datetime, timedelta
+from datetime import datetime
 import logging
-from pymongo import MongoClient
+from pymongo import ReturnDocument
+from pymongo.errors import OperationFailure
+from core.database import get_database, run_sync
 import cloudinary
 import cloudinary.uploader
+from utils.image_processor import prepare_image
 from bson import ObjectId
+from utils.fanout import spawn_fan_out
+from utils.player_index import player_index, MATCH_ALERT_LIMIT
+from utils.digest import match_digest
+from utils.matcher import match_queue
+from utils.match_results import apply_result
+from models.players import find_player, player_exists
+from utils.media import send_listing
+from utils.scheduler import expiry_time, MATCH_GAMEROOM_TTL, MATCH_SEARCH_TTL
 
 # Charger les variables d'environnement
 load_dotenv()
 cloudinary.config(cloudinary_url=os.getenv("CLOUDINARY_URL"))
 
-MONGO_URI = os.getenv("MONGO_URI")
-DB_NAME = os.getenv("DB_NAME", "brawlbase")
-
 logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     level=logging.INFO
 )
 logger = logging.getLogger(__name__)
 
-try:
-    client = MongoClient(MONGO_URI)
-    db = client[DB_NAME]
-    db.command('ping')
-    logger.info("Connexion MongoDB établie avec succès")
-except Exception as e:
-    logger.critical(f"Échec de connexion à MongoDB: {e}")
-    raise
+db = get_database()
+
+# Cycle de vie d'un match : waiting_gameroom → searching → ready → finished.
+# Chaque transition est une mise à jour gardée par le statut attendu (un seul gagnant en cas de course).
+async def ensure_matchmaking_indexes(db) -> None:
+    """Créés au démarrage (core/bot.py), jamais à l'import"""
+    await db.matches.create_index([("telegram_id", 1), ("mode", 1), ("status", 1)], name="creator_mode_status")
+    # L'appariement passe par la file mémoire (utils/matcher.py) : cet index n'est plus lu
+    # et ne ferait que ralentir chaque écriture de match
+    try:
+        await db.matches.drop_index("mode_status_trophies_created")
+    except OperationFailure:
+        pass
+
+# Tentatives de réservation quand la salle la plus proche est prise entre-temps
+CLAIM_ATTEMPTS = 3
 
 # États pour ConversationHandler
 WAITING_GAMEROOM_LINK = 1001
@@ -43,13 +59,14 @@ async def find_match(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
         user = update.effective_user
 
-        if not db.players.find_one({"telegram_id": user.id}):
+        if not await player_exists(db.players, user.id):
             await update.message.reply_text("⚠️ Utilisez /register avant de chercher un match")
             return ConversationHandler.END
 
-        if db.matches.count_documents({
+        if await db.matches.count_documents({
             "telegram_id": user.id,
-            "status": "searching"
+            "status": "searching",
+            "expires_at": {"$gt": datetime.utcnow()}
         }) > 0:
             keyboard = InlineKeyboardMarkup([
                 [
@@ -63,8 +80,12 @@ async def find_match(update: Update, context: ContextTypes.DEFAULT_TYPE):
             )
             return ConversationHandler.END
 
+        # Par mode : ouvrir sa propre salle, ou rejoindre directement l'adversaire en file le plus proche
         keyboard = InlineKeyboardMarkup([
-            [InlineKeyboardButton(mode, callback_data=f"mode_{mode}")]
+            [
+                InlineKeyboardButton(mode, callback_data=f"mode_{mode}"),
+                InlineKeyboardButton(f"⚡ {mode} auto", callback_data=f"automatch_{mode}")
+            ]
             for mode in ["1v1", "2v2", "3v3"]
         ])
 
@@ -85,7 +106,10 @@ async def handle_cancel_search(update: Update, context: ContextTypes.DEFAULT_TYP
     user = query.from_user
 
     if query.data == "cancel_search_yes":
-        db.matches.delete_many({"telegram_id": user.id, "status": "searching"})
+        match_ids = [str(m["_id"]) async for m in db.matches.find({"telegram_id": user.id, "status": "searching"}, {"_id": 1})]
+        await db.matches.delete_many({"telegram_id": user.id, "status": "searching"})
+        match_digest.discard(match_ids)
+        match_queue.discard(match_ids)
         await query.edit_message_text("✅ Votre recherche de match a été supprimée.")
     else:
         await query.edit_message_text("❌ Recherche de match conservée.")
@@ -97,35 +121,68 @@ async def handle_mode_selection(update: Update, context: ContextTypes.DEFAULT_TY
         user = query.from_user
         mode = query.data.split("_")[1]
 
-        player = db.players.find_one({"telegram_id": user.id})
+        player = await find_player(db.players, user.id, "matchmaking")
         if not player:
             await query.edit_message_text("❌ Profil non trouvé")
             return ConversationHandler.END
+        return await open_lobby(query, context, mode, player)
+
+    except Exception as e:
+        logger.error(f"Erreur handle_mode_selection: {e}", exc_info=True)
+        await query.edit_message_text("❌ Échec de la recherche")
+        return ConversationHandler.END
+
+async def handle_auto_match(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+    try:
+        user = query.from_user
+        mode = query.data.split("_")[1]
+
+        player = await find_player(db.players, user.id, "matchmaking")
+        if not player:
+            await query.edit_message_text("❌ Profil non trouvé")
+            return ConversationHandler.END
+
+        match = await claim_closest_match(mode, player.get("trophies", 0), user)
+        if not match:
+            # Personne en file : le joueur ouvre sa propre salle
+            return await open_lobby(query, context, mode, player)
 
-        match_id = db.matches.insert_one({
-            "telegram_id": user.id,
-            "username": user.username,
-            "mode": mode,
-            "trophies": player["trophies"],
-            "status": "waiting_gameroom",
-            "created_at": datetime.utcnow(),
-            "expires_at": datetime.utcnow() + timedelta(minutes=5)
-        }).inserted_id
-
-        context.user_data["pending_gameroom"] = {
-            "match_id": str(match_id),
-            "mode": mode
-        }
         await query.edit_message_text(
-            "🕹️ Merci de créer une salle amicale dans Brawl Stars, puis copie le lien d'invitation ici pour valider la recherche de match."
+            f"⚡ Adversaire trouvé : {match.get('username') or 'un joueur'} ({match.get('trophies', 0)} trophées) !"
         )
-        return WAITING_GAMEROOM_LINK
+        await notify_match_ready(context, match, user)
+        return ConversationHandler.END
 
     except Exception as e:
-        logger.error(f"Erreur handle_mode_selection: {e}", exc_info=True)
+        logger.error(f"Erreur handle_auto_match: {e}", exc_info=True)
         await query.edit_message_text("❌ Échec de la recherche")
         return ConversationHandler.END
 
+async def open_lobby(query, context: ContextTypes.DEFAULT_TYPE, mode, player):
+    """Crée la salle (waiting_gameroom) et demande le lien de la salle amicale"""
+    user = query.from_user
+    match_id = (await db.matches.insert_one({
+        "telegram_id": user.id,
+        "username": user.username,
+        "mode": mode,
+        "trophies": player["trophies"],
+        "status": "waiting_gameroom",
+        "created_at": datetime.utcnow(),
+        "expires_at": expiry_time(MATCH_GAMEROOM_TTL)
+    })).inserted_id
+
+    context.user_data["pending_gameroom"] = {
+        "match_id": str(match_id),
+        "mode": mode,
+        "trophies": player["trophies"]
+    }
+    await query.edit_message_text(
+        "🕹️ Merci de créer une salle amicale dans Brawl Stars, puis copie le lien d'invitation ici pour valider la recherche de match."
+    )
+    return WAITING_GAMEROOM_LINK
+
 async def handle_gameroom_link(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
     text = update.message.text
@@ -137,29 +194,115 @@ async def handle_gameroom_link(update: Update, context: ContextTypes.DEFAULT_TYP
         await update.message.reply_text("Merci de coller un lien d'invitation valide (commençant par https://).")
         return WAITING_GAMEROOM_LINK
 
-    db.matches.update_one(
-        {"_id": ObjectId(pending["match_id"])},
-        {"$set": {"gameroom_link": text, "status": "searching"}}
+    # La recherche repart pour MATCH_SEARCH_TTL ; au-delà, le nettoyage périodique la supprime
+    now, expires_at = datetime.utcnow(), expiry_time(MATCH_SEARCH_TTL)
+    result = await db.matches.update_one(
+        {"_id": ObjectId(pending["match_id"]), "status": "waiting_gameroom"},
+        {"$set": {"gameroom_link": text, "status": "searching", "searching_since": now, "expires_at": expires_at}}
     )
+    if not result.matched_count:
+        context.user_data.pop("pending_gameroom", None)
+        await update.message.reply_text("⌛ Ta demande de match a expiré. Relance /findmatch.")
+        return ConversationHandler.END
 
     await update.message.reply_text("✅ Lien de la salle enregistré ! Les autres joueurs vont pouvoir rejoindre.")
+    await match_queue.ensure_loaded(db)
+    match_queue.enqueue(pending["match_id"], pending["mode"], pending.get("trophies", 0), user.id, now, expires_at)
 
-    for other in db.players.find({"telegram_id": {"$ne": user.id}}):
-        try:
-            await context.bot.send_message(
-                chat_id=other["telegram_id"],
-                text=f"🔔 {user.username or 'Un joueur'} cherche un match {pending['mode']} !\n"
-                     f"Rejoins la salle amicale avec ce lien :\n{text}",
-                reply_markup=InlineKeyboardMarkup([
-                    [InlineKeyboardButton("Rejoindre", callback_data=f"join_{user.id}_{pending['mode']}")]
-                ])
-            )
-        except Exception:
-            continue
+    # Seuls les joueurs actifs abonnés au mode et les plus proches en trophées sont notifiés
+    await player_index.ensure_loaded(db)
+    candidates = player_index.nearest(
+        pending["mode"], pending.get("trophies", 0), MATCH_ALERT_LIMIT, exclude=[user.id]
+    )
+
+    # Les joueurs en mode résumé reçoivent toutes les salles ouvertes en un seul message
+    digest = [tid for tid in candidates if player_index.wants_digest(tid)]
+    instant = [tid for tid in candidates if not player_index.wants_digest(tid)]
+    if digest:
+        match_digest.add(context.application, db, digest, {
+            "match_id": pending["match_id"],
+            "creator_id": user.id,
+            "username": user.username,
+            "mode": pending["mode"],
+            "link": text
+        })
+
+    # Les notifications partent en tâche de fond : la conversation n'attend pas la fin de l'envoi
+    spawn_fan_out(
+        context,
+        instant,
+        f"findmatch {pending['match_id']}",
+        text=f"🔔 {user.username or 'Un joueur'} cherche un match {pending['mode']} !\n"
+             f"Rejoins la salle amicale avec ce lien :\n{text}",
+        reply_markup=InlineKeyboardMarkup([
+            [InlineKeyboardButton("Rejoindre", callback_data=f"join_{user.id}_{pending['mode']}")]
+        ])
+    )
 
     context.user_data.pop("pending_gameroom", None)
     return ConversationHandler.END
 
+async def claim_match(query, joiner):
+    """
+    Passe une salle de searching à ready en un seul aller-retour
+    :param query: Filtre de la salle visée (_id, ou créateur et mode)
+    :return: Le match réservé, ou None si la salle a déjà été prise ou a expiré
+    """
+    match = await db.matches.find_one_and_update(
+        {**query, "status": "searching", "expires_at": {"$gt": datetime.utcnow()}},
+        {
+            "$set": {"status": "ready", "opponent_id": joiner.id, "opponent_username": joiner.username},
+            "$unset": {"expires_at": ""}
+        },
+        return_document=ReturnDocument.AFTER
+    )
+    if match:
+        match_digest.discard([str(match["_id"])])
+        match_queue.remove(str(match["_id"]))
+    return match
+
+async def claim_closest_match(mode, trophies, joiner):
+    """
+    Réserve la salle en file la plus proche en trophées : la file mémoire (utils/matcher.py)
+    choisit la salle, la réservation reste atomique côté base
+    """
+    await match_queue.ensure_loaded(db)
+    for _ in range(CLAIM_ATTEMPTS):
+        match_id = match_queue.find_opponent(mode, trophies, exclude=joiner.id)
+        if not match_id:
+            return None
+        match = await claim_match({"_id": ObjectId(match_id)}, joiner)
+        if match:
+            return match
+        # Salle prise ou supprimée entre-temps : on la retire de la file et on recommence
+        match_queue.remove(match_id)
+    return None
+
+async def notify_match_ready(context: ContextTypes.DEFAULT_TYPE, match, joiner):
+    creator_id = match["telegram_id"]
+    await context.bot.send_message(
+        chat_id=creator_id,
+        text=f"✅ {joiner.full_name} (@{joiner.username or 'aucun pseudo'}) a rejoint votre match {match['mode']} !"
+    )
+
+    gameroom_link = match.get("gameroom_link", "Lien non disponible")
+
+    await context.bot.send_message(
+        chat_id=joiner.id,
+        text=f"🎮 Good game !\nVoici le lien de la Game Room :\n{gameroom_link}",
+        reply_markup=InlineKeyboardMarkup([
+            [InlineKeyboardButton("Fin de match", callback_data=f"endmatch_{str(match['_id'])}")]
+        ])
+    )
+
+    await context.bot.send_message(
+        chat_id=creator_id,
+        text="Quand le match est terminé, appuie sur le bouton ci-dessous.",
+        reply_markup=InlineKeyboardMarkup([
+            [InlineKeyboardButton("Fin de match", callback_data=f"endmatch_{str(match['_id'])}")]
+        ])
+    )
+
 async def handle_join_match(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
@@ -169,41 +312,17 @@ async def handle_join_match(update: Update, context: ContextTypes.DEFAULT_TYPE):
         mode = data[2]
         joiner = query.from_user
 
-        match = db.matches.find_one({"telegram_id": creator_id, "mode": mode, "status": "searching"})
+        if creator_id == joiner.id:
+            await query.edit_message_text("❌ Tu ne peux pas rejoindre ta propre recherche.")
+            return
+
+        # Réservation atomique : deux joueurs ne peuvent pas prendre la même salle
+        match = await claim_match({"telegram_id": creator_id, "mode": mode}, joiner)
         if not match:
             await query.edit_message_text("❌ Ce match n'est plus disponible.")
             return
 
-        db.matches.update_one(
-            {"_id": match["_id"]},
-            {"$set": {"status": "ready", "opponent_id": joiner.id, "opponent_username": joiner.username}}
-        )
-
-        creator = db.players.find_one({"telegram_id": creator_id})
-        creator_username = creator.get("username", "un joueur") if creator else "un joueur"
-
-        await context.bot.send_message(
-            chat_id=creator_id,
-            text=f"✅ {joiner.full_name} (@{joiner.username or 'aucun pseudo'}) a rejoint votre match {mode} !"
-        )
-
-        gameroom_link = match.get("gameroom_link", "Lien non disponible")
-
-        await context.bot.send_message(
-            chat_id=joiner.id,
-            text=f"🎮 Good game !\nVoici le lien de la Game Room :\n{gameroom_link}",
-            reply_markup=InlineKeyboardMarkup([
-                [InlineKeyboardButton("Fin de match", callback_data=f"endmatch_{str(match['_id'])}")]
-            ])
-        )
-
-        await context.bot.send_message(
-            chat_id=creator_id,
-            text="Quand le match est terminé, appuie sur le bouton ci-dessous.",
-            reply_markup=InlineKeyboardMarkup([
-                [InlineKeyboardButton("Fin de match", callback_data=f"endmatch_{str(match['_id'])}")]
-            ])
-        )
+        await notify_match_ready(context, match, joiner)
 
     except Exception as e:
         logger.error(f"Erreur handle_join_match: {e}", exc_info=True)
@@ -229,7 +348,7 @@ async def handle_match_result(update: Update, context: ContextTypes.DEFAULT_TYPE
     _, match_id, result = query.data.split("_")
     user = query.from_user
 
-    db.match_results.update_one(
+    await db.match_results.update_one(
         {"match_id": match_id, "telegram_id": user.id},
         {"$set": {"result": result, "answered": True}},
         upsert=True
@@ -244,7 +363,7 @@ async def handle_match_screenshot(update: Update, context: ContextTypes.DEFAULT_
         await update.message.reply_text("Merci d'envoyer une photo.")
         return WAITING_MATCH_SCREENSHOT
 
-    result = db.match_results.find_one({"telegram_id": user.id, "answered": True, "screenshot": {"$exists": False}})
+    result = await db.match_results.find_one({"telegram_id": user.id, "answered": True, "screenshot": {"$exists": False}})
     if not result:
         await update.message.reply_text("Aucun match à valider ou capture déjà envoyée.")
         return ConversationHandler.END
@@ -253,46 +372,56 @@ async def handle_match_screenshot(update: Update, context: ContextTypes.DEFAULT_
 
     photo_file = await update.message.photo[-1].get_file()
     photo_bytes = await photo_file.download_as_bytearray()
+    photo_bytes = await prepare_image(photo_bytes, "screenshot")
 
-    result_cloud = cloudinary.uploader.upload(photo_bytes, folder="brawlstars_match_screens")
+    result_cloud = await run_sync(cloudinary.uploader.upload, photo_bytes, folder="brawlstars_match_screens")
     photo_url = result_cloud.get("secure_url")
 
-    db.match_results.update_one(
+    await db.match_results.update_one(
         {"match_id": match_id, "telegram_id": user.id},
         {"$set": {"screenshot": photo_url}}
     )
 
     await update.message.reply_text("✅ Capture reçue !")
 
-    match = db.matches.find_one({"_id": ObjectId(match_id)})
+    match = await db.matches.find_one({"_id": ObjectId(match_id)})
     if not match:
         return ConversationHandler.END
     ids = [match["telegram_id"], match["opponent_id"]]
-    results = list(db.match_results.find({"match_id": match_id, "telegram_id": {"$in": ids}}))
+    results = await db.match_results.find({"match_id": match_id, "telegram_id": {"$in": ids}}).to_list()
 
     if len(results) == 2 and all("screenshot" in r for r in results):
-        for r in results:
-            win = 1 if r["result"] == "win" else 0
-            lose = 1 if r["result"] == "lose" else 0
-            db.players.update_one({"telegram_id": r["telegram_id"]}, {
-                "$inc": {"matches_played": 1, "wins": win, "defeats": lose}
-            })
-        db.matches.update_one({"_id": ObjectId(match_id)}, {"$set": {"status": "finished"}})
+        # Statistiques en un seul bulk_write, idempotent : une finalisation rejouée ne compte pas deux fois
+        await apply_result(db, f"match:{match_id}", {r["telegram_id"]: r["result"] for r in results})
+        # ready → finished une seule fois, même si les deux captures arrivent en même temps
+        finished = await db.matches.find_one_and_update(
+            {"_id": ObjectId(match_id), "status": "ready"},
+            {"$set": {"status": "finished"}},
+            projection={"_id": 1}
+        )
+        if not finished:
+            return ConversationHandler.END
         for pid in ids:
             await context.bot.send_message(pid, "🎉 Match terminé, statistiques mises à jour !")
     return ConversationHandler.END
 
 async def news(update: Update, context: ContextTypes.DEFAULT_TYPE):
     news_items = db.match_screens.find().sort("timestamp", -1).limit(5)
-    for item in news_items:
-        await update.message.reply_photo(
-            photo=item["photo_url"],
-            caption=f"Match de {item.get('username', 'un joueur')} le {item['timestamp'].strftime('%d/%m/%Y %H:%M')}"
-        )
+    await send_listing(context.bot, update.effective_chat.id, [
+        (item["photo_url"], f"Match de {item.get('username', 'un joueur')} le {item['timestamp'].strftime('%d/%m/%Y %H:%M')}")
+        async for item in news_items
+    ], db=db)
 
 def setup_handlers(application):
     conv_handler = ConversationHandler(
-        entry_points=[CommandHandler("findmatch", find_match)],
+        # Les boutons de mode et de résultat ouvrent la conversation pour que
+        # l'étape suivante (lien de la salle, capture) soit bien attendue
+        entry_points=[
+            CommandHandler("findmatch", find_match),
+            CallbackQueryHandler(handle_mode_selection, pattern="^mode_"),
+            CallbackQueryHandler(handle_auto_match, pattern="^automatch_"),
+            CallbackQueryHandler(handle_match_result, pattern="^result_"),
+        ],
         states={
             WAITING_GAMEROOM_LINK: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_gameroom_link)],
             WAITING_MATCH_SCREENSHOT: [MessageHandler(filters.PHOTO, handle_match_screenshot)],
@@ -302,8 +431,6 @@ def setup_handlers(application):
     )
     application.add_handler(conv_handler)
     application.add_handler(CallbackQueryHandler(handle_cancel_search, pattern="^cancel_search_"))
-    application.add_handler(CallbackQueryHandler(handle_mode_selection, pattern="^mode_"))
     application.add_handler(CallbackQueryHandler(handle_join_match, pattern="^join_"))
     application.add_handler(CallbackQueryHandler(handle_end_match, pattern="^endmatch_"))
-    application.add_handler(CallbackQueryHandler(handle_match_result, pattern="^result_"))
     application.add_handler(CommandHandler("news", news))
\ No newline at end of file
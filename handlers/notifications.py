@@ -0,0 +1,68 @@
+from core.database import get_database
+from telegram import Update, InlineKeyboardMarkup, InlineKeyboardButton
+from telegram.ext import ContextTypes, CommandHandler, CallbackQueryHandler
+from dotenv import load_dotenv
+from utils.player_index import player_index, MODES, MATCH_DELIVERY_DEFAULT
+from utils.registered import registered_players
+
+load_dotenv()
+db = get_database()
+
+DELIVERY_LABELS = {
+    "instant": "📨 Réception : un message par match",
+    "digest": "📬 Réception : résumé groupé"
+}
+
+def notifications_keyboard(modes, delivery):
+    keyboard = [
+        [InlineKeyboardButton(f"{'✅' if mode in modes else '❌'} {mode}", callback_data=f"notif_mode_{mode}")]
+        for mode in MODES
+    ]
+    keyboard.append([InlineKeyboardButton(DELIVERY_LABELS[delivery], callback_data="notif_delivery")])
+    return InlineKeyboardMarkup(keyboard)
+
+async def notifications(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user = update.effective_user
+    player = None
+    if not registered_players.surely_absent(user.id):
+        player = await db.players.find_one({"telegram_id": user.id}, {"match_alerts": 1, "match_delivery": 1})
+    if not player:
+        await update.message.reply_text("❌ Tu n'es pas encore inscrit. Utilise /register pour créer ton profil.")
+        return
+
+    modes = player.get("match_alerts", MODES)
+    delivery = player.get("match_delivery", MATCH_DELIVERY_DEFAULT)
+    await update.message.reply_text(
+        "🔔 Choisis les modes pour lesquels tu veux être prévenu quand un joueur de ton niveau cherche un match, "
+        "et si tu préfères recevoir les invitations une par une ou regroupées :",
+        reply_markup=notifications_keyboard(modes, delivery)
+    )
+
+async def handle_notification_toggle(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+    user = query.from_user
+
+    player = await db.players.find_one({"telegram_id": user.id}, {"match_alerts": 1, "match_delivery": 1})
+    if not player:
+        await query.edit_message_text("❌ Profil non trouvé")
+        return
+
+    modes = list(player.get("match_alerts", MODES))
+    delivery = player.get("match_delivery", MATCH_DELIVERY_DEFAULT)
+    if query.data == "notif_delivery":
+        delivery = "instant" if delivery == "digest" else "digest"
+    else:
+        mode = query.data.split("_")[2]
+        if mode in modes:
+            modes.remove(mode)
+        else:
+            modes.append(mode)
+
+    await db.players.update_one({"telegram_id": user.id}, {"$set": {"match_alerts": modes, "match_delivery": delivery}})
+    player_index.upsert({"telegram_id": user.id, "match_alerts": modes, "match_delivery": delivery})
+    await query.edit_message_reply_markup(reply_markup=notifications_keyboard(modes, delivery))
+
+def setup_notification_handlers(application):
+    application.add_handler(CommandHandler("notifications", notifications))
+    application.add_handler(CallbackQueryHandler(handle_notification_toggle, pattern="^notif_(mode_|delivery$)"))
@@ -1,46 +1,25 @@
-import os
-from pymongo import MongoClient
+from core.database import get_database
 from telegram import Update
 from telegram.ext import ContextTypes
 from dotenv import load_dotenv
-from datetime import datetime
+from utils.media import send_photo_cached
+from utils.formatters import profile_cards
 
 load_dotenv()
-client = MongoClient(os.getenv('MONGO_URI'))
-db = client[os.getenv("DB_NAME", "brawlbase")]
+db = get_database()
 
 async def profile(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
-    player = db.players.find_one({"telegram_id": user.id})
+    # Fiche pré-rendue (utils/formatters.py), sans requête si déjà en cache
+    card = await profile_cards.get(db, user.id)
 
-    if not player:
+    if not card:
         await update.message.reply_text(" Tu n'es pas encore inscrit. Utilise /register pour créer ton profil.")
         return
 
-    # Récupère la team si elle existe
-    team_name = None
-    if player.get("team_id"):
-        team = db.teams.find_one({"_id": player["team_id"]})
-        if team:
-            team_name = team.get("name")
+    msg = f"**Ton profil Brawl Stars**\n{card['text']}"
 
-    msg = (
-        f"👤 **Ton profil Brawl Stars**\n"
-        f"• Pseudo : {player.get('username', 'Inconnu')}\n"
-        f"• Trophées : {player.get('trophies', 'N/A')}\n"
-        f"• Brawler principal : {player.get('main_brawler', 'N/A')}\n"
-        f"• Pays : {player.get('country', 'N/A')}\n"
-        f"• Team : {team_name if team_name else 'Aucune'}\n"
-        f"• Victoires : {player.get('wins', 0)}\n"
-        f"• Défaites : {player.get('defeats', 0)}\n"
-        f"• Matchs joués : {player.get('matches_played', 0)}\n"
-        f"• Inscrit le : {player.get('registered_at', datetime.utcnow()).strftime('%d/%m/%Y %H:%M')}\n"
-    )
-
-    if player.get("profile_photo"):
-        await update.message.reply_photo(
-            photo=player["profile_photo"],
-            caption=msg
-        )
+    if card["photo"]:
+        await send_photo_cached(context.bot, db, update.effective_chat.id, card["photo"], caption=msg)
     else:
         await update.message.reply_text(msg)
\ No newline at end of file
@@ -7,15 +7,24 @@ from telegram.ext import (
 from datetime import datetime
 import cloudinary
 import cloudinary.uploader
-from pymongo import MongoClient
+from utils.image_processor import prepare_image
+from core.database import get_database, run_sync
+from pymongo.errors import DuplicateKeyError
 import logging
+from utils.player_index import player_index
+from utils.names import normalize_name
+from utils.name_search import player_search
+from utils.leaderboard import leaderboard
+from utils.player_cache import player_cache
+from utils.formatters import profile_cards
+from utils.registered import registered_players
+from utils.team_snapshots import refresh_member
+from models.players import find_player, player_exists
 
 ASK_USERNAME, ASK_TROPHIES, ASK_BRAWLER, ASK_COUNTRY, ASK_PHONE, ASK_PHOTO, ASK_UPDATE_TROPHIES = range(7)
 
 load_dotenv()
 cloudinary.config(cloudinary_url=os.getenv("CLOUDINARY_URL"))
-MONGO_URI = os.getenv("MONGO_URI")
-DB_NAME = os.getenv("DB_NAME", "brawlbase")
 
 logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
@@ -23,17 +32,11 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-try:
-    client = MongoClient(MONGO_URI)
-    db = client[DB_NAME]
-    db.command('ping')
-except Exception as e:
-    logger.critical(f"Échec de connexion à MongoDB: {e}")
-    raise
+db = get_database()
 
 async def start_register(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
-    player = db.players.find_one({'telegram_id': user.id})
+    player = await find_player(db.players, user.id, "greeting")
     if player:
         await update.message.reply_text(
             f"✅ Tu es déjà inscrit sous le pseudo : {player.get('username', 'inconnu')}\n"
@@ -45,7 +48,7 @@ async def start_register(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def start_modify(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
-    player = db.players.find_one({'telegram_id': user.id})
+    player = await db.players.find_one({'telegram_id': user.id})
     if not player:
         await update.message.reply_text(
             "❌ Tu n'es pas encore inscrit. Utilise /register pour créer ton profil."
@@ -70,6 +73,10 @@ async def ask_username(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not username:
         await update.message.reply_text("❌ Merci d'entrer un pseudo valide.")
         return ASK_USERNAME
+    existing = await db.players.find_one({"username_lc": normalize_name(username)}, {"telegram_id": 1})
+    if existing and existing["telegram_id"] != update.effective_user.id:
+        await update.message.reply_text("❌ Ce pseudo est déjà utilisé par un autre joueur.")
+        return ASK_USERNAME
     context.user_data['username'] = username
     await update.message.reply_text("Combien as-tu de trophées ?")
     return ASK_TROPHIES
@@ -126,12 +133,14 @@ async def ask_photo(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if update.message.photo:
         photo_file = await update.message.photo[-1].get_file()
         photo_bytes = await photo_file.download_as_bytearray()
-        result = cloudinary.uploader.upload(photo_bytes, folder="brawlstars_profiles")
+        photo_bytes = await prepare_image(photo_bytes, "profile")
+        result = await run_sync(cloudinary.uploader.upload, photo_bytes, folder="brawlstars_profiles")
         photo_url = result.get("secure_url")
 
     player_data = {
         "telegram_id": user.id,
         "username": username,
+        "username_lc": normalize_name(username),
         "trophies": trophies,
         "main_brawler": main_brawler,
         "country": country,
@@ -143,11 +152,22 @@ async def ask_photo(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "wins": 0
     }
 
-    db.players.update_one(
-        {"telegram_id": user.id},
-        {"$set": player_data},
-        upsert=True
-    )
+    try:
+        await db.players.update_one(
+            {"telegram_id": user.id},
+            {"$set": player_data},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        await update.message.reply_text("❌ Ce pseudo vient d'être pris par un autre joueur. Recommence avec /register ou /modify.")
+        return ConversationHandler.END
+    player_cache.invalidate([user.id])
+    profile_cards.bump([user.id])
+    registered_players.add(user.id)
+    await refresh_member(db, user.id, username=username, trophies=trophies)
+    player_index.upsert(player_data)
+    player_search.upsert(user.id, username)
+    leaderboard.upsert(player_data)
 
     await update.message.reply_text(
         f"🎉 Profil enregistré/modifié !\n"
@@ -167,6 +187,9 @@ async def skip_photo(update: Update, context: ContextTypes.DEFAULT_TYPE):
 # ----------- /updatetrophies -----------
 
 async def start_update_trophies(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not await player_exists(db.players, update.effective_user.id):
+        await update.message.reply_text(" Tu n'es pas encore inscrit. Utilise /register pour créer ton profil.")
+        return ConversationHandler.END
     await update.message.reply_text("Combien as-tu de trophées actuellement ?")
     return ASK_UPDATE_TROPHIES
 
@@ -176,10 +199,18 @@ async def update_trophies_value(update: Update, context: ContextTypes.DEFAULT_TY
         if trophies < 0 or trophies > 250000:
             raise ValueError
         user = update.effective_user
-        db.players.update_one(
+        now = datetime.utcnow()
+        result = await db.players.update_one(
             {"telegram_id": user.id},
-            {"$set": {"trophies": trophies, "last_active": datetime.utcnow()}}
+            {"$set": {"trophies": trophies, "last_active": now}}
         )
+        player_cache.invalidate([user.id])
+        profile_cards.bump([user.id])
+        await refresh_member(db, user.id, trophies=trophies)
+        if result.matched_count:
+            # Un non-inscrit (ou banni entre-temps) ne doit entrer ni dans l'index des alertes ni au classement
+            player_index.upsert({"telegram_id": user.id, "trophies": trophies, "last_active": now})
+            leaderboard.upsert({"telegram_id": user.id, "trophies": trophies, "last_active": now})
         await update.message.reply_text(f"✅ Tes trophées ont été mis à jour à {trophies} !")
         return ConversationHandler.END
     except ValueError:
@@ -4,18 +4,24 @@ from telegram import Update, InlineKeyboardMarkup, InlineKeyboardButton
 from telegram.ext import (
     ContextTypes, ConversationHandler, CommandHandler, MessageHandler, CallbackQueryHandler, filters
 )
-from pymongo import MongoClient
+from core.database import get_database, run_sync
 from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
 import cloudinary
 import cloudinary.uploader
+from utils.image_processor import prepare_image
 import logging
+from utils.names import normalize_name
+from utils.team_snapshots import team_snapshots
+from utils.name_search import player_search, team_search
+from utils.keyboards import suggestions_keyboard
+from models.teams import create_team, update_team, TeamConflict
+from models.players import find_player
 
 ASK_TEAM_NAME, ASK_TEAM_COUNTRY, ASK_MEMBER_PSEUDO, WAIT_MEMBER_ACTION, ASK_TEAM_LOGO = range(5)
 
 load_dotenv()
 cloudinary.config(cloudinary_url=os.getenv("CLOUDINARY_URL"))
-MONGO_URI = os.getenv("MONGO_URI")
-DB_NAME = os.getenv("DB_NAME", "brawlbase")
 
 logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
@@ -23,13 +29,7 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-try:
-    client = MongoClient(MONGO_URI)
-    db = client[DB_NAME]
-    db.command('ping')
-except Exception as e:
-    logger.critical(f"Échec de connexion à MongoDB: {e}")
-    raise
+db = get_database()
 
 MAX_MEMBERS = 5  # Par exemple
 
@@ -38,7 +38,7 @@ MAX_MEMBERS = 5  # Par exemple
 async def start_team_registration(update: Update, context: ContextTypes.DEFAULT_TYPE):
     context.user_data.clear()
     user = update.effective_user
-    player = db.players.find_one({"telegram_id": user.id})
+    player = await find_player(db.players, user.id, "team")
     if not player:
         await update.message.reply_text("❌ Tu dois avoir un profil joueur pour créer une team (/register).")
         return ConversationHandler.END
@@ -58,14 +58,21 @@ async def start_team_registration(update: Update, context: ContextTypes.DEFAULT_
 
 async def start_team_modify(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
-    team = db.teams.find_one({"member_ids": user.id})
+    # Instantané de la team : nom, pays et pseudos des membres sans autre requête
+    player = await find_player(db.players, user.id, "team")
+    team = await team_snapshots.get(db, player.get("team_id")) if player else None
     if not team:
         await update.message.reply_text("❌ Tu n'es membre d'aucune team à modifier.")
         return ConversationHandler.END
 
     context.user_data.clear()
     context.user_data["team_id"] = str(team["_id"])
-    context.user_data["members"] = [{"telegram_id": tid, "username": db.players.find_one({"telegram_id": tid}).get("username", str(tid))} for tid in team["member_ids"]]
+    # Version lue au départ : une modification concurrente de la team sera refusée à l'enregistrement
+    context.user_data["team_version"] = team.get("version")
+    context.user_data["members"] = [
+        {"telegram_id": m["telegram_id"], "username": m.get("username") or str(m["telegram_id"])}
+        for m in team["members"]
+    ]
     context.user_data["team_name"] = team["name"]
     context.user_data["team_country"] = team.get("country", "")
     context.user_data["mode"] = "modify"
@@ -83,6 +90,10 @@ async def ask_team_name(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not team_name:
         await update.message.reply_text("❌ Merci d'entrer un nom de team valide.")
         return ASK_TEAM_NAME
+    existing = await db.teams.find_one({"name_lc": normalize_name(team_name)}, {"_id": 1})
+    if existing and str(existing["_id"]) != context.user_data.get("team_id"):
+        await update.message.reply_text("❌ Ce nom de team est déjà pris, choisis-en un autre.")
+        return ASK_TEAM_NAME
     context.user_data["team_name"] = team_name
     await update.message.reply_text("Dans quel pays est basée votre team ?")
     return ASK_TEAM_COUNTRY
@@ -105,25 +116,48 @@ async def ask_team_country(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def ask_member_pseudo(update: Update, context: ContextTypes.DEFAULT_TYPE):
     pseudo = update.message.text.strip().lstrip("@")
-    player = db.players.find_one({"username": {"$regex": f"^{pseudo}$", "$options": "i"}})
+    player = await db.players.find_one({"username_lc": normalize_name(pseudo)})
+    if not player:
+        # Pseudos proches proposés en boutons (faute de frappe, début du pseudo)
+        await player_search.ensure_loaded(db)
+        matches = player_search.search(pseudo)
+        if matches:
+            await update.message.reply_text(
+                "❌ Pseudo incorrect. Choisis un joueur ou envoie un autre pseudo :",
+                reply_markup=suggestions_keyboard(matches, "pick_member_")
+            )
+        else:
+            await update.message.reply_text("❌ Pseudo incorrect, veuillez réessayer.")
+        return ASK_MEMBER_PSEUDO
+    return await append_member(update, context, player)
+
+async def pick_member(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+    player = await db.players.find_one({"telegram_id": int(query.data.split("_")[2])})
     if not player:
-        await update.message.reply_text("❌ Pseudo incorrect, veuillez réessayer.")
+        await query.edit_message_text("❌ Ce joueur n'existe plus, envoie un autre pseudo.")
         return ASK_MEMBER_PSEUDO
+    await query.edit_message_reply_markup(None)
+    return await append_member(update, context, player)
 
+async def append_member(update: Update, context: ContextTypes.DEFAULT_TYPE, player):
+    """Ajoute le joueur trouvé (saisie exacte ou bouton de suggestion) aux membres en cours"""
+    message = update.effective_message
     members = context.user_data.get("members", [])
     if player["telegram_id"] in [m["telegram_id"] for m in members]:
-        await update.message.reply_text("Ce joueur est déjà dans la team.")
+        await message.reply_text("Ce joueur est déjà dans la team.")
         return ASK_MEMBER_PSEUDO
 
     # Vérifie que le joueur n'a pas déjà une team (sauf si on modifie et qu'il est déjà dans celle-ci)
     if context.user_data.get("mode") == "modify":
         team_id = ObjectId(context.user_data["team_id"])
         if player.get("team_id") and player.get("team_id") != team_id:
-            await update.message.reply_text("Ce joueur fait déjà partie d'une autre team.")
+            await message.reply_text("Ce joueur fait déjà partie d'une autre team.")
             return ASK_MEMBER_PSEUDO
     else:
         if player.get("team_id"):
-            await update.message.reply_text("Ce joueur fait déjà partie d'une autre team.")
+            await message.reply_text("Ce joueur fait déjà partie d'une autre team.")
             return ASK_MEMBER_PSEUDO
 
     members.append({
@@ -141,7 +175,7 @@ async def ask_member_pseudo(update: Update, context: ContextTypes.DEFAULT_TYPE):
             InlineKeyboardButton("Team complète", callback_data="team_complete")
         ]
     ])
-    await update.message.reply_text(msg, reply_markup=keyboard)
+    await message.reply_text(msg, reply_markup=keyboard)
     return WAIT_MEMBER_ACTION
 
 async def wait_member_action(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -171,51 +205,55 @@ async def ask_team_logo(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     photo_file = await update.message.photo[-1].get_file()
     photo_bytes = await photo_file.download_as_bytearray()
-    result = cloudinary.uploader.upload(photo_bytes, folder="brawlstars_teams")
+    photo_bytes = await prepare_image(photo_bytes, "logo")
+    result = await run_sync(cloudinary.uploader.upload, photo_bytes, folder="brawlstars_teams")
     logo_url = result.get("secure_url")
 
     team_name = context.user_data["team_name"]
     team_country = context.user_data.get("team_country", "")
     member_ids = [m["telegram_id"] for m in context.user_data["members"]]
 
-    if context.user_data.get("mode") == "modify":
-        team_id = ObjectId(context.user_data["team_id"])
-        db.teams.update_one(
-            {"_id": team_id},
-            {"$set": {"name": team_name, "country": team_country, "member_ids": member_ids, "logo_url": logo_url}}
-        )
-        # Mets à jour les joueurs (enlève l'ancien team_id pour ceux qui ne sont plus dans la team)
-        db.players.update_many(
-            {"team_id": team_id, "telegram_id": {"$nin": member_ids}},
-            {"$set": {"team_id": None}}
-        )
-        db.players.update_many(
-            {"telegram_id": {"$in": member_ids}},
-            {"$set": {"team_id": team_id}}
-        )
+    modify = context.user_data.get("mode") == "modify"
+    retry_command = "/modifyteam" if modify else "/registerteam"
+    try:
+        # Team et players.team_id écrits ensemble (models/teams.py) : tout ou rien
+        if modify:
+            team_id = ObjectId(context.user_data["team_id"])
+            await update_team(
+                team_id, context.user_data.get("team_version"),
+                team_name, team_country, member_ids, logo_url
+            )
+        else:
+            team_id = await create_team(
+                team_name, context.user_data["creator_id"], member_ids, team_country, logo_url
+            )
+    except DuplicateKeyError:
+        await update.message.reply_text(f"❌ Ce nom de team vient d'être pris. Recommence avec {retry_command}.")
+        return ConversationHandler.END
+    except TeamConflict as e:
+        taken = [m["username"] for m in context.user_data["members"] if m["telegram_id"] in e.player_ids]
+        detail = f" Joueurs concernés : {', '.join(taken)}." if taken else ""
+        await update.message.reply_text(f"❌ {e}{detail} Recommence avec {retry_command}.")
+        return ConversationHandler.END
+    except Exception as e:
+        logger.error(f"Erreur enregistrement team '{team_name}': {e}", exc_info=True)
+        await update.message.reply_text(f"❌ Erreur lors de l'enregistrement de la team. Recommence avec {retry_command}.")
+        return ConversationHandler.END
+
+    team_search.upsert(team_id, team_name)
+    members = ', '.join([m['username'] for m in context.user_data['members']])
+    if modify:
         await update.message.reply_text(
             f"✅ Team '{team_name}' modifiée avec succès !\n"
             f"Pays : {team_country}\n"
-            f"Membres : {', '.join([m['username'] for m in context.user_data['members']])}\n"
+            f"Membres : {members}\n"
             f"Logo mis à jour."
         )
     else:
-        team = {
-            "name": team_name,
-            "country": team_country,
-            "member_ids": member_ids,
-            "logo_url": logo_url,
-            "creator_id": context.user_data["creator_id"]
-        }
-        team_id = db.teams.insert_one(team).inserted_id
-        db.players.update_many(
-            {"telegram_id": {"$in": member_ids}},
-            {"$set": {"team_id": team_id}}
-        )
         await update.message.reply_text(
             f"🎉 Team '{team_name}' enregistrée avec succès !\n"
             f"Pays : {team_country}\n"
-            f"Membres : {', '.join([m['username'] for m in context.user_data['members']])}\n"
+            f"Membres : {members}\n"
             f"Logo enregistré."
         )
     return ConversationHandler.END
@@ -229,7 +267,10 @@ def setup_team_registration(application):
         states={
             ASK_TEAM_NAME: [MessageHandler(filters.TEXT & ~filters.COMMAND, ask_team_name)],
             ASK_TEAM_COUNTRY: [MessageHandler(filters.TEXT & ~filters.COMMAND, ask_team_country)],
-            ASK_MEMBER_PSEUDO: [MessageHandler(filters.TEXT & ~filters.COMMAND, ask_member_pseudo)],
+            ASK_MEMBER_PSEUDO: [
+                MessageHandler(filters.TEXT & ~filters.COMMAND, ask_member_pseudo),
+                CallbackQueryHandler(pick_member, pattern=r"^pick_member_\d+$")
+            ],
             WAIT_MEMBER_ACTION: [CallbackQueryHandler(wait_member_action, pattern="^(add_member|team_complete)$")],
             ASK_TEAM_LOGO: [MessageHandler(filters.PHOTO, ask_team_logo)],
         },
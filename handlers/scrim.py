@@ -1,5 +1,4 @@
-import os
-from pymongo import MongoClient
+from core.database import get_database
 from telegram import Update, InlineKeyboardMarkup, InlineKeyboardButton
 from telegram.ext import (
     ContextTypes, ConversationHandler, CommandHandler, MessageHandler, CallbackQueryHandler, filters
@@ -7,27 +6,41 @@ from telegram.ext import (
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
 import asyncio
+from utils.fanout import fan_out, spawn_fan_out
+from utils.reachability import REACHABLE_FILTER
+from utils.names import normalize_name
+from utils.match_results import apply_result
+from bson import ObjectId
+from models.players import find_player
+from utils.team_snapshots import team_snapshots
 
 load_dotenv()
-client = MongoClient(os.getenv('MONGO_URI'))
-db = client[os.getenv("DB_NAME", "brawlbase")]
+db = get_database()
 
 ASK_OPPONENT, ASK_TIME, CONFIRM_MEMBERS, WAIT_LINKS, ASK_SCORE, ASK_SCREENSHOTS = range(6)
 
+async def scrim_teams(context):
+    """Les deux teams du scrim (instantanés avec pseudos et trophées des membres), une requête au plus"""
+    team_id, opponent_team_id = context.user_data["team_id"], context.user_data["opponent_team_id"]
+    teams = await team_snapshots.get_many(db, [team_id, opponent_team_id])
+    return teams.get(ObjectId(team_id)), teams.get(ObjectId(opponent_team_id))
+
 async def start_scrim(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
-    player = db.players.find_one({"telegram_id": user.id})
+    player = await find_player(db.players, user.id, "team")
     if not player or not player.get("team_id"):
         await update.message.reply_text("❌ Tu dois être membre d'une team pour demander un scrim.")
         return ConversationHandler.END
     context.user_data["creator_id"] = user.id
     context.user_data["team_id"] = player["team_id"]
+    # Identifiant du scrim : clé du résultat, rend la finalisation idempotente
+    context.user_data["scrim_id"] = str(ObjectId())
     await update.message.reply_text("Quel est le nom de la team que tu veux affronter ?")
     return ASK_OPPONENT
 
 async def ask_opponent(update: Update, context: ContextTypes.DEFAULT_TYPE):
     opponent_name = update.message.text.strip()
-    opponent_team = db.teams.find_one({"name": {"$regex": f"^{opponent_name}$", "$options": "i"}})
+    opponent_team = await db.teams.find_one({"name_lc": normalize_name(opponent_name)})
     if not opponent_team:
         await update.message.reply_text("❌ Nom de team incorrect. Réessaie.")
         return ASK_OPPONENT
@@ -50,23 +63,22 @@ async def ask_time(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return ASK_TIME
 
     # Prépare la liste des membres à confirmer
-    my_team = db.teams.find_one({"_id": context.user_data["team_id"]})
-    opponent_team = db.teams.find_one({"_id": context.user_data["opponent_team_id"]})
+    my_team, opponent_team = await scrim_teams(context)
     context.user_data["my_team_name"] = my_team["name"]
     context.user_data["my_team_members"] = my_team["member_ids"]
     context.user_data["opponent_team_members"] = opponent_team["member_ids"]
     context.user_data["confirmed"] = set()
 
     # Notifie tous les membres des deux teams pour confirmation
-    for tid in my_team["member_ids"] + opponent_team["member_ids"]:
-        await context.bot.send_message(
-            chat_id=tid,
-            text=f"⚔️ Demande de scrim entre {my_team['name']} et {opponent_team['name']} à {scrim_time.strftime('%H:%M')} (GMT+1).\n"
-                 "Clique sur le bouton pour confirmer ta participation.",
-            reply_markup=InlineKeyboardMarkup([
-                [InlineKeyboardButton("✅ Je confirme", callback_data="confirm_scrim")]
-            ])
-        )
+    await fan_out(
+        context.bot,
+        my_team["member_ids"] + opponent_team["member_ids"],
+        text=f"⚔️ Demande de scrim entre {my_team['name']} et {opponent_team['name']} à {scrim_time.strftime('%H:%M')} (GMT+1).\n"
+             "Clique sur le bouton pour confirmer ta participation.",
+        reply_markup=InlineKeyboardMarkup([
+            [InlineKeyboardButton("✅ Je confirme", callback_data="confirm_scrim")]
+        ])
+    )
     await update.message.reply_text("Des demandes de confirmation ont été envoyées à tous les membres des deux teams.")
     return CONFIRM_MEMBERS
 
@@ -86,11 +98,12 @@ async def confirm_member(update: Update, context: ContextTypes.DEFAULT_TYPE):
                  "Tu recevras une notification 5 minutes avant pour donner le lien de la gameroom et le lien spectateur."
         )
         # Notifie tous les joueurs du bot
-        for player in db.players.find():
-            await context.bot.send_message(
-                chat_id=player["telegram_id"],
-                text=f"📢 Un scrim opposant {context.user_data['my_team_name']} à {context.user_data['opponent_team_name']} aura lieu à {scrim_time.strftime('%H:%M')} (GMT+1) !"
-            )
+        spawn_fan_out(
+            context,
+            (p["telegram_id"] async for p in db.players.find(REACHABLE_FILTER, {"telegram_id": 1})),
+            "annonce scrim",
+            text=f"📢 Un scrim opposant {context.user_data['my_team_name']} à {context.user_data['opponent_team_name']} aura lieu à {scrim_time.strftime('%H:%M')} (GMT+1) !"
+        )
         # Lance le timer pour la notification 5 minutes avant
         asyncio.create_task(scrim_reminder(context))
         return WAIT_LINKS
@@ -119,36 +132,35 @@ async def wait_links(update: Update, context: ContextTypes.DEFAULT_TYPE):
     context.user_data["gameroom_link"] = gameroom_link
     context.user_data["spec_link"] = spec_link
 
-    my_team = db.teams.find_one({"_id": context.user_data["team_id"]})
-    opponent_team = db.teams.find_one({"_id": context.user_data["opponent_team_id"]})
-    my_members = list(db.players.find({"telegram_id": {"$in": my_team["member_ids"]}}))
-    opp_members = list(db.players.find({"telegram_id": {"$in": opponent_team["member_ids"]}}))
+    my_team, opponent_team = await scrim_teams(context)
+    my_members, opp_members = my_team["members"], opponent_team["members"]
 
     # Envoie aux membres des deux teams
-    for m in my_members + opp_members:
-        await context.bot.send_message(
-            chat_id=m["telegram_id"],
-            text=f"🎮 Scrim Room : {gameroom_link}\nLien spectateur : {spec_link}\n"
-                 f"Adversaires : {my_team['name']} vs {opponent_team['name']}\n"
-                 f"Joueurs :\n"
-                 f"{', '.join([mm['username'] for mm in my_members])} vs {', '.join([om['username'] for om in opp_members])}\n"
-                 f"Heure : {context.user_data['scrim_time'].strftime('%H:%M')} (GMT+1)",
-            reply_markup=InlineKeyboardMarkup([
-                [InlineKeyboardButton("Lancer la partie", callback_data="start_scrim_game")],
-                [InlineKeyboardButton("Fin de la partie", callback_data="end_scrim_game")]
-            ])
-        )
+    await fan_out(
+        context.bot,
+        [m["telegram_id"] for m in my_members + opp_members],
+        text=f"🎮 Scrim Room : {gameroom_link}\nLien spectateur : {spec_link}\n"
+             f"Adversaires : {my_team['name']} vs {opponent_team['name']}\n"
+             f"Joueurs :\n"
+             f"{', '.join([mm['username'] for mm in my_members])} vs {', '.join([om['username'] for om in opp_members])}\n"
+             f"Heure : {context.user_data['scrim_time'].strftime('%H:%M')} (GMT+1)",
+        reply_markup=InlineKeyboardMarkup([
+            [InlineKeyboardButton("Lancer la partie", callback_data="start_scrim_game")],
+            [InlineKeyboardButton("Fin de la partie", callback_data="end_scrim_game")]
+        ])
+    )
 
-    # Envoie à tous les autres joueurs (hors les deux teams)
+    # Envoie à tous les autres joueurs (hors les deux teams), en tâche de fond
     all_team_ids = set(my_team["member_ids"] + opponent_team["member_ids"])
-    for player in db.players.find({"telegram_id": {"$nin": list(all_team_ids)}}):
-        await context.bot.send_message(
-            chat_id=player["telegram_id"],
-            text=f"👀 Un scrim va commencer !\n"
-                 f"{my_team['name']} vs {opponent_team['name']} à {context.user_data['scrim_time'].strftime('%H:%M')} (GMT+1)\n"
-                 f"Joueurs : {', '.join([mm['username'] for mm in my_members])} vs {', '.join([om['username'] for om in opp_members])}\n"
-                 f"Lien spectateur : {spec_link}"
-        )
+    spawn_fan_out(
+        context,
+        (p["telegram_id"] async for p in db.players.find({"telegram_id": {"$nin": list(all_team_ids)}, **REACHABLE_FILTER}, {"telegram_id": 1})),
+        "lancement scrim",
+        text=f"👀 Un scrim va commencer !\n"
+             f"{my_team['name']} vs {opponent_team['name']} à {context.user_data['scrim_time'].strftime('%H:%M')} (GMT+1)\n"
+             f"Joueurs : {', '.join([mm['username'] for mm in my_members])} vs {', '.join([om['username'] for om in opp_members])}\n"
+             f"Lien spectateur : {spec_link}"
+    )
     return ConversationHandler.END
 
 async def start_scrim_game(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -189,10 +201,9 @@ async def ask_screenshots(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def done_screenshots(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # Met à jour les profils des joueurs (victoires/défaites/matchs joués)
-    my_team = db.teams.find_one({"_id": context.user_data["team_id"]})
-    opponent_team = db.teams.find_one({"_id": context.user_data["opponent_team_id"]})
-    my_members = list(db.players.find({"telegram_id": {"$in": my_team["member_ids"]}}))
-    opp_members = list(db.players.find({"telegram_id": {"$in": opponent_team["member_ids"]}}))
+    my_team, opponent_team = await scrim_teams(context)
+    my_ids = [m["telegram_id"] for m in my_team["members"]]
+    opp_ids = [m["telegram_id"] for m in opponent_team["members"]]
 
     # Détermine le gagnant (ex: "3-2" => 3 > 2)
     score = context.user_data.get("score", "0-0")
@@ -202,30 +213,29 @@ async def done_screenshots(update: Update, context: ContextTypes.DEFAULT_TYPE):
         score1, score2 = 0, 0
 
     if score1 > score2:
-        winners, losers = my_members, opp_members
+        my_outcome, opp_outcome = "win", "lose"
     elif score2 > score1:
-        winners, losers = opp_members, my_members
+        my_outcome, opp_outcome = "lose", "win"
     else:
-        winners, losers = [], []
+        my_outcome = opp_outcome = "draw"
+    outcomes = {**{tid: my_outcome for tid in my_ids}, **{tid: opp_outcome for tid in opp_ids}}
 
-    for p in my_members + opp_members:
-        db.players.update_one(
-            {"telegram_id": p["telegram_id"]},
-            {"$inc": {"matches_played": 1}}
-        )
-    for p in winners:
-        db.players.update_one(
-            {"telegram_id": p["telegram_id"]},
-            {"$inc": {"wins": 1}}
-        )
-    for p in losers:
-        db.players.update_one(
-            {"telegram_id": p["telegram_id"]},
-            {"$inc": {"defeats": 1}}
-        )
+    # Toutes les statistiques en un seul bulk_write, puis le scrim dans la collection scrims
+    scrim_id = context.user_data.setdefault("scrim_id", str(ObjectId()))
+    await apply_result(db, f"scrim:{scrim_id}", outcomes, record={
+        "team_id": my_team["_id"],
+        "opponent_team_id": opponent_team["_id"],
+        "team_name": my_team["name"],
+        "opponent_team_name": opponent_team["name"],
+        "score": score,
+        "winner_team_id": {"win": my_team["_id"], "lose": opponent_team["_id"]}.get(my_outcome),
+        "outcomes": {str(tid): outcome for tid, outcome in outcomes.items()},
+        "screenshots": context.user_data.get("screenshots", []),
+        "scheduled_at": context.user_data.get("scrim_time"),
+        "creator_id": context.user_data.get("creator_id")
+    })
 
     await update.message.reply_text("✅ Résultat enregistré et profils mis à jour !")
-    # Tu peux aussi enregistrer le scrim dans une collection dédiée ici
 
     return ConversationHandler.END
 
@@ -1,13 +1,15 @@
-import os
-from pymongo import MongoClient
+from core.database import get_database
 from telegram import Update
-from telegram.ext import ContextTypes
+from telegram.ext import ContextTypes, CallbackQueryHandler
 from dotenv import load_dotenv
-from datetime import datetime
+from utils.media import send_photo_cached
+from utils.names import normalize_name
+from utils.formatters import profile_cards
+from utils.name_search import player_search
+from utils.keyboards import suggestions_keyboard
 
 load_dotenv()
-client = MongoClient(os.getenv('MONGO_URI'))
-db = client[os.getenv("DB_NAME", "brawlbase")]
+db = get_database()
 
 async def search(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not context.args:
@@ -15,31 +17,40 @@ async def search(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     username = " ".join(context.args).strip()
-    player = db.players.find_one({"username": {"$regex": f"^{username}$", "$options": "i"}})
+    player = await db.players.find_one({"username_lc": normalize_name(username)}, {"_id": 0, "telegram_id": 1})
 
     if not player:
-        await update.message.reply_text(f"Aucun joueur trouvé avec le pseudo : {username}")
+        # Pas de pseudo exact : pseudos proches (préfixe, faute de frappe) depuis l'index mémoire
+        await player_search.ensure_loaded(db)
+        matches = player_search.search(username)
+        if not matches:
+            await update.message.reply_text(f"Aucun joueur trouvé avec le pseudo : {username}")
+            return
+        await update.message.reply_text(
+            f"Aucun joueur trouvé avec le pseudo : {username}\nTu cherchais peut-être :",
+            reply_markup=suggestions_keyboard(matches, "search_")
+        )
         return
 
-    # Récupère la team si elle existe
-    team_name = None
-    if player.get("team_id"):
-        team = db.teams.find_one({"_id": player["team_id"]})
-        if team:
-            team_name = team.get("name")
-
-    msg = (
-        f"👤 Pseudo : {player.get('username', 'Inconnu')}\n"
-        f"• Pays : {player.get('country', 'N/A')}\n"
-        f"• Team : {team_name if team_name else 'Aucune'}\n"
-        f"• Trophées : {player.get('trophies', 'N/A')}\n"
-        f"• Brawler principal : {player.get('main_brawler', 'N/A')}\n"
-        f"• Victoires : {player.get('wins', 0)}\n"
-        f"• Défaites : {player.get('defeats', 0)}\n"
-        f"• Matchs joués : {player.get('matches_played', 0)}\n"
-        f"• Inscrit le : {player.get('registered_at', datetime.utcnow()).strftime('%d/%m/%Y %H:%M')}\n"
-    )
-    if player.get("profile_photo"):
-        await update.message.reply_photo(photo=player["profile_photo"], caption=msg)
+    await show_player(update, context, await profile_cards.get(db, player["telegram_id"]))
+
+async def handle_search_pick(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+    card = await profile_cards.get(db, int(query.data.split("_")[1]))
+    if not card:
+        await query.edit_message_text("❌ Ce joueur n'existe plus.")
+        return
+    await show_player(update, context, card)
+
+async def show_player(update: Update, context: ContextTypes.DEFAULT_TYPE, card):
+    """:param card: Fiche pré-rendue (utils/formatters.py)"""
+    if not card:
+        await update.effective_message.reply_text("❌ Ce joueur n'existe plus.")
+    elif card["photo"]:
+        await send_photo_cached(context.bot, db, update.effective_chat.id, card["photo"], caption=card["text"])
     else:
-        await update.message.reply_text(msg)
\ No newline at end of file
+        await update.effective_message.reply_text(card["text"])
+
+def setup_search(application):
+    application.add_handler(CallbackQueryHandler(handle_search_pick, pattern=r"^search_\d+$"))
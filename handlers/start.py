@@ -1,16 +1,16 @@
-import os
-from pymongo import MongoClient
+from core.database import get_database
 from telegram import Update
 from telegram.ext import ContextTypes
 from dotenv import load_dotenv
+from utils.media import send_photo_cached
+from models.players import find_player
 
 load_dotenv()
-client = MongoClient(os.getenv('MONGO_URI'))
-db = client.brawlbase
+db = get_database()
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
-    player = db.players.find_one({'telegram_id': user.id})
+    player = await find_player(db.players, user.id, "greeting")
 
     if player:
         msg =(
@@ -25,6 +25,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         - /searchteam <nom> : Rechercher une team
         - /scrim : Lancer un scrim
         - /findmatch : Trouver un match
+        - /notifications : Choisir les modes pour lesquels être prévenu
         - /search : Rechercher un joueur
         - /profile : Voir ton profil
         - /findall : Voir tous les joueurs enregistrés
@@ -40,10 +41,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         # Affiche la photo si elle existe
         if player.get("profile_photo"):
-            await update.message.reply_photo(
-                photo=player["profile_photo"],
-                caption=msg
-            )
+            await send_photo_cached(context.bot, db, update.effective_chat.id, player["profile_photo"], caption=msg)
         else:
             await update.message.reply_text(msg)
     else:
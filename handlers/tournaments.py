@@ -1,14 +1,14 @@
-import os
 from telegram import Update, InlineKeyboardMarkup, InlineKeyboardButton
 from telegram.ext import (
     ContextTypes, ConversationHandler, CommandHandler, MessageHandler, CallbackQueryHandler, filters
 )
-from pymongo import MongoClient
+from core.database import get_database
 from dotenv import load_dotenv
+from bson import ObjectId
+from utils.team_names import team_names
 
 load_dotenv()
-client = MongoClient(os.getenv('MONGO_URI'))
-db = client[os.getenv("DB_NAME", "brawlbase")]
+db = get_database()
 
 # Liste des admins (à adapter)
 ADMIN_IDS = [123456789]  # Remplace par ton telegram_id ou ceux des admins
@@ -59,7 +59,7 @@ async def ask_mode(update: Update, context: ContextTypes.DEFAULT_TYPE):
     context.user_data["mode"] = mode
 
     # Affiche la liste des teams disponibles
-    teams = list(db.teams.find())
+    teams = await db.teams.find().to_list()
     if not teams:
         await query.edit_message_text("Aucune team enregistrée.")
         return ConversationHandler.END
@@ -91,8 +91,10 @@ async def ask_teams(update: Update, context: ContextTypes.DEFAULT_TYPE):
             await query.answer("Sélectionne au moins une team.")
             return ASK_TEAMS
         # Récapitulatif
-        team_names = [
-            db.teams.find_one({"_id": team_id}).get("name", str(team_id))
+        # Une seule requête pour toutes les teams sélectionnées
+        names = await team_names.resolve(db, context.user_data["selected_teams"])
+        selected_names = [
+            names.get(ObjectId(team_id), team_id)
             for team_id in context.user_data["selected_teams"]
         ]
         msg = (
@@ -100,7 +102,7 @@ async def ask_teams(update: Update, context: ContextTypes.DEFAULT_TYPE):
             f"• Nom : {context.user_data['tournament_name']}\n"
             f"• Type : {context.user_data['competition_type']}\n"
             f"• Mode : {context.user_data['mode']}\n"
-            f"• Teams : {', '.join(team_names)}\n\n"
+            f"• Teams : {', '.join(selected_names)}\n\n"
             f"Confirmer la création ?"
         )
         keyboard = InlineKeyboardMarkup([
@@ -115,7 +117,7 @@ async def confirm_tournament(update: Update, context: ContextTypes.DEFAULT_TYPE)
     await query.answer()
     if query.data == "confirm_tournament":
         # Enregistre le tournoi
-        db.tournaments.insert_one({
+        await db.tournaments.insert_one({
             "name": context.user_data["tournament_name"],
             "competition_type": context.user_data["competition_type"],
             "mode": context.user_data["mode"],
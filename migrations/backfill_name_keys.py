@@ -0,0 +1,66 @@
+"""
+Renseigne username_lc (players) et name_lc (teams) sur les documents existants,
+puis crée les index uniques correspondants.
+
+En cas de doublons (ex: "Kyan" et "kyan"), seul le document le plus ancien reçoit la clé ;
+les autres sont listés pour être renommés à la main.
+
+Usage : python -m migrations.backfill_name_keys
+"""
+import asyncio
+import logging
+
+from pymongo import UpdateOne
+
+from core.database import get_database
+from utils.names import NAME_KEYS, normalize_name, ensure_name_indexes
+
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+
+
+async def backfill(db, collection: str) -> None:
+    field, key = NAME_KEYS[collection]
+    taken = {
+        doc[key]: doc["_id"]
+        async for doc in db[collection].find({key: {"$type": "string"}}, {key: 1})
+    }
+    ops, updated, duplicates = [], 0, []
+    cursor = db[collection].find(
+        {field: {"$type": "string"}, key: {"$exists": False}},
+        {field: 1}
+    ).sort("_id", 1)
+    async for doc in cursor:
+        value = normalize_name(doc[field])
+        if not value:
+            continue
+        if value in taken:
+            duplicates.append((doc["_id"], doc[field], taken[value]))
+            continue
+        taken[value] = doc["_id"]
+        ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {key: value}}))
+        if len(ops) >= BATCH_SIZE:
+            updated += (await db[collection].bulk_write(ops, ordered=False)).modified_count
+            ops = []
+    if ops:
+        updated += (await db[collection].bulk_write(ops, ordered=False)).modified_count
+
+    logger.info(f"{collection} : {updated} document(s) mis à jour")
+    for _id, value, kept in duplicates:
+        logger.warning(f"{collection} : '{value}' ({_id}) est en doublon avec {kept}, à renommer")
+
+
+async def main() -> None:
+    db = get_database()
+    for collection in NAME_KEYS:
+        await backfill(db, collection)
+    await ensure_name_indexes(db)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
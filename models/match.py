@@ -4,6 +4,10 @@ from bson import ObjectId
 from typing import Dict, List, Optional, Union
 import logging
 from pymongo.errors import DuplicateKeyError, OperationFailure
+from utils.names import normalize_name
+from utils.leaderboard import leaderboard
+from utils.player_cache import player_cache
+from utils.formatters import profile_cards
 
 logger = logging.getLogger(__name__)
 
@@ -18,7 +22,7 @@ class PlayerModel:
         """
         Initialise le modèle avec une connexion MongoDB
         Args:
-            db (Database): Instance pymongo.Database
+            db (AsyncDatabase): Instance core.database.AsyncDatabase
         """
         self.collection = db[self.COLLECTION_NAME]
         self._ensure_indexes()
@@ -35,7 +39,7 @@ class PlayerModel:
         
         try:
             # Création atomique des index
-            self.collection.create_indexes([IndexModel(**spec) for spec in index_specs])
+            self.collection.sync.create_indexes([IndexModel(**spec) for spec in index_specs])
         except OperationFailure as e:
             logger.error(f"Échec création index: {e.details}")
             raise
@@ -53,13 +57,13 @@ class PlayerModel:
             "created_at": datetime.utcnow()
         }
         try:
-            self.collection.insert_one(sample_doc)
-            self.collection.delete_one({"telegram_id": 1234567890})
+            self.collection.sync.insert_one(sample_doc)
+            self.collection.sync.delete_one({"telegram_id": 1234567890})
         except Exception as e:
             logger.critical(f"Schéma invalide: {e}")
             raise
 
-    def create_player(self, telegram_id: int, username: str) -> ObjectId:
+    async def create_player(self, telegram_id: int, username: str) -> ObjectId:
         """
         Crée un nouveau joueur avec validation complète
         Args:
@@ -77,6 +81,7 @@ class PlayerModel:
         player_data = {
             "telegram_id": telegram_id,
             "username": username.strip(),
+            "username_lc": normalize_name(username),
             "trophies": 0,
             "brawlers": [],
             "matches_played": 0,
@@ -86,7 +91,7 @@ class PlayerModel:
         }
 
         try:
-            result = self.collection.insert_one(player_data)
+            result = await self.collection.insert_one(player_data)
             logger.info(f"Nouveau joueur: {telegram_id}")
             return result.inserted_id
         except DuplicateKeyError:
@@ -96,7 +101,7 @@ class PlayerModel:
             logger.error(f"Erreur création joueur: {e}")
             raise OperationFailure("Échec création joueur")
 
-    def update_stats(
+    async def update_stats(
         self,
         telegram_id: int,
         trophies_delta: int = 0,
@@ -125,16 +130,20 @@ class PlayerModel:
         }
 
         try:
-            result = self.collection.update_one(
+            result = await self.collection.update_one(
                 {"telegram_id": telegram_id},
                 update
             )
+            player_cache.invalidate([telegram_id])
+            profile_cards.bump([telegram_id])
+            if result.modified_count:
+                leaderboard.bump(telegram_id, trophies=trophies_delta, matches_played=matches_played, wins=wins)
             return result.modified_count > 0
         except Exception as e:
             logger.error(f"Erreur MAJ stats {telegram_id}: {e}")
             return False
 
-    def get_leaderboard(self, limit: int = 10, min_matches: int = 5) -> List[Dict]:
+    async def get_leaderboard(self, limit: int = 10, min_matches: int = 5) -> List[Dict]:
         """
         Récupère le classement des joueurs actifs
         Args:
@@ -143,6 +152,23 @@ class PlayerModel:
         Returns:
             List: Joueurs triés par trophées
         """
+        if leaderboard.loaded:
+            # Classement mémoire (utils/leaderboard.py) : parcours du haut du classement, sans agrégation
+            now = datetime.utcnow()
+            ranked = []
+            for p in leaderboard.ranked():
+                if len(ranked) >= limit or not p.get("trophies"):
+                    break
+                if (p.get("matches_played") or 0) < min_matches:
+                    continue
+                ranked.append({
+                    "username": p.get("username"),
+                    "trophies": p["trophies"],
+                    "win_rate": (p.get("wins") or 0) / p["matches_played"],
+                    "activity_ratio": (now - p["last_active"]).total_seconds() / 3600 if p.get("last_active") else None
+                })
+            return ranked
+
         pipeline = [
             {"$match": {
                 "matches_played": {"$gte": min_matches},
@@ -170,15 +196,15 @@ class PlayerModel:
         ]
 
         try:
-            return list(self.collection.aggregate(pipeline))
+            return await self.collection.aggregate(pipeline).to_list()
         except Exception as e:
             logger.error(f"Erreur classement: {e}")
             return []
 
-    def get_player(self, telegram_id: int) -> Optional[Dict]:
+    async def get_player(self, telegram_id: int) -> Optional[Dict]:
         """Récupère un joueur par son ID Telegram"""
         try:
-            return self.collection.find_one(
+            return await self.collection.find_one(
                 {"telegram_id": telegram_id},
                 {"_id": 0, "username": 1, "trophies": 1, "brawlers": 1}
             )
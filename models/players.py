@@ -3,6 +3,11 @@ from pymongo import IndexModel, DESCENDING
 from bson import ObjectId
 from typing import Dict, List, Optional
 import logging
+from utils.names import normalize_name
+from utils.leaderboard import leaderboard
+from utils.player_cache import player_cache
+from utils.formatters import profile_cards
+from utils.registered import registered_players
 
 logger = logging.getLogger(__name__)
 
@@ -12,10 +17,23 @@ class Player:
     COLLECTION_NAME = "players"
     MAX_TROPHIES = 50000  # Limite réaliste
 
+    # Projections nommées : chaque commande ne lit que les champs qu'elle affiche.
+    # telegram_id est toujours inclus : un joueur inscrit ne donne jamais un document vide (faux).
+    PROJECTIONS = {
+        "exists": {"_id": 0, "telegram_id": 1},  # couverte par l'index telegram_id_unique
+        "greeting": {"_id": 0, "telegram_id": 1, "username": 1, "profile_photo": 1},
+        "profile": {
+            "_id": 0, "telegram_id": 1, "username": 1, "trophies": 1, "main_brawler": 1, "country": 1, "team_id": 1,
+            "wins": 1, "defeats": 1, "matches_played": 1, "registered_at": 1, "profile_photo": 1
+        },
+        "matchmaking": {"_id": 0, "telegram_id": 1, "username": 1, "trophies": 1},
+        "team": {"_id": 0, "telegram_id": 1, "username": 1, "team_id": 1},
+    }
+
     def __init__(self, db):
         """
         Initialise le modèle joueur
-        :param db: Instance pymongo.Database
+        :param db: Instance core.database.AsyncDatabase
         """
         self.collection = db[self.COLLECTION_NAME]
         self.teams_collection = db["teams"]
@@ -29,9 +47,13 @@ class Player:
                 IndexModel([("trophies", DESCENDING)], name="trophies_desc"),
                 IndexModel([("last_active", DESCENDING)], name="last_active_desc"),
                 IndexModel([("username", "text")], name="username_text_search"),
+                IndexModel(
+                    [("username_lc", 1)], unique=True, name="username_lc_unique",
+                    partialFilterExpression={"username_lc": {"$type": "string"}}
+                ),
                 IndexModel([("team_id", 1)], name="team_id_index")
             ]
-            self.collection.create_indexes(indexes)
+            self.collection.sync.create_indexes(indexes)
         except Exception as e:
             logger.critical(f"Erreur création index: {e}")
             raise
@@ -57,6 +79,9 @@ class Player:
                 "min": 0,
                 "max": self.MAX_TROPHIES
             },
+            "username_lc": {
+                "type": str  # Clé de recherche exacte, voir utils.names.normalize_name
+            },
             "main_brawler": {
                 "type": str,
                 "default": ""
@@ -87,7 +112,23 @@ class Player:
             "created_at": {"type": datetime, "default": datetime.utcnow}
         }
 
-    def create_player(self, telegram_id: int, username: str) -> ObjectId:
+    async def exists(self, telegram_id: int) -> bool:
+        """
+        Vérifie l'inscription d'un joueur sans lire son document
+        :param telegram_id: ID Telegram
+        """
+        return await find_player(self.collection, telegram_id, "exists") is not None
+
+    async def get(self, telegram_id: int, view: str) -> Optional[Dict]:
+        """
+        Lit un joueur avec une projection nommée
+        :param telegram_id: ID Telegram
+        :param view: Clé de PROJECTIONS ("greeting", "profile", "matchmaking", "team")
+        :return: Champs de la vue, ou None si le joueur n'est pas inscrit
+        """
+        return await find_player(self.collection, telegram_id, view)
+
+    async def create_player(self, telegram_id: int, username: str) -> ObjectId:
         """
         Crée un nouveau joueur avec validation
         :param telegram_id: ID Telegram unique
@@ -98,18 +139,20 @@ class Player:
         player_data = {
             "telegram_id": telegram_id,
             "username": username,
+            "username_lc": normalize_name(username),
             **{k: v["default"] for k, v in self.schema.items() if "default" in v}
         }
         
         try:
-            result = self.collection.insert_one(player_data)
+            result = await self.collection.insert_one(player_data)
+            registered_players.add(telegram_id)
             logger.info(f"Joueur créé: {telegram_id}")
             return result.inserted_id
         except Exception as e:
             logger.error(f"Erreur création joueur {telegram_id}: {e}")
             raise
 
-    def update_trophies(self, telegram_id: int, delta: int) -> bool:
+    async def update_trophies(self, telegram_id: int, delta: int) -> bool:
         """
         Met à jour les trophées de manière atomique
         :param telegram_id: ID Telegram
@@ -117,7 +160,7 @@ class Player:
         :return: True si mis à jour
         """
         try:
-            result = self.collection.update_one(
+            result = await self.collection.update_one(
                 {"telegram_id": telegram_id},
                 {
                     "$inc": {"trophies": delta},
@@ -125,29 +168,43 @@ class Player:
                     "$min": {"trophies": self.MAX_TROPHIES}  # Plafonnement
                 }
             )
+            player_cache.invalidate([telegram_id])
+            profile_cards.bump([telegram_id])
+            if result.modified_count:
+                leaderboard.bump(telegram_id, trophies=delta)
             return result.modified_count > 0
         except Exception as e:
             logger.error(f"Erreur MAJ trophées {telegram_id}: {e}")
             return False
 
-    def get_leaderboard(self, limit: int = 10) -> List[Dict]:
+    async def get_leaderboard(self, limit: int = 10) -> List[Dict]:
         """
         Récupère le classement des joueurs
         :param limit: Nombre de joueurs à retourner
         :return: Liste des joueurs triés
         """
+        if leaderboard.loaded:
+            # Classement mémoire (utils/leaderboard.py), sans requête
+            return [
+                {
+                    "username": p.get("username"),
+                    "trophies": p["trophies"],
+                    "win_rate": (p.get("wins") or 0) / p["matches_played"] if p.get("matches_played") else 0.0
+                }
+                for p in leaderboard.top(limit=limit) if p.get("trophies")
+            ]
         try:
-            return list(self.collection.find(
+            return await self.collection.find(
                 {"trophies": {"$gt": 0}},  # Exclut les joueurs à 0 trophées
                 {"username": 1, "trophies": 1, "win_rate": 1, "_id": 0}
-            ).sort("trophies", DESCENDING).limit(limit))
+            ).sort("trophies", DESCENDING).limit(limit).to_list()
         except Exception as e:
             logger.error(f"Erreur récupération classement: {e}")
             return []
 
     # --- Gestion des teams ---
 
-    def set_team(self, telegram_id: int, team_id: ObjectId) -> bool:
+    async def set_team(self, telegram_id: int, team_id: ObjectId) -> bool:
         """
         Associe un joueur à une team (ou None pour retirer)
         :param telegram_id: ID Telegram du joueur
@@ -155,30 +212,67 @@ class Player:
         :return: True si modifié
         """
         try:
-            result = self.collection.update_one(
+            result = await self.collection.update_one(
                 {"telegram_id": telegram_id},
                 {"$set": {"team_id": team_id}}
             )
+            player_cache.invalidate([telegram_id])
+            profile_cards.bump([telegram_id])
             return result.modified_count > 0
         except Exception as e:
             logger.error(f"Erreur set_team {telegram_id}: {e}")
             return False
 
-    def get_team(self, telegram_id: int) -> Optional[Dict]:
+    async def get_team(self, telegram_id: int) -> Optional[Dict]:
         """
         Récupère la team du joueur (ou None)
         :param telegram_id: ID Telegram du joueur
         :return: Dictionnaire team ou None
         """
-        player = self.collection.find_one({"telegram_id": telegram_id})
+        player = await self.collection.find_one({"telegram_id": telegram_id})
         if player and player.get("team_id"):
-            return self.teams_collection.find_one({"_id": player["team_id"]})
+            return await self.teams_collection.find_one({"_id": player["team_id"]})
         return None
 
-    def remove_from_team(self, telegram_id: int) -> bool:
+    async def remove_from_team(self, telegram_id: int) -> bool:
         """
         Retire le joueur de sa team
         :param telegram_id: ID Telegram du joueur
         :return: True si modifié
         """
-        return self.set_team(telegram_id, None)
\ No newline at end of file
+        return await self.set_team(telegram_id, None)
+
+
+# Lectures par projection nommée, utilisables par les handlers sans instancier Player
+# (le constructeur crée les index, ce qui n'a pas sa place à l'import d'un handler)
+
+# Le cache garde l'union des vues : une seule lecture sert toutes les commandes d'une conversation
+CACHED_PROJECTION = {"_id": 0, **{f: 1 for view in Player.PROJECTIONS.values() for f, v in view.items() if v}}
+
+
+async def find_player(players, telegram_id: int, view: str) -> Optional[Dict]:
+    """
+    Lit un joueur avec une projection nommée, via le cache joueurs (utils/player_cache.py)
+    :param players: Collection players (db.players)
+    :param view: Clé de Player.PROJECTIONS
+    :return: Champs de la vue, ou None si le joueur n'est pas inscrit
+    """
+    if registered_players.surely_absent(telegram_id):
+        # Non-inscrit : réponse négative sans aller en base
+        return None
+    projection = Player.PROJECTIONS[view]
+    if not player_cache.enabled:
+        return await players.find_one({"telegram_id": telegram_id}, projection)
+    doc = player_cache.get(telegram_id)
+    if doc is None:
+        token = player_cache.token()
+        doc = await players.find_one({"telegram_id": telegram_id}, CACHED_PROJECTION)
+        if doc is None:
+            return None
+        player_cache.put(telegram_id, doc, token)
+    return {f: doc[f] for f, v in projection.items() if v and f in doc}
+
+
+async def player_exists(players, telegram_id: int) -> bool:
+    """Inscription d'un joueur, vérifiée sans lire son document"""
+    return await find_player(players, telegram_id, "exists") is not None
@@ -1,79 +1,213 @@
-from pymongo import MongoClient
+from core.database import get_database, run_transaction
+from utils.names import normalize_name
+from utils.player_cache import player_cache
+from utils.formatters import profile_cards
+from utils.team_snapshots import team_snapshots, member_summaries, MEMBER_PROJECTION
 from bson import ObjectId
-import os
+from pymongo import ReturnDocument
 
-MONGO_URI = os.getenv("MONGO_URI")
-DB_NAME = os.getenv("DB_NAME", "brawlbase")
+db = get_database()
 
-client = MongoClient(MONGO_URI)
-db = client[DB_NAME]
+# Un seul champ d'appartenance : teams.member_ids (telegram_id des joueurs), reflété par players.team_id.
+# Chaque écriture réserve d'abord les joueurs avec un filtre gardé (team_id vide ou déjà cette team) :
+# deux capitaines qui éditent en même temps ne peuvent pas se prendre un joueur.
 
-def create_team(name, creator_id, player_ids=None, country=None):
+
+async def ensure_team_indexes(db) -> None:
+    """Index de recherche de la team d'un joueur ; créé au démarrage (core/bot.py), jamais à l'import"""
+    await db.teams.create_index([("member_ids", 1)], name="member_ids_index")
+
+
+class TeamConflict(Exception):
+    """Écriture refusée : joueur déjà dans une autre team, ou team modifiée entre-temps"""
+
+    def __init__(self, message, player_ids=None):
+        super().__init__(message)
+        self.player_ids = player_ids or []
+
+
+def _claim_members(session, team_id, member_ids):
+    """Rattache les joueurs à la team, sauf s'ils sont déjà dans une autre"""
+    result = db.players.sync.update_many(
+        {"telegram_id": {"$in": member_ids}, "team_id": {"$in": [None, team_id]}},
+        {"$set": {"team_id": team_id}},
+        session=session
+    )
+    if result.matched_count < len(member_ids):
+        found = {
+            p["telegram_id"]: p.get("team_id")
+            for p in db.players.sync.find({"telegram_id": {"$in": member_ids}}, {"telegram_id": 1, "team_id": 1}, session=session)
+        }
+        taken = [tid for tid in member_ids if tid not in found or found[tid] not in (None, team_id)]
+        raise TeamConflict("Un ou plusieurs joueurs sont déjà dans une autre équipe.", taken)
+
+
+def _members_summary(session, member_ids):
+    """Pseudo et trophées des membres, dénormalisés dans teams.members (utils/team_snapshots.py)"""
+    players = db.players.sync.find({"telegram_id": {"$in": member_ids}}, MEMBER_PROJECTION, session=session)
+    return member_summaries(players, member_ids)
+
+
+def _release_members(session, team_id, member_ids):
+    """Détache les joueurs qui pointent encore vers cette team"""
+    db.players.sync.update_many(
+        {"telegram_id": {"$in": member_ids}, "team_id": team_id},
+        {"$set": {"team_id": None}},
+        session=session
+    )
+
+
+async def create_team(name, creator_id, member_ids, country=None, logo_url=None):
     """
-    Crée une équipe avec un nom, un créateur, une liste d'IDs de joueurs (optionnel) et un pays.
-    Vérifie qu'aucun joueur n'est déjà dans une autre équipe.
+    Crée une équipe et rattache ses membres en une transaction.
+    :param member_ids: telegram_id des membres (créateur compris)
+    :return: ObjectId de la team
+    :raises: TeamConflict si un membre est déjà dans une autre équipe, DuplicateKeyError si le nom est pris
     """
-    if player_ids is None:
-        player_ids = []
-
-    # Vérifie qu'aucun joueur n'a déjà une team
-    existing = db.players.find({"_id": {"$in": [ObjectId(pid) for pid in player_ids]}, "team_id": {"$ne": None}})
-    if existing.count() > 0:
-        raise Exception("Un ou plusieurs joueurs sont déjà dans une équipe.")
-
-    team = {
-        "name": name,
-        "creator_id": creator_id,
-        "player_ids": [ObjectId(pid) for pid in player_ids],
-        "country": country  # Ajout du pays
-    }
-    team_id = db.teams.insert_one(team).inserted_id
-
-    # Mets à jour chaque player pour lui associer la team
-    if player_ids:
-        db.players.update_many(
-            {"_id": {"$in": [ObjectId(pid) for pid in player_ids]}},
-            {"$set": {"team_id": team_id}}
-        )
-    return team_id
+    member_ids = list(dict.fromkeys(member_ids))
+    team_id = ObjectId()
 
-def add_player_to_team(team_id, player_id):
+    def _create(session):
+        try:
+            _claim_members(session, team_id, member_ids)
+            db.teams.sync.insert_one({
+                "_id": team_id,
+                "name": name,
+                "name_lc": normalize_name(name),
+                "creator_id": creator_id,
+                "member_ids": member_ids,
+                "members": _members_summary(session, member_ids),
+                "country": country,
+                "logo_url": logo_url,
+                "version": 1
+            }, session=session)
+        except Exception:
+            if session is None:
+                # Hors transaction : on défait la réservation des joueurs
+                _release_members(None, team_id, member_ids)
+            raise
+        return team_id
+
+    try:
+        return await run_transaction(_create)
+    finally:
+        player_cache.invalidate(member_ids)
+        profile_cards.bump(member_ids)
+        team_snapshots.invalidate(team_id)
+
+
+async def update_team(team_id, version, name, country, member_ids, logo_url=None):
     """
-    Ajoute un joueur à une équipe si il n'a pas déjà une team.
+    Modifie une équipe (nom, pays, membres, logo) en une transaction.
+    :param version: Valeur de team["version"] lue au début de la modification (None pour les anciennes teams)
+    :raises: TeamConflict si un membre est pris ailleurs ou si la team a été modifiée entre-temps
     """
-    player = db.players.find_one({"_id": ObjectId(player_id)})
-    if player.get("team_id"):
-        raise Exception("Ce joueur est déjà dans une équipe.")
-    db.teams.update_one(
-        {"_id": ObjectId(team_id)},
-        {"$addToSet": {"player_ids": ObjectId(player_id)}}
-    )
-    db.players.update_one(
-        {"_id": ObjectId(player_id)},
-        {"$set": {"team_id": ObjectId(team_id)}}
-    )
+    team_id = ObjectId(team_id)
+    member_ids = list(dict.fromkeys(member_ids))
+    touched = set(member_ids)
+
+    def _update(session):
+        team = db.teams.sync.find_one({"_id": team_id}, {"member_ids": 1, "version": 1}, session=session)
+        if not team or team.get("version") != version:
+            raise TeamConflict("La team a été modifiée entre-temps.")
+        previous = team.get("member_ids", [])
+        touched.update(previous)
+        added = [tid for tid in member_ids if tid not in previous]
+        try:
+            _claim_members(session, team_id, member_ids)
+            changes = {
+                "name": name, "name_lc": normalize_name(name), "country": country,
+                "member_ids": member_ids, "members": _members_summary(session, member_ids)
+            }
+            if logo_url:
+                changes["logo_url"] = logo_url
+            result = db.teams.sync.update_one(
+                {"_id": team_id, "version": version},
+                {"$set": changes, "$inc": {"version": 1}},
+                session=session
+            )
+            if not result.matched_count:
+                raise TeamConflict("La team a été modifiée entre-temps.")
+        except Exception:
+            if session is None:
+                # Hors transaction : on défait la réservation des nouveaux membres
+                _release_members(None, team_id, added)
+            raise
+        _release_members(session, team_id, [tid for tid in previous if tid not in member_ids])
+
+    try:
+        await run_transaction(_update)
+    finally:
+        # Invalidation sur la boucle d'événements, une fois les écritures terminées
+        player_cache.invalidate(touched)
+        profile_cards.bump(touched)
+        team_snapshots.invalidate(team_id)
 
-def remove_player_from_team(team_id, player_id):
+
+async def add_player_to_team(team_id, telegram_id):
+    """
+    Ajoute un joueur à une équipe s'il n'a pas déjà une team.
+    :raises: TeamConflict si le joueur est déjà dans une autre équipe
+    """
+    team_id = ObjectId(team_id)
+
+    def _add(session):
+        _claim_members(session, team_id, [telegram_id])
+        team = db.teams.sync.find_one_and_update(
+            {"_id": team_id},
+            {"$addToSet": {"member_ids": telegram_id}, "$inc": {"version": 1}},
+            projection={"member_ids": 1},
+            return_document=ReturnDocument.AFTER,
+            session=session
+        )
+        if team:
+            db.teams.sync.update_one(
+                {"_id": team_id},
+                {"$set": {"members": _members_summary(session, team["member_ids"])}},
+                session=session
+            )
+
+    try:
+        await run_transaction(_add)
+    finally:
+        player_cache.invalidate([telegram_id])
+        profile_cards.bump([telegram_id])
+        team_snapshots.invalidate(team_id)
+
+
+async def remove_player_from_team(team_id, telegram_id):
     """
     Retire un joueur d'une équipe.
     """
-    db.teams.update_one(
-        {"_id": ObjectId(team_id)},
-        {"$pull": {"player_ids": ObjectId(player_id)}}
-    )
-    db.players.update_one(
-        {"_id": ObjectId(player_id)},
-        {"$set": {"team_id": None}}
-    )
+    team_id = ObjectId(team_id)
+
+    def _remove(session):
+        db.teams.sync.update_one(
+            {"_id": team_id},
+            {"$pull": {"member_ids": telegram_id, "members": {"telegram_id": telegram_id}}, "$inc": {"version": 1}},
+            session=session
+        )
+        _release_members(session, team_id, [telegram_id])
 
-def get_team(team_id):
-    return db.teams.find_one({"_id": ObjectId(team_id)})
+    try:
+        await run_transaction(_remove)
+    finally:
+        player_cache.invalidate([telegram_id])
+        profile_cards.bump([telegram_id])
+        team_snapshots.invalidate(team_id)
 
-def get_player_team(player_id):
-    player = db.players.find_one({"_id": ObjectId(player_id)})
+
+async def get_team(team_id):
+    """Instantané de la team (nom, pays, logo, membres), depuis le cache si possible"""
+    return await team_snapshots.get(db, team_id)
+
+
+async def get_player_team(telegram_id):
+    player = await db.players.find_one({"telegram_id": telegram_id}, {"team_id": 1})
     if player:
         return player.get("team_id")
     return None
 
-def list_teams():
-    return list(db.teams.find())
\ No newline at end of file
+
+async def list_teams():
+    return await db.teams.find().to_list()
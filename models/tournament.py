@@ -26,7 +26,7 @@ class Tournament:
         """
         Initialise le modèle avec une connexion MongoDB
         Args:
-            db (Database): Instance pymongo.Database
+            db (AsyncDatabase): Instance core.database.AsyncDatabase
         """
         self.collection = db[self.COLLECTION_NAME]
         self._ensure_indexes()
@@ -42,7 +42,7 @@ class Tournament:
         ]
         
         try:
-            self.collection.create_indexes([IndexModel(**spec) for spec in index_specs])
+            self.collection.sync.create_indexes([IndexModel(**spec) for spec in index_specs])
         except OperationFailure as e:
             logger.error(f"Échec création index: {e.details}")
             raise
@@ -62,13 +62,13 @@ class Tournament:
             "created_at": datetime.utcnow()
         }
         try:
-            self.collection.insert_one(sample_tournament)
-            self.collection.delete_one({"name": "Test Tournament"})
+            self.collection.sync.insert_one(sample_tournament)
+            self.collection.sync.delete_one({"name": "Test Tournament"})
         except Exception as e:
             logger.critical(f"Schéma invalide: {e}")
             raise
 
-    def create_tournament(
+    async def create_tournament(
         self,
         name: str,
         mode: str,
@@ -106,7 +106,7 @@ class Tournament:
         }
 
         try:
-            result = self.collection.insert_one(tournament_data)
+            result = await self.collection.insert_one(tournament_data)
             logger.info(f"Tournoi créé: {name}")
             return result.inserted_id
         except DuplicateKeyError:
@@ -116,7 +116,7 @@ class Tournament:
             logger.error(f"Erreur création tournoi: {e}")
             raise OperationFailure("Échec création tournoi")
 
-    def register_team(
+    async def register_team(
         self,
         tournament_id: ObjectId,
         team_name: str,
@@ -146,7 +146,7 @@ class Tournament:
         }
 
         try:
-            result = self.collection.update_one(
+            result = await self.collection.update_one(
                 {
                     "_id": tournament_id,
                     "status": TournamentStatus.UPCOMING.name,
@@ -159,7 +159,7 @@ class Tournament:
             logger.error(f"Erreur inscription équipe: {e}")
             return False
 
-    def start_tournament(self, tournament_id: ObjectId) -> bool:
+    async def start_tournament(self, tournament_id: ObjectId) -> bool:
         """
         Démarre un tournoi et génère les brackets
         Args:
@@ -169,14 +169,14 @@ class Tournament:
         """
         try:
             # Vérifier qu'il y a assez d'équipes
-            tournament = self.collection.find_one({"_id": tournament_id})
+            tournament = await self.collection.find_one({"_id": tournament_id})
             if len(tournament["teams"]) < self.MIN_TEAMS:
                 raise ValueError(f"Minimum {self.MIN_TEAMS} équipes requis")
 
             # Générer les brackets (simplifié)
             brackets = self._generate_brackets(tournament["teams"])
             
-            result = self.collection.update_one(
+            result = await self.collection.update_one(
                 {"_id": tournament_id},
                 {
                     "$set": {
@@ -203,10 +203,10 @@ class Tournament:
             ]
         }
 
-    def get_active_tournaments(self) -> List[Dict]:
+    async def get_active_tournaments(self) -> List[Dict]:
         """Récupère les tournois en cours d'inscription ou en cours"""
         try:
-            return list(self.collection.find(
+            return await self.collection.find(
                 {
                     "status": {
                         "$in": [
@@ -222,7 +222,7 @@ class Tournament:
                     "teams_count": {"$size": "$teams"},
                     "max_teams": 1
                 }
-            ))
+            ).to_list()
         except Exception as e:
             logger.error(f"Erreur récupération tournois: {e}")
             return []
\ No newline at end of file
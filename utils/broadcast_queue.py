@@ -0,0 +1,154 @@
+import os
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, Optional
+
+from pymongo import ASCENDING, DESCENDING, ReturnDocument
+
+from utils.fanout import fan_out, RateLimiter
+from utils.reachability import REACHABLE_FILTER
+
+logger = logging.getLogger(__name__)
+
+# Débit d'une diffusion admin (messages/seconde), en plus de la limite globale du bot
+BROADCAST_RATE = float(os.getenv("BROADCAST_RATE", "20"))
+# Taille d'un lot : au plus ce nombre de messages est renvoyé si le processus redémarre en plein lot
+BROADCAST_BATCH_SIZE = int(os.getenv("BROADCAST_BATCH_SIZE", "50"))
+# Intervalle de vérification des diffusions en attente (secondes)
+BROADCAST_POLL_INTERVAL = 30
+
+ACTIVE_STATUSES = ["pending", "running"]
+
+
+async def enqueue_broadcast(db, text: str, created_by: int) -> Dict:
+    """
+    Enregistre une diffusion à traiter par le worker
+    :param db: AsyncDatabase
+    :param text: Message à diffuser
+    :param created_by: ID Telegram de l'admin
+    :return: Document de la diffusion créée
+    """
+    job = {
+        "text": text,
+        "created_by": created_by,
+        "status": "pending",
+        "cursor": None,  # Dernier telegram_id traité
+        "total": await db.players.count_documents(REACHABLE_FILTER),
+        "sent": 0,
+        "failed": 0,
+        "skipped": 0,
+        "created_at": datetime.utcnow(),
+        "started_at": None,
+        "updated_at": None,
+        "finished_at": None
+    }
+    job["_id"] = (await db.broadcast_jobs.insert_one(job)).inserted_id
+    return job
+
+
+async def latest_broadcast(db) -> Optional[Dict]:
+    return await db.broadcast_jobs.find_one({}, sort=[("created_at", DESCENDING)])
+
+
+async def cancel_broadcast(db) -> Optional[Dict]:
+    """Annule la diffusion active la plus ancienne ; le worker s'arrête au lot suivant"""
+    return await db.broadcast_jobs.find_one_and_update(
+        {"status": {"$in": ACTIVE_STATUSES}},
+        {"$set": {"status": "cancelled", "finished_at": datetime.utcnow()}},
+        sort=[("created_at", ASCENDING)],
+        return_document=ReturnDocument.AFTER
+    )
+
+
+def throughput(job: Dict) -> float:
+    """Messages traités par seconde depuis le début de la diffusion"""
+    if not job.get("started_at"):
+        return 0.0
+    end = job.get("finished_at") or job.get("updated_at") or job["started_at"]
+    elapsed = (end - job["started_at"]).total_seconds()
+    processed = job.get("sent", 0) + job.get("failed", 0) + job.get("skipped", 0)
+    return processed / elapsed if elapsed > 0 else 0.0
+
+
+class BroadcastWorker:
+    """Traite les diffusions une par une en reprenant au curseur enregistré"""
+
+    def __init__(self, db, bot, rate: float = BROADCAST_RATE):
+        self.db = db
+        self.bot = bot
+        self.limiter = RateLimiter(rate)
+        self._wake = asyncio.Event()
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    async def _claim(self) -> Optional[Dict]:
+        # Une diffusion "running" est reprise en priorité (redémarrage en plein traitement)
+        return await self.db.broadcast_jobs.find_one_and_update(
+            {"status": {"$in": ACTIVE_STATUSES}},
+            {"$set": {"status": "running"}},
+            sort=[("status", DESCENDING), ("created_at", ASCENDING)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def _process(self, job: Dict) -> None:
+        jobs = self.db.broadcast_jobs
+        if not job.get("started_at"):
+            job["started_at"] = datetime.utcnow()
+            await jobs.update_one({"_id": job["_id"]}, {"$set": {"started_at": job["started_at"]}})
+        cursor = job.get("cursor")
+        logger.info(f"Diffusion {job['_id']} : reprise après telegram_id={cursor}")
+
+        while True:
+            status = await jobs.find_one({"_id": job["_id"]}, {"status": 1})
+            if not status or status["status"] != "running":
+                logger.info(f"Diffusion {job['_id']} interrompue ({status and status['status']})")
+                return
+
+            query = dict(REACHABLE_FILTER)
+            if cursor is not None:
+                query["telegram_id"] = {"$gt": cursor}
+            batch = [
+                p["telegram_id"]
+                for p in await self.db.players.find(query, {"telegram_id": 1})
+                .sort("telegram_id", ASCENDING).limit(BROADCAST_BATCH_SIZE).to_list()
+            ]
+            if not batch:
+                await jobs.update_one(
+                    {"_id": job["_id"], "status": "running"},
+                    {"$set": {"status": "done", "finished_at": datetime.utcnow()}}
+                )
+                logger.info(f"Diffusion {job['_id']} terminée")
+                return
+
+            report = await fan_out(self.bot, batch, limiter=self.limiter, text=f"[Annonce admin]\n{job['text']}")
+            cursor = batch[-1]
+            await jobs.update_one(
+                {"_id": job["_id"]},
+                {
+                    "$set": {"cursor": cursor, "updated_at": datetime.utcnow()},
+                    "$inc": {"sent": report.sent, "failed": report.failed, "skipped": report.skipped}
+                }
+            )
+
+    async def ensure_indexes(self) -> None:
+        await self.db.broadcast_jobs.create_index([("status", 1), ("created_at", 1)], name="status_created_at")
+
+    async def run(self) -> None:
+        await self.ensure_indexes()
+        while True:
+            try:
+                job = await self._claim()
+                if job:
+                    await self._process(job)
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Erreur worker de diffusion: {e}", exc_info=True)
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=BROADCAST_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,103 @@
+import os
+import asyncio
+import logging
+from typing import Dict
+
+from bson import ObjectId
+from telegram import InlineKeyboardMarkup, InlineKeyboardButton
+
+from utils.fanout import fan_out_messages
+
+logger = logging.getLogger(__name__)
+
+# Durée pendant laquelle les invitations d'un même destinataire sont regroupées (secondes)
+MATCH_DIGEST_WINDOW = float(os.getenv("MATCH_DIGEST_WINDOW", "20"))
+# Au-delà, les salles les plus anciennes sont ignorées (une ligne de boutons par salle)
+MAX_LOBBIES_PER_DIGEST = 8
+
+
+class MatchDigest:
+    """Regroupe les invitations de match par destinataire et les envoie en un seul message"""
+
+    def __init__(self, window: float = MATCH_DIGEST_WINDOW):
+        self.window = window
+        # destinataire -> match_id -> salle
+        self._pending: Dict[int, Dict[str, Dict]] = {}
+        self._task = None
+
+    def add(self, application, db, recipients, lobby: Dict) -> None:
+        """
+        Ajoute une salle au prochain résumé de chaque destinataire
+        :param lobby: {"match_id", "creator_id", "username", "mode", "link"}
+        """
+        for recipient in recipients:
+            self._pending.setdefault(recipient, {})[lobby["match_id"]] = lobby
+        if self._task is None or self._task.done():
+            self._task = application.create_task(self._flush_later(application.bot, db))
+
+    def discard(self, match_ids) -> int:
+        """Retire des résumés en attente les salles qui ne sont plus ouvertes"""
+        match_ids = set(match_ids)
+        removed = 0
+        for lobbies in self._pending.values():
+            for match_id in match_ids & lobbies.keys():
+                del lobbies[match_id]
+                removed += 1
+        return removed
+
+    async def _flush_later(self, bot, db) -> None:
+        await asyncio.sleep(self.window)
+        pending, self._pending = self._pending, {}
+        try:
+            await self._flush(bot, db, pending)
+        except Exception as e:
+            logger.error(f"Erreur envoi des résumés de match: {e}", exc_info=True)
+        if self._pending:
+            # Des salles sont arrivées pendant l'envoi : nouveau cycle
+            self._task = asyncio.get_running_loop().create_task(self._flush_later(bot, db))
+
+    async def _flush(self, bot, db, pending: Dict[int, Dict[str, Dict]]) -> None:
+        match_ids = {match_id for lobbies in pending.values() for match_id in lobbies}
+        if not match_ids:
+            return
+        # Une seule requête pour écarter les salles déjà prises ou annulées
+        still_open = {
+            str(m["_id"])
+            for m in await db.matches.find(
+                {"_id": {"$in": [ObjectId(mid) for mid in match_ids]}, "status": "searching"},
+                {"_id": 1}
+            ).to_list()
+        }
+
+        def messages():
+            for recipient, lobbies in pending.items():
+                open_lobbies = [l for mid, l in lobbies.items() if mid in still_open][-MAX_LOBBIES_PER_DIGEST:]
+                if open_lobbies:
+                    yield recipient, self._render(open_lobbies)
+
+        report = await fan_out_messages(bot, messages())
+        logger.info(f"Résumés de match ({len(still_open)}/{len(match_ids)} salles ouvertes) : {report}")
+
+    @staticmethod
+    def _render(lobbies) -> Dict:
+        if len(lobbies) == 1:
+            lobby = lobbies[0]
+            text = (
+                f"🔔 {lobby['username'] or 'Un joueur'} cherche un match {lobby['mode']} !\n"
+                f"Rejoins la salle amicale avec ce lien :\n{lobby['link']}"
+            )
+        else:
+            text = f"🔔 {len(lobbies)} joueurs cherchent un match :\n" + "\n".join(
+                f"• {l['username'] or 'Un joueur'} ({l['mode']}) : {l['link']}" for l in lobbies
+            )
+        keyboard = [
+            [InlineKeyboardButton(
+                f"Rejoindre {l['username'] or 'le joueur'} ({l['mode']})",
+                callback_data=f"join_{l['creator_id']}_{l['mode']}"
+            )]
+            for l in lobbies
+        ]
+        return {"text": text, "reply_markup": InlineKeyboardMarkup(keyboard)}
+
+
+match_digest = MatchDigest()
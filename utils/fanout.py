@@ -0,0 +1,177 @@
+import os
+import time
+import asyncio
+import logging
+from typing import Any, AsyncIterable, Dict, Iterable, Optional, Tuple, Union
+
+from telegram.error import RetryAfter, TimedOut, NetworkError
+
+from utils.reachability import unreachable_chats, is_unreachable_error
+
+logger = logging.getLogger(__name__)
+
+# Telegram tolère ~30 messages/s au total et ~1 message/s par conversation
+FANOUT_CONCURRENCY = int(os.getenv("FANOUT_CONCURRENCY", "20"))
+FANOUT_GLOBAL_RATE = float(os.getenv("FANOUT_GLOBAL_RATE", "25"))
+FANOUT_PER_CHAT_INTERVAL = float(os.getenv("FANOUT_PER_CHAT_INTERVAL", "1.0"))
+MAX_RETRIES = 3
+
+
+class RateLimiter:
+    """Limiteur par réservation : au plus `rate` envois par seconde, partagé entre coroutines"""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = 0.0
+
+    def pause(self, seconds: float) -> None:
+        """Bloque toutes les acquisitions pendant `seconds` (utilisé sur RetryAfter)"""
+        self._next = max(self._next, time.monotonic() + seconds)
+
+    async def acquire(self) -> None:
+        now = time.monotonic()
+        slot = max(now, self._next)
+        self._next = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+class ChatThrottle:
+    """Espace les envois vers une même conversation d'au moins `interval` secondes"""
+
+    MAX_TRACKED = 10000
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._next: Dict[int, float] = {}
+
+    async def acquire(self, chat_id: int) -> None:
+        now = time.monotonic()
+        if len(self._next) > self.MAX_TRACKED:
+            self._next = {cid: t for cid, t in self._next.items() if t > now}
+        slot = max(now, self._next.get(chat_id, 0.0))
+        self._next[chat_id] = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+# Limites partagées par tous les envois groupés du processus (un seul bot)
+global_limiter = RateLimiter(FANOUT_GLOBAL_RATE)
+chat_throttle = ChatThrottle(FANOUT_PER_CHAT_INTERVAL)
+
+
+class FanOutReport:
+    """Bilan d'un envoi groupé"""
+
+    def __init__(self):
+        self.sent = 0
+        self.failed = 0
+        self.skipped = 0
+        self.started_at = time.monotonic()
+        self.elapsed = 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.sent} envoyé(s), {self.failed} échec(s), {self.skipped} ignoré(s) "
+            f"en {self.elapsed:.1f}s"
+        )
+
+
+async def _send_one(bot, chat_id: int, message: Dict[str, Any], limiter: Optional[RateLimiter]) -> bool:
+    for attempt in range(MAX_RETRIES + 1):
+        if limiter is not None:
+            await limiter.acquire()
+        await global_limiter.acquire()
+        await chat_throttle.acquire(chat_id)
+        try:
+            await bot.send_message(chat_id=chat_id, **message)
+            return True
+        except RetryAfter as e:
+            # Telegram impose une pause à tout le bot, pas seulement à cette conversation
+            global_limiter.pause(e.retry_after)
+            logger.warning(f"RetryAfter {e.retry_after}s pendant un envoi groupé")
+        except (TimedOut, NetworkError) as e:
+            if attempt == MAX_RETRIES:
+                logger.debug(f"Échec réseau vers {chat_id}: {e}")
+                return False
+            await asyncio.sleep(2 ** attempt)
+        except Exception as e:
+            if is_unreachable_error(e):
+                # Le joueur a bloqué le bot : les prochains envois groupés l'ignoreront
+                await unreachable_chats.mark_unreachable(chat_id)
+            logger.debug(f"Échec d'envoi vers {chat_id}: {e}")
+            return False
+    return False
+
+
+async def fan_out_messages(
+    bot,
+    messages: Union[Iterable[Tuple[int, Dict[str, Any]]], AsyncIterable[Tuple[int, Dict[str, Any]]]],
+    concurrency: Optional[int] = None,
+    limiter: Optional[RateLimiter] = None
+) -> FanOutReport:
+    """
+    Envoie un message par destinataire avec une concurrence bornée
+    :param bot: Instance telegram.Bot
+    :param messages: Itérable (ou itérable asynchrone, ex: curseur) de (chat_id, kwargs de send_message),
+                     consommé au fil de l'eau
+    :param concurrency: Nombre d'envois simultanés (FANOUT_CONCURRENCY par défaut)
+    :param limiter: Limiteur supplémentaire propre à cet envoi (ex: débit d'une diffusion)
+    :return: Bilan envoyés/échecs/ignorés
+    """
+    report = FanOutReport()
+    seen = set()
+    workers = concurrency or FANOUT_CONCURRENCY
+    queue = asyncio.Queue(maxsize=workers * 2)
+
+    async def producer():
+        try:
+            if hasattr(messages, "__aiter__"):
+                async for item in messages:
+                    await queue.put(item)
+            else:
+                for item in messages:
+                    await queue.put(item)
+        finally:
+            for _ in range(workers):
+                await queue.put(None)
+
+    async def worker():
+        # Chaque worker tire le prochain destinataire de la file partagée
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            chat_id, message = item
+            if chat_id is None or chat_id in seen or chat_id in unreachable_chats:
+                report.skipped += 1
+                continue
+            seen.add(chat_id)
+            if await _send_one(bot, chat_id, message, limiter):
+                report.sent += 1
+            else:
+                report.failed += 1
+
+    await asyncio.gather(producer(), *(worker() for _ in range(workers)))
+    report.elapsed = time.monotonic() - report.started_at
+    return report
+
+
+async def fan_out(bot, chat_ids: Union[Iterable[int], AsyncIterable[int]], concurrency: Optional[int] = None,
+                  limiter: Optional[RateLimiter] = None, **message) -> FanOutReport:
+    """Envoie le même message (kwargs de send_message) à chaque chat_id"""
+    if hasattr(chat_ids, "__aiter__"):
+        messages = ((chat_id, message) async for chat_id in chat_ids)
+    else:
+        messages = ((chat_id, message) for chat_id in chat_ids)
+    return await fan_out_messages(bot, messages, concurrency=concurrency, limiter=limiter)
+
+
+def spawn_fan_out(context, chat_ids: Union[Iterable[int], AsyncIterable[int]], label: str, **message) -> asyncio.Task:
+    """Lance fan_out en tâche de fond pour ne pas bloquer la conversation en cours"""
+    async def run():
+        report = await fan_out(context.bot, chat_ids, **message)
+        logger.info(f"Envoi groupé '{label}' : {report}")
+        return report
+
+    return context.application.create_task(run())
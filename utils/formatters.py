@@ -0,0 +1,119 @@
+import os
+import time
+import logging
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+from utils.team_names import team_names
+from utils.registered import registered_players
+
+logger = logging.getLogger(__name__)
+
+PROFILE_CARD_CACHE_SIZE = int(os.getenv("PROFILE_CARD_CACHE_SIZE", "10000"))
+# Durée de vie d'une fiche (secondes) : filet de sécurité pour les écritures faites hors du bot
+PROFILE_CARD_TTL = float(os.getenv("PROFILE_CARD_TTL", "600"))
+
+# Champs affichés sur la fiche d'un joueur
+CARD_PROJECTION = {
+    "_id": 0, "telegram_id": 1, "username": 1, "trophies": 1, "main_brawler": 1, "country": 1, "team_id": 1,
+    "wins": 1, "defeats": 1, "matches_played": 1, "registered_at": 1, "profile_photo": 1
+}
+
+
+def format_date(value: Optional[datetime]) -> str:
+    return (value or datetime.utcnow()).strftime("%d/%m/%Y %H:%M")
+
+
+def render_card(player: Dict, team_name: Optional[str]) -> Dict:
+    """
+    Fiche d'un joueur, rendue une fois pour /profile, /search, /findall et /news
+    :return: {"text": fiche complète, "line": résumé sur une ligne (listes), "photo": profile_photo}
+    """
+    username = player.get("username", "Inconnu")
+    team = team_name if team_name else "Aucune"
+    return {
+        "text": (
+            f"👤 Pseudo : {username}\n"
+            f"• Pays : {player.get('country', 'N/A')}\n"
+            f"• Team : {team}\n"
+            f"• Trophées : {player.get('trophies', 'N/A')}\n"
+            f"• Brawler principal : {player.get('main_brawler', 'N/A')}\n"
+            f"• Victoires : {player.get('wins', 0)}\n"
+            f"• Défaites : {player.get('defeats', 0)}\n"
+            f"• Matchs joués : {player.get('matches_played', 0)}\n"
+            f"• Inscrit le : {format_date(player.get('registered_at'))}\n"
+        ),
+        "line": (
+            f"👤 {username} — 🏆 {player.get('trophies', 'N/A')} • "
+            f"{player.get('country', 'N/A')} • {player.get('main_brawler', 'N/A')} • Team : {team}"
+        ),
+        "photo": player.get("profile_photo"),
+    }
+
+
+class ProfileCards:
+    """
+    Fiches joueur pré-rendues (LRU + TTL) par telegram_id. Chaque fiche est rangée sous le numéro
+    de version du joueur, incrémenté par bump() à chaque modification du profil, des stats ou de la team :
+    une lecture commencée avant une modification n'écrase donc jamais la fiche à jour.
+    """
+
+    def __init__(self, max_size: int = PROFILE_CARD_CACHE_SIZE, ttl: float = PROFILE_CARD_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        # telegram_id -> (fiche, expiration), du moins au plus récemment utilisé
+        self._cards: "OrderedDict[int, Tuple[Dict, float]]" = OrderedDict()
+        # telegram_id -> version ; jamais remise à zéro, sinon une lecture en cours pourrait la retrouver
+        self._versions: Dict[int, int] = {}
+
+    def version(self, telegram_id: int) -> int:
+        return self._versions.get(telegram_id, 0)
+
+    def bump(self, telegram_ids: Iterable[int]) -> None:
+        """À appeler après toute écriture sur ces joueurs (profil, trophées, résultats, team...)"""
+        for telegram_id in telegram_ids:
+            self._versions[telegram_id] = self.version(telegram_id) + 1
+            self._cards.pop(telegram_id, None)
+
+    def _put(self, telegram_id: int, card: Dict, version: int, now: float) -> None:
+        if version != self.version(telegram_id):
+            return
+        self._cards[telegram_id] = (card, now + self.ttl)
+        self._cards.move_to_end(telegram_id)
+        while len(self._cards) > self.max_size:
+            self._cards.popitem(last=False)
+
+    async def get_many(self, db, telegram_ids: Iterable[int]) -> Dict[int, Dict]:
+        """
+        Fiches d'un lot de joueurs ; les absentes du cache sont lues en une requête $in
+        et les noms de team résolus en une seule autre
+        :return: {telegram_id: fiche} pour les joueurs inscrits
+        """
+        now = time.monotonic()
+        cards, versions = {}, {}
+        for telegram_id in telegram_ids:
+            entry = self._cards.get(telegram_id)
+            if entry and entry[1] > now:
+                self._cards.move_to_end(telegram_id)
+                cards[telegram_id] = entry[0]
+            elif not registered_players.surely_absent(telegram_id):
+                # Version prise avant la lecture en base
+                versions[telegram_id] = self.version(telegram_id)
+        if not versions:
+            return cards
+
+        players = await db.players.find({"telegram_id": {"$in": list(versions)}}, CARD_PROJECTION).to_list()
+        teams = await team_names.for_players(db, players)
+        for player in players:
+            telegram_id = player["telegram_id"]
+            card = render_card(player, teams.get(player.get("team_id")))
+            self._put(telegram_id, card, versions[telegram_id], now)
+            cards[telegram_id] = card
+        return cards
+
+    async def get(self, db, telegram_id: int) -> Optional[Dict]:
+        return (await self.get_many(db, [telegram_id])).get(telegram_id)
+
+
+profile_cards = ProfileCards()
@@ -0,0 +1,88 @@
+import io
+import os
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, NamedTuple, Tuple, Union
+
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Décodage, redimensionnement et encodage libèrent le GIL : un petit pool dédié suffit,
+# séparé de celui de Mongo pour qu'une rafale de photos ne retarde pas les requêtes.
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+
+_executor = ThreadPoolExecutor(max_workers=IMAGE_WORKERS, thread_name_prefix="image")
+
+
+class ImageSpec(NamedTuple):
+    max_size: Tuple[int, int]
+    format: str  # "JPEG" ou "WEBP"
+    quality: int
+
+
+# Les images sont renvoyées par URL dans send_photo, que Telegram accepte en JPEG ;
+# IMAGE_FORMAT=WEBP réduit encore le stockage Cloudinary si l'affichage le permet.
+IMAGE_FORMAT = os.getenv("IMAGE_FORMAT", "JPEG").upper()
+
+# Dimensions maximales par usage : les captures restent lisibles en cas de litige sur un résultat
+IMAGE_SPECS: Dict[str, ImageSpec] = {
+    "profile": ImageSpec((720, 720), IMAGE_FORMAT, 82),
+    "logo": ImageSpec((512, 512), IMAGE_FORMAT, 85),
+    "screenshot": ImageSpec((1600, 1600), IMAGE_FORMAT, 85),
+}
+
+
+def process_image(data: Union[bytes, bytearray], use_case: str) -> bytes:
+    """
+    Décode, retire les métadonnées (EXIF, ICC...), réduit aux dimensions de l'usage et réencode
+    :param use_case: Clé de IMAGE_SPECS ("profile", "logo", "screenshot")
+    :return: Image réencodée, ou l'originale si elle est déjà plus petite et sans métadonnées
+    """
+    spec = IMAGE_SPECS[use_case]
+    with Image.open(io.BytesIO(data)) as source:
+        has_metadata = any(key in source.info for key in ("exif", "icc_profile", "xmp", "comment"))
+        # JPEG : décodage directement à une échelle réduite (1/2, 1/4, 1/8), bien plus rapide
+        source.draft("RGB", spec.max_size)
+        image = ImageOps.exif_transpose(source)
+        resized = image.width > spec.max_size[0] or image.height > spec.max_size[1]
+        image.thumbnail(spec.max_size, Image.LANCZOS)
+
+        if spec.format == "JPEG" and image.mode != "RGB":
+            if image.mode in ("RGBA", "LA", "P"):
+                # Transparence (logos) posée sur fond blanc
+                image = image.convert("RGBA")
+                background = Image.new("RGB", image.size, (255, 255, 255))
+                background.paste(image, mask=image.getchannel("A"))
+                image = background
+            else:
+                image = image.convert("RGB")
+        elif image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "A" in image.getbands() or image.mode == "P" else "RGB")
+
+        # Aucune métadonnée n'est passée à save() : EXIF, ICC et XMP ne sont pas réécrits
+        output = io.BytesIO()
+        if spec.format == "WEBP":
+            image.save(output, "WEBP", quality=spec.quality, method=4)
+        else:
+            image.save(output, "JPEG", quality=spec.quality, optimize=True, progressive=True)
+        same_format = source.format == spec.format
+
+    processed = output.getvalue()
+    if len(processed) >= len(data) and same_format and not resized and not has_metadata:
+        return bytes(data)
+    return processed
+
+
+async def prepare_image(data: Union[bytes, bytearray], use_case: str) -> bytes:
+    """
+    Traitement d'une photo reçue avant envoi sur Cloudinary, hors de la boucle d'événements.
+    Une image illisible par Pillow est envoyée telle quelle.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(_executor, process_image, bytes(data), use_case)
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        logger.warning(f"Image {use_case} non traitée, envoi de l'originale : {e}")
+        return bytes(data)
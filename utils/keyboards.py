@@ -0,0 +1,16 @@
+from typing import List, Tuple
+
+from telegram import InlineKeyboardMarkup, InlineKeyboardButton
+
+
+def suggestions_keyboard(matches: List[Tuple[object, str]], callback_prefix: str, label: str = "{}") -> InlineKeyboardMarkup:
+    """
+    Un bouton par suggestion de la recherche approchée (utils.name_search)
+    :param matches: [(identifiant, nom affiché)]
+    :param callback_prefix: Préfixe du callback_data, suivi de l'identifiant
+    :param label: Gabarit du texte du bouton, ex: "Bannir {}"
+    """
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton(label.format(name), callback_data=f"{callback_prefix}{doc_id}")]
+        for doc_id, name in matches
+    ])
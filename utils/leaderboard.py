@@ -0,0 +1,203 @@
+import os
+import asyncio
+import logging
+from bisect import bisect_left, insort
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Nombre de joueurs affichés par classement
+LEADERBOARD_SIZE = int(os.getenv("LEADERBOARD_SIZE", "10"))
+# Reconstruction complète depuis Mongo (secondes) : rattrape les écritures faites hors du bot
+LEADERBOARD_REFRESH_INTERVAL = float(os.getenv("LEADERBOARD_REFRESH_INTERVAL", "600"))
+
+# Clé de tri : plus de trophées, puis plus de victoires, puis telegram_id pour départager
+RankKey = Tuple[int, int, int]
+
+
+def scope_value(value) -> str:
+    """Pays ou brawler normalisé ("France " et "france" forment le même classement)"""
+    return str(value or "").strip().casefold()
+
+
+class Leaderboard:
+    """
+    Classements en mémoire (global, par pays, par brawler principal), triés en permanence :
+    le top N est une tranche de liste et le rang d'un joueur une recherche dichotomique.
+    """
+
+    PROJECTION = {
+        "_id": 0, "telegram_id": 1, "username": 1, "trophies": 1, "wins": 1,
+        "matches_played": 1, "country": 1, "main_brawler": 1, "last_active": 1
+    }
+    FIELDS = ("username", "trophies", "wins", "matches_played", "country", "main_brawler", "last_active")
+
+    def __init__(self):
+        # (scope, valeur normalisée) -> clés triées
+        self._boards: Dict[Tuple[str, str], List[RankKey]] = {}
+        # telegram_id -> champs du joueur (voir FIELDS)
+        self._players: Dict[int, Dict] = {}
+        # Joueurs modifiés pendant une reconstruction (None hors reconstruction)
+        self._touched: Optional[Set[int]] = None
+        self.loaded = False
+
+    def __len__(self) -> int:
+        return len(self._players)
+
+    @staticmethod
+    def _key(telegram_id: int, player: Dict) -> RankKey:
+        return -int(player.get("trophies") or 0), -int(player.get("wins") or 0), telegram_id
+
+    @staticmethod
+    def _scopes(player: Dict) -> List[Tuple[str, str]]:
+        scopes = [("global", "")]
+        if scope_value(player.get("country")):
+            scopes.append(("country", scope_value(player.get("country"))))
+        if scope_value(player.get("main_brawler")):
+            scopes.append(("brawler", scope_value(player.get("main_brawler"))))
+        return scopes
+
+    async def load(self, db) -> None:
+        """
+        Reconstruit tous les classements ; les anciens restent servis pendant la lecture.
+        Les joueurs modifiés entre-temps (ban, résultat, inscription...) sont relus avant l'échange,
+        sinon la lecture déjà passée sur leur document écraserait la modification.
+        """
+        players, boards = {}, {}
+        self._touched = set()
+        try:
+            async for doc in db.players.find({}, self.PROJECTION):
+                player = {field: doc.get(field) for field in self.FIELDS}
+                players[doc["telegram_id"]] = player
+                key = self._key(doc["telegram_id"], player)
+                for scope in self._scopes(player):
+                    boards.setdefault(scope, []).append(key)
+            for keys in boards.values():
+                keys.sort()
+
+            # Pas d'await entre le dernier contrôle de _touched et l'échange
+            while self._touched:
+                touched, self._touched = self._touched, set()
+                fresh = {
+                    doc["telegram_id"]: doc
+                    async for doc in db.players.find({"telegram_id": {"$in": list(touched)}}, self.PROJECTION)
+                }
+                for telegram_id in touched:
+                    self._drop(players, boards, telegram_id)
+                    if telegram_id in fresh:
+                        player = {field: fresh[telegram_id].get(field) for field in self.FIELDS}
+                        self._insert(players, boards, telegram_id, player)
+            self._players, self._boards = players, boards
+        finally:
+            self._touched = None
+        self.loaded = True
+        logger.info(f"Classements chargés : {len(players)} joueurs, {len(boards)} classements")
+
+    async def ensure_loaded(self, db) -> None:
+        if not self.loaded:
+            await self.load(db)
+
+    @classmethod
+    def _drop(cls, players: Dict[int, Dict], boards: Dict[Tuple[str, str], List[RankKey]], telegram_id: int) -> None:
+        player = players.pop(telegram_id, None)
+        if not player:
+            return
+        key = cls._key(telegram_id, player)
+        for scope in cls._scopes(player):
+            keys = boards.get(scope)
+            if keys is None:
+                continue
+            i = bisect_left(keys, key)
+            if i < len(keys) and keys[i] == key:
+                del keys[i]
+            if not keys:
+                del boards[scope]
+
+    @classmethod
+    def _insert(cls, players: Dict[int, Dict], boards: Dict[Tuple[str, str], List[RankKey]],
+                telegram_id: int, player: Dict) -> None:
+        players[telegram_id] = player
+        key = cls._key(telegram_id, player)
+        for scope in cls._scopes(player):
+            insort(boards.setdefault(scope, []), key)
+
+    def _touch(self, telegram_id: int) -> None:
+        if self._touched is not None:
+            self._touched.add(telegram_id)
+
+    def remove(self, telegram_id: int) -> None:
+        self._touch(telegram_id)
+        self._drop(self._players, self._boards, telegram_id)
+
+    def upsert(self, player: Dict) -> None:
+        """
+        Met à jour un joueur ; les champs absents conservent leur valeur
+        :param player: Document (partiel) contenant au moins telegram_id
+        """
+        telegram_id = player["telegram_id"]
+        merged = dict(self._players.get(telegram_id, {}))
+        merged.update((field, player[field]) for field in self.FIELDS if field in player)
+        self.remove(telegram_id)
+        self._insert(self._players, self._boards, telegram_id, merged)
+
+    def bump(self, telegram_id: int, **deltas: int) -> None:
+        """
+        Applique un $inc déjà écrit en base (trophies, wins, matches_played)
+        Un joueur absent est ignoré : la prochaine reconstruction le rattrapera
+        """
+        player = self._players.get(telegram_id)
+        if not player:
+            return
+        self.upsert({
+            "telegram_id": telegram_id,
+            **{field: int(player.get(field) or 0) + delta for field, delta in deltas.items()}
+        })
+
+    def ranked(self, scope: str = "global", value: str = "") -> Iterator[Dict]:
+        """
+        Parcourt un classement du premier au dernier
+        :param scope: "global", "country" ou "brawler"
+        :param value: Pays ou brawler pour les classements filtrés
+        :return: {rank, telegram_id, username, trophies, ...} pour chaque joueur
+        """
+        keys = self._boards.get((scope, scope_value(value) if scope != "global" else ""), [])
+        for rank, key in enumerate(keys, start=1):
+            yield {"rank": rank, "telegram_id": key[2], **self._players[key[2]]}
+
+    def top(self, scope: str = "global", value: str = "", limit: int = LEADERBOARD_SIZE) -> List[Dict]:
+        """Premiers joueurs d'un classement (voir ranked)"""
+        return list(islice(self.ranked(scope, value), limit))
+
+    def rank_of(self, telegram_id: int, scope: str = "global") -> Optional[Tuple[int, int]]:
+        """
+        Rang du joueur dans son classement (global, de son pays ou de son brawler)
+        :return: (rang, nombre de joueurs classés), ou None si le joueur n'y figure pas
+        """
+        player = self._players.get(telegram_id)
+        if not player:
+            return None
+        value = "" if scope == "global" else scope_value(player.get("main_brawler" if scope == "brawler" else scope))
+        keys = self._boards.get((scope, value))
+        if not keys:
+            return None
+        return bisect_left(keys, self._key(telegram_id, player)) + 1, len(keys)
+
+    def player(self, telegram_id: int) -> Optional[Dict]:
+        return self._players.get(telegram_id)
+
+    async def run(self, db, interval: float = LEADERBOARD_REFRESH_INTERVAL) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.load(db)
+            except Exception as e:
+                logger.error(f"Erreur reconstruction des classements: {e}", exc_info=True)
+
+
+leaderboard = Leaderboard()
+
+
+def start_leaderboard_refresh(application, db) -> None:
+    """Reconstruction périodique en tâche de fond (le premier chargement se fait dans post_init)"""
+    application.create_task(leaderboard.run(db))
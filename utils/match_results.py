@@ -0,0 +1,67 @@
+import logging
+from datetime import datetime
+from typing import Dict, Optional
+
+from pymongo import UpdateOne
+
+from utils.leaderboard import leaderboard
+from utils.player_cache import player_cache
+from utils.formatters import profile_cards
+
+logger = logging.getLogger(__name__)
+
+# Nombre de résultats appliqués gardés sur chaque joueur pour détecter les finalisations rejouées
+APPLIED_RESULTS_KEPT = 50
+
+
+async def apply_result(db, result_key: str, outcomes: Dict[int, str], record: Optional[Dict] = None) -> int:
+    """
+    Met à jour les statistiques de tous les joueurs d'un match ou d'un scrim en un seul bulk_write.
+    Idempotent : chaque joueur garde la clé des derniers résultats appliqués, une finalisation
+    rejouée (double /done, capture renvoyée...) ne compte donc jamais deux fois.
+    :param result_key: Identifiant stable du résultat, ex: "match:<_id>" ou "scrim:<_id>"
+    :param outcomes: {telegram_id: "win" | "lose" | "draw"}
+    :param record: Document enregistré dans la collection scrims (_id = result_key), facultatif
+    :return: Nombre de joueurs mis à jour par cet appel
+    """
+    now = datetime.utcnow()
+    ops = [
+        UpdateOne(
+            {"telegram_id": telegram_id, "applied_results": {"$ne": result_key}},
+            {
+                "$inc": {
+                    "matches_played": 1,
+                    "wins": int(outcome == "win"),
+                    "defeats": int(outcome == "lose")
+                },
+                "$set": {"last_active": now},
+                "$push": {"applied_results": {"$each": [result_key], "$slice": -APPLIED_RESULTS_KEPT}}
+            }
+        )
+        for telegram_id, outcome in outcomes.items()
+    ]
+    modified = (await db.players.bulk_write(ops, ordered=False)).modified_count if ops else 0
+    player_cache.invalidate(outcomes)
+    profile_cards.bump(outcomes)
+
+    if record is not None:
+        # Upsert sur la même clé : rejouer la finalisation ne crée pas de doublon
+        await db.scrims.update_one(
+            {"_id": result_key},
+            {"$setOnInsert": {**record, "finished_at": now}},
+            upsert=True
+        )
+
+    if modified == len(ops):
+        for telegram_id, outcome in outcomes.items():
+            leaderboard.bump(telegram_id, matches_played=1, wins=int(outcome == "win"))
+    elif modified:
+        # Finalisation partiellement rejouée : on relit les joueurs plutôt que de deviner lesquels ont compté
+        async for player in db.players.find(
+            {"telegram_id": {"$in": list(outcomes)}},
+            {"_id": 0, "telegram_id": 1, "wins": 1, "matches_played": 1}
+        ):
+            leaderboard.upsert(player)
+    if modified < len(ops):
+        logger.info(f"Résultat {result_key} : {len(ops) - modified} joueur(s) déjà comptés")
+    return modified
@@ -1,6 +1,156 @@
-# utils/matcher.py
-def find_opponent(player_trophies):
-    return db.players.find_one({
-        "trophies": {"$gte": player_trophies - 50, "$lte": player_trophies + 50},
-        "available": True
-    }).sort("last_active", -1)
\ No newline at end of file
+import os
+import logging
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Largeur d'une tranche de trophées (un seau trié par tranche et par mode)
+BAND_WIDTH = int(os.getenv("MATCH_BAND_WIDTH", "100"))
+# Écart de trophées accepté par une salle : s'élargit avec son temps d'attente
+MATCH_WINDOW_BASE = int(os.getenv("MATCH_WINDOW_BASE", "100"))
+MATCH_WINDOW_GROWTH = float(os.getenv("MATCH_WINDOW_GROWTH", "2"))  # trophées par seconde d'attente
+MATCH_WINDOW_MAX = int(os.getenv("MATCH_WINDOW_MAX", "1000"))
+
+# (trophées, début d'attente, match_id) : ordre de tri dans un seau
+Slot = Tuple[int, float, str]
+
+
+def match_window(waited: float) -> float:
+    """Écart maximal de trophées accepté après `waited` secondes d'attente"""
+    return min(MATCH_WINDOW_BASE + MATCH_WINDOW_GROWTH * max(waited, 0), MATCH_WINDOW_MAX)
+
+
+class MatchQueue:
+    """
+    File de matchmaking en mémoire : salles en recherche (status "searching") par mode,
+    rangées en seaux de BAND_WIDTH trophées. L'état persistant reste dans db.matches ;
+    la file est rechargée au démarrage avec load().
+    """
+
+    def __init__(self):
+        # mode -> tranche -> salles triées
+        self._bands: Dict[str, Dict[int, List[Slot]]] = {}
+        # mode -> tranches non vides, triées
+        self._band_keys: Dict[str, List[int]] = {}
+        # match_id -> (mode, trophées, début d'attente, créateur, expiration)
+        self._entries: Dict[str, Tuple[str, int, float, int, Optional[float]]] = {}
+        self.loaded = False
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def load(self, db) -> None:
+        """Reconstruit la file depuis les salles encore ouvertes de db.matches"""
+        self._bands, self._band_keys, self._entries = {}, {}, {}
+        now = datetime.utcnow()
+        async for match in db.matches.find(
+            {"status": "searching", "expires_at": {"$gt": now}},
+            {"telegram_id": 1, "mode": 1, "trophies": 1, "searching_since": 1, "created_at": 1, "expires_at": 1}
+        ):
+            self.enqueue(
+                str(match["_id"]), match["mode"], match.get("trophies", 0), match["telegram_id"],
+                match.get("searching_since") or match.get("created_at") or now, match.get("expires_at")
+            )
+        self.loaded = True
+        logger.info(f"File de matchmaking chargée : {len(self._entries)} salle(s) en recherche")
+
+    async def ensure_loaded(self, db) -> None:
+        if not self.loaded:
+            await self.load(db)
+
+    def enqueue(self, match_id: str, mode: str, trophies: int, telegram_id: int,
+                since: datetime, expires_at: Optional[datetime] = None) -> None:
+        """Ajoute une salle passée en recherche (O(log n))"""
+        self.remove(match_id)
+        trophies = int(trophies or 0)
+        started = since.timestamp() if isinstance(since, datetime) else float(since)
+        expires = expires_at.timestamp() if isinstance(expires_at, datetime) else expires_at
+        self._entries[match_id] = (mode, trophies, started, telegram_id, expires)
+        band = trophies // BAND_WIDTH
+        bands = self._bands.setdefault(mode, {})
+        if band not in bands:
+            bands[band] = []
+            insort(self._band_keys.setdefault(mode, []), band)
+        insort(bands[band], (trophies, started, match_id))
+
+    def remove(self, match_id: str) -> bool:
+        """Retire une salle réservée, annulée ou expirée"""
+        entry = self._entries.pop(match_id, None)
+        if not entry:
+            return False
+        mode, trophies, started, _, _ = entry
+        band = trophies // BAND_WIDTH
+        slots = self._bands[mode][band]
+        i = bisect_left(slots, (trophies, started, match_id))
+        if i < len(slots) and slots[i][2] == match_id:
+            del slots[i]
+        if not slots:
+            del self._bands[mode][band]
+            keys = self._band_keys[mode]
+            del keys[bisect_left(keys, band)]
+        return True
+
+    def discard(self, match_ids: Iterable[str]) -> int:
+        return sum(self.remove(match_id) for match_id in match_ids)
+
+    def _walk_up(self, mode: str, trophies: int) -> Iterator[Slot]:
+        """Salles de trophées >= `trophies`, de la plus proche à la plus lointaine"""
+        keys = self._band_keys.get(mode, [])
+        bands = self._bands.get(mode, {})
+        k = bisect_left(keys, trophies // BAND_WIDTH)
+        first = True
+        while k < len(keys):
+            slots = bands[keys[k]]
+            start = bisect_left(slots, (trophies, float("-inf"), "")) if first else 0
+            first = False
+            yield from slots[start:]
+            k += 1
+
+    def _walk_down(self, mode: str, trophies: int) -> Iterator[Slot]:
+        """Salles de trophées < `trophies`, de la plus proche à la plus lointaine"""
+        keys = self._band_keys.get(mode, [])
+        bands = self._bands.get(mode, {})
+        k = bisect_right(keys, trophies // BAND_WIDTH) - 1
+        first = True
+        while k >= 0:
+            slots = bands[keys[k]]
+            end = bisect_left(slots, (trophies, float("-inf"), "")) if first else len(slots)
+            first = False
+            yield from reversed(slots[:end])
+            k -= 1
+
+    def _nearest(self, walk: Iterator[Slot], exclude: int, now: float) -> Optional[Slot]:
+        expired = []
+        try:
+            for slot in walk:
+                _, _, _, telegram_id, expires = self._entries[slot[2]]
+                if expires is not None and expires <= now:
+                    expired.append(slot[2])
+                elif telegram_id != exclude:
+                    return slot
+            return None
+        finally:
+            self.discard(expired)
+
+    def find_opponent(self, mode: str, trophies: int, exclude: Optional[int] = None,
+                      now: Optional[datetime] = None) -> Optional[str]:
+        """
+        Salle la plus proche en trophées dont la fenêtre d'attente accepte l'écart.
+        Seule la plus proche de chaque côté est examinée (O(log n)) ; une salle plus lointaine
+        mais plus ancienne sera proposée aux joueurs suivants, quand sa fenêtre l'acceptera.
+        :param exclude: telegram_id du joueur qui cherche (ses propres salles sont ignorées)
+        :return: match_id, ou None si aucune salle acceptable
+        """
+        now = (now or datetime.utcnow()).timestamp()
+        trophies = int(trophies or 0)
+        candidates = []
+        for slot in (self._nearest(self._walk_up(mode, trophies), exclude, now),
+                     self._nearest(self._walk_down(mode, trophies), exclude, now)):
+            if slot and abs(slot[0] - trophies) <= match_window(now - slot[1]):
+                candidates.append((abs(slot[0] - trophies), slot[1], slot[2]))
+        return min(candidates)[2] if candidates else None
+
+
+match_queue = MatchQueue()
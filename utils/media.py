@@ -0,0 +1,144 @@
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from telegram import InputMediaPhoto
+from telegram.error import BadRequest
+
+logger = logging.getLogger(__name__)
+
+MAX_ALBUM_SIZE = 10  # Limite Telegram de send_media_group
+CAPTION_LIMIT = 1024
+TEXT_LIMIT = 4096
+
+
+class FileIdCache:
+    """
+    Associe l'URL Cloudinary d'une image au file_id Telegram obtenu au premier envoi,
+    pour que Telegram ne retélécharge pas l'image à chaque affichage
+    """
+
+    COLLECTION_NAME = "telegram_files"
+
+    def __init__(self):
+        self._file_ids: Dict[str, str] = {}
+        self._collection = None
+
+    async def _ensure_loaded(self, db) -> None:
+        if self._collection is not None:
+            return
+        collection = db[self.COLLECTION_NAME]
+        await collection.create_index("url", unique=True, name="url_unique")
+        docs = await collection.find({}, {"_id": 0}).to_list()
+        self._file_ids = {doc["url"]: doc["file_id"] for doc in docs}
+        self._collection = collection
+        logger.info(f"{len(self._file_ids)} file_id Telegram chargé(s)")
+
+    async def get(self, db, url: Optional[str]) -> Optional[str]:
+        if not url or db is None:
+            return url
+        await self._ensure_loaded(db)
+        return self._file_ids.get(url, url)
+
+    async def remember(self, url: str, message) -> None:
+        if self._collection is None or not getattr(message, "photo", None):
+            return
+        file_id = message.photo[-1].file_id
+        if self._file_ids.get(url) == file_id:
+            return
+        self._file_ids[url] = file_id
+        await self._collection.update_one({"url": url}, {"$set": {"file_id": file_id}}, upsert=True)
+
+    async def forget(self, url: str) -> None:
+        if self._file_ids.pop(url, None) and self._collection is not None:
+            await self._collection.delete_one({"url": url})
+
+
+file_ids = FileIdCache()
+
+
+async def send_photo_cached(bot, db, chat_id: int, url: str, caption: Optional[str] = None, **kwargs):
+    """
+    Envoie une photo via son file_id Telegram s'il est connu, sinon via l'URL puis mémorise le file_id
+    :param db: AsyncDatabase (collection telegram_files)
+    :param url: URL de l'image (Cloudinary)
+    """
+    photo = await file_ids.get(db, url)
+    if photo != url:
+        try:
+            return await bot.send_photo(chat_id=chat_id, photo=photo, caption=caption, **kwargs)
+        except BadRequest as e:
+            # file_id périmé ou refusé : on repasse par l'URL
+            logger.warning(f"file_id refusé pour {url}: {e}")
+            await file_ids.forget(url)
+    message = await bot.send_photo(chat_id=chat_id, photo=url, caption=caption, **kwargs)
+    await file_ids.remember(url, message)
+    return message
+
+
+async def _send_album(bot, db, chat_id: int, chunk: List[Tuple[str, str]]) -> None:
+    urls = [url for url, _ in chunk]
+    media = [await file_ids.get(db, url) for url in urls]
+    cached = any(m != url for m, url in zip(media, urls))
+    try:
+        messages = await bot.send_media_group(
+            chat_id=chat_id,
+            media=[InputMediaPhoto(media=m, caption=caption[:CAPTION_LIMIT]) for m, (_, caption) in zip(media, chunk)]
+        )
+    except BadRequest as e:
+        if not cached:
+            raise
+        logger.warning(f"file_id refusé dans un album: {e}")
+        for url in urls:
+            await file_ids.forget(url)
+        messages = await bot.send_media_group(
+            chat_id=chat_id,
+            media=[InputMediaPhoto(media=url, caption=caption[:CAPTION_LIMIT]) for url, caption in chunk]
+        )
+    for url, message in zip(urls, messages):
+        await file_ids.remember(url, message)
+
+
+def _chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _text_blocks(texts: List[str]) -> List[str]:
+    """Regroupe les textes en messages de moins de TEXT_LIMIT caractères"""
+    blocks, current = [], ""
+    for text in texts:
+        candidate = f"{current}\n\n{text}" if current else text
+        if len(candidate) > TEXT_LIMIT and current:
+            blocks.append(current)
+            candidate = text
+        current = candidate[:TEXT_LIMIT]
+    if current:
+        blocks.append(current)
+    return blocks
+
+
+async def send_listing(bot, chat_id: int, entries: List[Tuple[Optional[str], str]], db=None) -> int:
+    """
+    Envoie une liste de fiches en albums de 10 photos, les fiches sans photo en un seul bloc de texte
+    :param bot: Instance telegram.Bot
+    :param chat_id: Conversation de destination
+    :param entries: Liste de (url de la photo, légende)
+    :param db: AsyncDatabase pour réutiliser les file_id Telegram (optionnel)
+    :return: Nombre d'appels à l'API Telegram
+    """
+    photos = [(photo, caption) for photo, caption in entries if photo]
+    texts = [caption for photo, caption in entries if not photo]
+    calls = 0
+
+    for chunk in _chunks(photos, MAX_ALBUM_SIZE):
+        if len(chunk) == 1:
+            photo, caption = chunk[0]
+            await send_photo_cached(bot, db, chat_id, photo, caption=caption[:CAPTION_LIMIT])
+        else:
+            await _send_album(bot, db, chat_id, chunk)
+        calls += 1
+
+    for block in _text_blocks(texts):
+        await bot.send_message(chat_id=chat_id, text=block)
+        calls += 1
+    return calls
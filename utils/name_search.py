@@ -0,0 +1,101 @@
+import logging
+from collections import defaultdict
+from typing import Dict, List, Set, Tuple
+
+from utils.names import NAME_KEYS, normalize_name
+
+logger = logging.getLogger(__name__)
+
+# Nombre de suggestions proposées en boutons
+SEARCH_SUGGESTIONS = 5
+# Similarité minimale (Jaccard sur les trigrammes) pour proposer un nom
+MIN_SIMILARITY = 0.2
+
+
+def trigrams(value: str) -> Set[str]:
+    """Trigrammes d'un nom normalisé, avec marqueurs de début et de fin"""
+    padded = f"  {value} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NameIndex:
+    """Index mémoire par trigrammes des pseudos (ou noms de team) pour la recherche approchée"""
+
+    def __init__(self, collection: str, id_field: str):
+        self.collection = collection
+        self.id_field = id_field
+        self.field = NAME_KEYS[collection][0]
+        # trigramme -> identifiants
+        self._postings: Dict[str, Set] = defaultdict(set)
+        # identifiant -> (nom normalisé, nom affiché, nombre de trigrammes)
+        self._names: Dict[object, Tuple[str, str, int]] = {}
+        self.loaded = False
+
+    async def load(self, db) -> None:
+        """Reconstruit l'index depuis la collection"""
+        self._postings = defaultdict(set)
+        self._names = {}
+        async for doc in db[self.collection].find({self.field: {"$type": "string"}}, {self.id_field: 1, self.field: 1}):
+            self.upsert(doc[self.id_field], doc[self.field])
+        self.loaded = True
+        logger.info(f"Index de recherche {self.collection} chargé : {len(self._names)} noms")
+
+    async def ensure_loaded(self, db) -> None:
+        if not self.loaded:
+            await self.load(db)
+
+    def upsert(self, doc_id, name: str) -> None:
+        """Ajoute ou renomme une entrée (inscription, modification de team...)"""
+        self.remove(doc_id)
+        key = normalize_name(name)
+        if not key:
+            return
+        grams = trigrams(key)
+        self._names[doc_id] = (key, name, len(grams))
+        for gram in grams:
+            self._postings[gram].add(doc_id)
+
+    def remove(self, doc_id) -> None:
+        entry = self._names.pop(doc_id, None)
+        if not entry:
+            return
+        for gram in trigrams(entry[0]):
+            ids = self._postings.get(gram)
+            if ids is not None:
+                ids.discard(doc_id)
+                if not ids:
+                    del self._postings[gram]
+
+    def search(self, query: str, limit: int = SEARCH_SUGGESTIONS) -> List[Tuple[object, str]]:
+        """
+        Noms les plus proches de la saisie : correspondance exacte, puis préfixes, puis similarité
+        :return: [(identifiant, nom affiché)] du plus proche au plus lointain
+        """
+        key = normalize_name(query)
+        if not key:
+            return []
+        query_grams = trigrams(key)
+        shared: Dict[object, int] = defaultdict(int)
+        for gram in query_grams:
+            for doc_id in self._postings.get(gram, ()):
+                shared[doc_id] += 1
+
+        scored = []
+        for doc_id, count in shared.items():
+            name_key, name, n_grams = self._names[doc_id]
+            similarity = count / (len(query_grams) + n_grams - count)
+            prefix = name_key.startswith(key)
+            if similarity >= MIN_SIMILARITY or prefix:
+                scored.append((name_key != key, not prefix, -similarity, len(name_key), doc_id, name))
+        scored.sort(key=lambda s: s[:4])
+        return [(doc_id, name) for *_, doc_id, name in scored[:limit]]
+
+
+player_search = NameIndex("players", "telegram_id")
+team_search = NameIndex("teams", "_id")
+
+
+async def load_search_indexes(db) -> None:
+    """Chargement au démarrage (core/bot.py)"""
+    await player_search.load(db)
+    await team_search.load(db)
@@ -0,0 +1,37 @@
+import logging
+
+from pymongo import ASCENDING
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+# Champ normalisé stocké à côté du nom affiché, par collection
+NAME_KEYS = {
+    "players": ("username", "username_lc"),
+    "teams": ("name", "name_lc"),
+}
+
+
+def normalize_name(name: str) -> str:
+    """
+    Clé de recherche exacte d'un pseudo ou d'un nom de team (insensible à la casse)
+    :param name: Saisie brute, éventuellement préfixée par @
+    """
+    return name.strip().lstrip("@").strip().lower()
+
+
+async def ensure_name_indexes(db) -> None:
+    """
+    Crée les index uniques sur username_lc et name_lc (idempotent)
+    Les documents sans clé (pas encore migrés) sont ignorés par l'index partiel.
+    """
+    for collection, (_, key) in NAME_KEYS.items():
+        try:
+            await db[collection].create_index(
+                [(key, ASCENDING)],
+                unique=True,
+                name=f"{key}_unique",
+                partialFilterExpression={key: {"$type": "string"}}
+            )
+        except OperationFailure as e:
+            logger.error(f"Index {key} non créé, lancer migrations.backfill_name_keys : {e}")
@@ -0,0 +1,82 @@
+import os
+import time
+import logging
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PLAYER_CACHE_SIZE = int(os.getenv("PLAYER_CACHE_SIZE", "10000"))
+# Durée de vie d'une entrée (secondes) : filet de sécurité pour les écritures faites hors du bot
+PLAYER_CACHE_TTL = float(os.getenv("PLAYER_CACHE_TTL", "60"))
+# PLAYER_CACHE_ENABLED=0 pour lire Mongo à chaque fois (débogage) ; aussi modifiable avec /playercache
+PLAYER_CACHE_ENABLED = os.getenv("PLAYER_CACHE_ENABLED", "1") not in ("0", "false", "off")
+
+
+class PlayerCache:
+    """Cache LRU + TTL des joueurs par telegram_id, invalidé par chaque écriture du bot"""
+
+    def __init__(self, max_size: int = PLAYER_CACHE_SIZE, ttl: float = PLAYER_CACHE_TTL,
+                 enabled: bool = PLAYER_CACHE_ENABLED):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.enabled = enabled
+        # telegram_id -> (document, expiration), du moins au plus récemment utilisé
+        self._entries: "OrderedDict[int, Tuple[Dict, float]]" = OrderedDict()
+        # Incrémenté à chaque invalidation : une lecture commencée avant n'est pas mise en cache
+        self._epoch = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, telegram_id: int) -> Optional[Dict]:
+        if not self.enabled:
+            return None
+        entry = self._entries.get(telegram_id)
+        if entry and entry[1] > time.monotonic():
+            self._entries.move_to_end(telegram_id)
+            self.hits += 1
+            return entry[0]
+        if entry:
+            del self._entries[telegram_id]
+        self.misses += 1
+        return None
+
+    def token(self) -> int:
+        """À prendre avant la lecture en base, puis à passer à put()"""
+        return self._epoch
+
+    def put(self, telegram_id: int, doc: Dict, token: int) -> None:
+        if not self.enabled or token != self._epoch:
+            return
+        self._entries[telegram_id] = (doc, time.monotonic() + self.ttl)
+        self._entries.move_to_end(telegram_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, telegram_ids: Iterable[int]) -> None:
+        """À appeler après toute écriture sur ces joueurs (inscription, trophées, team, résultats...)"""
+        self._epoch += 1
+        for telegram_id in telegram_ids:
+            self._entries.pop(telegram_id, None)
+
+    def set_enabled(self, enabled: bool) -> None:
+        self.enabled = enabled
+        self._entries.clear()
+        self._epoch += 1
+        logger.info(f"Cache joueurs {'activé' if enabled else 'désactivé'}")
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+player_cache = PlayerCache()
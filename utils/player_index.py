@@ -0,0 +1,142 @@
+import os
+import logging
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from utils.reachability import unreachable_chats
+
+logger = logging.getLogger(__name__)
+
+MODES = ["1v1", "2v2", "3v3"]
+# Nombre de joueurs notifiés par recherche de match
+MATCH_ALERT_LIMIT = int(os.getenv("MATCH_ALERT_LIMIT", "30"))
+# Un joueur sans activité depuis ce nombre de jours n'est plus notifié
+MATCH_ALERT_ACTIVE_DAYS = int(os.getenv("MATCH_ALERT_ACTIVE_DAYS", "30"))
+# Réception des invitations : "instant" (un message par recherche) ou "digest" (résumé groupé)
+MATCH_DELIVERY_DEFAULT = os.getenv("MATCH_DELIVERY_DEFAULT", "instant")
+
+
+class TrophyIndex:
+    """Index mémoire des joueurs notifiables, trié par trophées et réparti par mode préféré"""
+
+    PROJECTION = {"_id": 0, "telegram_id": 1, "trophies": 1, "match_alerts": 1, "match_delivery": 1, "last_active": 1}
+
+    def __init__(self):
+        # mode -> liste triée de (trophées, telegram_id)
+        self._by_mode: Dict[str, List[Tuple[int, int]]] = {mode: [] for mode in MODES}
+        # telegram_id -> (trophées, modes, last_active)
+        self._entries: Dict[int, Tuple[int, Tuple[str, ...], Optional[datetime]]] = {}
+        # Joueurs ayant choisi le résumé groupé
+        self._digest: Set[int] = set()
+        self.loaded = False
+
+    async def load(self, db) -> None:
+        """Reconstruit l'index depuis la collection players"""
+        players = await db.players.find({}, self.PROJECTION).to_list()
+        self._by_mode = {mode: [] for mode in MODES}
+        self._entries = {}
+        self._digest = set()
+        for player in players:
+            self._add(player)
+        for entries in self._by_mode.values():
+            entries.sort()
+        self.loaded = True
+        logger.info(f"Index de matchmaking chargé : {len(self._entries)} joueurs")
+
+    async def ensure_loaded(self, db) -> None:
+        if not self.loaded:
+            await self.load(db)
+
+    def _add(self, player: Dict) -> None:
+        telegram_id = player["telegram_id"]
+        trophies = int(player.get("trophies") or 0)
+        # Sans préférence enregistrée, le joueur est abonné à tous les modes
+        modes = tuple(player.get("match_alerts", MODES))
+        self._entries[telegram_id] = (trophies, modes, player.get("last_active"))
+        if player.get("match_delivery", MATCH_DELIVERY_DEFAULT) == "digest":
+            self._digest.add(telegram_id)
+        for mode in modes:
+            if mode in self._by_mode:
+                self._by_mode[mode].append((trophies, telegram_id))
+
+    def remove(self, telegram_id: int) -> None:
+        entry = self._entries.pop(telegram_id, None)
+        self._digest.discard(telegram_id)
+        if not entry:
+            return
+        trophies, modes, _ = entry
+        for mode in modes:
+            entries = self._by_mode.get(mode)
+            if entries is None:
+                continue
+            i = bisect_left(entries, (trophies, telegram_id))
+            if i < len(entries) and entries[i] == (trophies, telegram_id):
+                del entries[i]
+
+    def upsert(self, player: Dict) -> None:
+        """
+        Met à jour un joueur ; les champs absents conservent leur valeur indexée
+        :param player: Document (partiel) contenant au moins telegram_id
+        """
+        telegram_id = player["telegram_id"]
+        previous = self._entries.get(telegram_id)
+        if previous:
+            merged = {
+                "telegram_id": telegram_id,
+                "trophies": previous[0],
+                "match_alerts": list(previous[1]),
+                "last_active": previous[2],
+                "match_delivery": "digest" if telegram_id in self._digest else "instant",
+            }
+            merged.update(player)
+            player = merged
+        self.remove(telegram_id)
+        trophies = int(player.get("trophies") or 0)
+        modes = tuple(player.get("match_alerts", MODES))
+        self._entries[telegram_id] = (trophies, modes, player.get("last_active"))
+        if player.get("match_delivery", MATCH_DELIVERY_DEFAULT) == "digest":
+            self._digest.add(telegram_id)
+        for mode in modes:
+            if mode in self._by_mode:
+                insort(self._by_mode[mode], (trophies, telegram_id))
+
+    def _is_active(self, telegram_id: int, since: datetime) -> bool:
+        last_active = self._entries[telegram_id][2]
+        return last_active is None or last_active >= since
+
+    def nearest(self, mode: str, trophies: int, limit: int = MATCH_ALERT_LIMIT,
+                exclude: Iterable[int] = ()) -> List[int]:
+        """
+        Retourne les telegram_id des `limit` joueurs actifs abonnés au mode les plus proches en trophées
+        :param mode: Mode de jeu (1v1, 2v2, 3v3)
+        :param trophies: Trophées du joueur qui cherche un match
+        :param exclude: IDs à ignorer (le créateur du match)
+        """
+        entries = self._by_mode.get(mode, [])
+        excluded = set(exclude)
+        since = datetime.utcnow() - timedelta(days=MATCH_ALERT_ACTIVE_DAYS)
+        hi = bisect_left(entries, (trophies, 0))
+        lo = hi - 1
+        selected = []
+        # Parcours en éventail autour de la position du joueur
+        while len(selected) < limit and (lo >= 0 or hi < len(entries)):
+            if hi >= len(entries) or (lo >= 0 and trophies - entries[lo][0] <= entries[hi][0] - trophies):
+                candidate = entries[lo][1]
+                lo -= 1
+            else:
+                candidate = entries[hi][1]
+                hi += 1
+            if candidate not in excluded and candidate not in unreachable_chats and self._is_active(candidate, since):
+                selected.append(candidate)
+        return selected
+
+    def wants_digest(self, telegram_id: int) -> bool:
+        return telegram_id in self._digest
+
+    def modes_for(self, telegram_id: int) -> List[str]:
+        entry = self._entries.get(telegram_id)
+        return list(entry[1]) if entry else list(MODES)
+
+
+player_index = TrophyIndex()
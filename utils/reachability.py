@@ -0,0 +1,56 @@
+import logging
+from typing import Optional, Set
+
+from telegram.error import BadRequest, Forbidden
+
+logger = logging.getLogger(__name__)
+
+# À ajouter à toute requête d'envoi groupé sur la collection players
+REACHABLE_FILTER = {"reachable": {"$ne": False}}
+
+
+def is_unreachable_error(error: Exception) -> bool:
+    """Vrai si l'erreur Telegram signifie que le joueur ne peut plus recevoir de message du bot"""
+    if isinstance(error, Forbidden):
+        return True
+    return isinstance(error, BadRequest) and "chat not found" in str(error).lower()
+
+
+class UnreachableRegistry:
+    """Joueurs ayant bloqué le bot, en mémoire et dans le champ `reachable` des joueurs"""
+
+    def __init__(self):
+        self._chat_ids: Set[int] = set()
+        self._players = None
+
+    def attach(self, players_collection) -> None:
+        """
+        Charge les joueurs injoignables et branche la collection pour les mises à jour
+        :param players_collection: AsyncCollection players (chargement synchrone, au démarrage uniquement)
+        """
+        self._players = players_collection
+        self._chat_ids = {
+            p["telegram_id"] for p in players_collection.sync.find({"reachable": False}, {"telegram_id": 1})
+        }
+        logger.info(f"{len(self._chat_ids)} joueur(s) injoignable(s) chargé(s)")
+
+    def __contains__(self, chat_id: Optional[int]) -> bool:
+        return chat_id in self._chat_ids
+
+    async def mark_unreachable(self, chat_id: int) -> None:
+        if chat_id in self._chat_ids:
+            return
+        self._chat_ids.add(chat_id)
+        if self._players is not None:
+            await self._players.update_one({"telegram_id": chat_id}, {"$set": {"reachable": False}})
+
+    async def mark_reachable(self, chat_id: int) -> None:
+        """Appelé quand le joueur écrit de nouveau au bot"""
+        if chat_id not in self._chat_ids:
+            return
+        self._chat_ids.discard(chat_id)
+        if self._players is not None:
+            await self._players.update_one({"telegram_id": chat_id}, {"$unset": {"reachable": ""}})
+
+
+unreachable_chats = UnreachableRegistry()
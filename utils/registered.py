@@ -0,0 +1,38 @@
+import logging
+from typing import Set
+
+logger = logging.getLogger(__name__)
+
+
+class RegisteredPlayers:
+    """
+    telegram_id des joueurs inscrits, en mémoire : un non-inscrit qui envoie /findmatch ou /profile
+    est renvoyé vers /register sans requête Mongo. Un ensemble Python coûte environ 60 octets
+    par joueur ; au-delà de quelques millions d'inscrits, un filtre de Bloom prendra le relais.
+    """
+
+    def __init__(self):
+        self._ids: Set[int] = set()
+        self.loaded = False
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    async def load(self, db) -> None:
+        """Chargement au démarrage (core/bot.py)"""
+        self._ids = {p["telegram_id"] async for p in db.players.find({}, {"_id": 0, "telegram_id": 1})}
+        self.loaded = True
+        logger.info(f"Joueurs inscrits chargés : {len(self._ids)}")
+
+    def add(self, telegram_id: int) -> None:
+        self._ids.add(telegram_id)
+
+    def discard(self, telegram_id: int) -> None:
+        self._ids.discard(telegram_id)
+
+    def surely_absent(self, telegram_id: int) -> bool:
+        """True si le joueur n'est certainement pas inscrit ; False = à vérifier en base"""
+        return self.loaded and telegram_id not in self._ids
+
+
+registered_players = RegisteredPlayers()
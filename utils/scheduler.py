@@ -0,0 +1,93 @@
+import os
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Dict
+
+from bson import ObjectId
+
+from utils.digest import match_digest
+from utils.matcher import match_queue
+
+logger = logging.getLogger(__name__)
+
+# Durées de vie des salons non aboutis (secondes)
+MATCH_GAMEROOM_TTL = int(os.getenv("MATCH_GAMEROOM_TTL", "300"))
+MATCH_SEARCH_TTL = int(os.getenv("MATCH_SEARCH_TTL", "1800"))
+FREINDLY_LOBBY_TTL = int(os.getenv("FREINDLY_LOBBY_TTL", "7200"))
+MATCH_RESULT_TTL = int(os.getenv("MATCH_RESULT_TTL", "86400"))
+# Fréquence du nettoyage et taille des lots supprimés
+SWEEP_INTERVAL = float(os.getenv("SWEEP_INTERVAL", "60"))
+SWEEP_BATCH_SIZE = 500
+
+# Statuts encore ouverts (les matchs prêts ou terminés sont conservés pour /news et les stats)
+OPEN_MATCH_STATUSES = ["waiting_gameroom", "searching"]
+OPEN_FREINDLY_STATUSES = ["waiting", "waiting_all", "waiting_voice", "voice_ready", "waiting_brawl_link"]
+
+
+def expiry_time(ttl: int) -> datetime:
+    """Valeur de expires_at pour un document créé ou relancé maintenant"""
+    return datetime.utcnow() + timedelta(seconds=ttl)
+
+
+class ExpirySweeper:
+    """Supprime périodiquement les salons et résultats abandonnés, selon leur statut"""
+
+    def __init__(self, db, interval: float = SWEEP_INTERVAL):
+        self.db = db
+        self.interval = interval
+
+    def _rules(self, now: datetime):
+        # (collection, filtre des documents expirés) ; l'_id ObjectId donne la date de création
+        return [
+            ("matches", {"status": {"$in": OPEN_MATCH_STATUSES}, "expires_at": {"$lte": now}}),
+            ("freindly_matches", {
+                "status": {"$in": OPEN_FREINDLY_STATUSES},
+                "_id": {"$lte": ObjectId.from_datetime(now - timedelta(seconds=FREINDLY_LOBBY_TTL))}
+            }),
+            ("match_results", {
+                "screenshot": {"$exists": False},
+                "_id": {"$lte": ObjectId.from_datetime(now - timedelta(seconds=MATCH_RESULT_TTL))}
+            }),
+        ]
+
+    async def ensure_indexes(self) -> None:
+        await self.db.matches.create_index([("status", 1), ("expires_at", 1)], name="status_expires_at")
+        await self.db.freindly_matches.create_index([("status", 1), ("_id", 1)], name="status_id")
+        await self.db.match_results.create_index([("screenshot", 1), ("_id", 1)], name="screenshot_id")
+
+    async def sweep(self) -> Dict[str, int]:
+        """Un passage de nettoyage ; retourne le nombre de documents supprimés par collection"""
+        removed = {}
+        for collection, query in self._rules(datetime.utcnow()):
+            removed[collection] = 0
+            while True:
+                ids = [doc["_id"] async for doc in self.db[collection].find(query, {"_id": 1}).limit(SWEEP_BATCH_SIZE)]
+                if not ids:
+                    break
+                # Le filtre est réappliqué : un salon rejoint entre-temps n'est pas supprimé
+                result = await self.db[collection].delete_many({**query, "_id": {"$in": ids}})
+                removed[collection] += result.deleted_count
+                if collection == "matches":
+                    match_digest.discard(str(_id) for _id in ids)
+                    match_queue.discard(str(_id) for _id in ids)
+                if len(ids) < SWEEP_BATCH_SIZE:
+                    break
+        return removed
+
+    async def run(self) -> None:
+        await self.ensure_indexes()
+        while True:
+            try:
+                removed = await self.sweep()
+                level = logging.INFO if any(removed.values()) else logging.DEBUG
+                logger.log(level, "Nettoyage des salons expirés : " + ", ".join(f"{c}={n}" for c, n in removed.items()))
+            except Exception as e:
+                logger.error(f"Erreur nettoyage des salons expirés: {e}", exc_info=True)
+            await asyncio.sleep(self.interval)
+
+
+def start_expiry_sweeper(application, db) -> ExpirySweeper:
+    sweeper = ExpirySweeper(db)
+    application.create_task(sweeper.run())
+    return sweeper
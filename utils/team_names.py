@@ -0,0 +1,72 @@
+import os
+import time
+import logging
+from typing import Dict, Iterable, Optional, Tuple
+
+from bson import ObjectId
+
+logger = logging.getLogger(__name__)
+
+# Durée de vie d'un nom en cache (secondes) ; un renommage invalide l'entrée immédiatement
+TEAM_NAME_TTL = float(os.getenv("TEAM_NAME_TTL", "600"))
+TEAM_NAME_CACHE_SIZE = 5000
+
+
+class TeamNameCache:
+    """Noms de team par _id : les absents du cache sont résolus en une seule requête $in"""
+
+    def __init__(self, ttl: float = TEAM_NAME_TTL, max_size: int = TEAM_NAME_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        # _id -> (nom, expiration)
+        self._names: Dict[ObjectId, Tuple[Optional[str], float]] = {}
+
+    async def resolve(self, db, team_ids: Iterable) -> Dict[ObjectId, str]:
+        """
+        Résout les noms d'un lot de teams
+        :param team_ids: ObjectId (ou chaînes) ; les valeurs vides sont ignorées
+        :return: {ObjectId: nom} pour les teams existantes
+        """
+        now = time.monotonic()
+        names, missing = {}, set()
+        for team_id in team_ids:
+            if not team_id:
+                continue
+            team_id = ObjectId(team_id)
+            entry = self._names.get(team_id)
+            if entry and entry[1] > now:
+                if entry[0] is not None:
+                    names[team_id] = entry[0]
+            else:
+                missing.add(team_id)
+        if not missing:
+            return names
+
+        found = {
+            team["_id"]: team.get("name")
+            async for team in db.teams.find({"_id": {"$in": list(missing)}}, {"name": 1})
+        }
+        if len(self._names) + len(missing) > self.max_size:
+            self._names.clear()
+        for team_id in missing:
+            # Les teams supprimées sont aussi mises en cache pour ne pas être redemandées
+            self._names[team_id] = (found.get(team_id), now + self.ttl)
+            if found.get(team_id) is not None:
+                names[team_id] = found[team_id]
+        return names
+
+    async def name_of(self, db, team_id) -> Optional[str]:
+        if not team_id:
+            return None
+        return (await self.resolve(db, [team_id])).get(ObjectId(team_id))
+
+    async def for_players(self, db, players: Iterable[Dict]) -> Dict[ObjectId, str]:
+        """Noms des teams d'une page de joueurs (champ team_id)"""
+        return await self.resolve(db, (p.get("team_id") for p in players))
+
+    def invalidate(self, team_id) -> None:
+        """À appeler après un renommage ou une suppression de team"""
+        self._names.pop(ObjectId(team_id), None)
+
+
+team_names = TeamNameCache()
@@ -0,0 +1,135 @@
+import os
+import time
+import logging
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from bson import ObjectId
+
+from utils.team_names import team_names
+
+logger = logging.getLogger(__name__)
+
+# Durée de vie d'un instantané (secondes) ; toute écriture sur la team ou un membre l'invalide avant
+TEAM_SNAPSHOT_TTL = float(os.getenv("TEAM_SNAPSHOT_TTL", "600"))
+TEAM_SNAPSHOT_CACHE_SIZE = 2000
+
+# Champs d'un instantané : la team et le résumé dénormalisé de ses membres (teams.members)
+SNAPSHOT_PROJECTION = {
+    "name": 1, "country": 1, "logo_url": 1, "creator_id": 1, "member_ids": 1, "members": 1, "version": 1
+}
+MEMBER_PROJECTION = {"_id": 0, "telegram_id": 1, "username": 1, "trophies": 1}
+
+
+def member_summaries(players: Iterable[Dict], member_ids: List[int]) -> List[Dict]:
+    """Résumé des membres dans l'ordre de member_ids (joueurs supprimés ignorés)"""
+    by_id = {p["telegram_id"]: p for p in players}
+    return [
+        {"telegram_id": tid, "username": by_id[tid].get("username"), "trophies": by_id[tid].get("trophies", 0)}
+        for tid in member_ids if tid in by_id
+    ]
+
+
+class TeamSnapshots:
+    """
+    Instantanés de team (nom, pays, logo, membres avec pseudo et trophées) par _id.
+    Le résumé des membres est stocké dans le document team (champ members) : un instantané absent
+    du cache se lit en une seule requête ; les teams créées avant ce champ sont complétées à la volée.
+    Comme pour utils/formatters.ProfileCards, chaque team a un numéro de version incrémenté par
+    invalidate() : une lecture commencée avant une écriture n'est pas mise en cache.
+    """
+
+    def __init__(self, ttl: float = TEAM_SNAPSHOT_TTL, max_size: int = TEAM_SNAPSHOT_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        # _id -> (instantané, expiration), du moins au plus récemment utilisé
+        self._snapshots: "OrderedDict[ObjectId, Tuple[Dict, float]]" = OrderedDict()
+        # _id -> version ; jamais remise à zéro, sinon une lecture en cours pourrait la retrouver
+        self._versions: Dict[ObjectId, int] = {}
+
+    def version(self, team_id: ObjectId) -> int:
+        return self._versions.get(team_id, 0)
+
+    def _put(self, team_id: ObjectId, snapshot: Dict, version: int, now: float) -> None:
+        if version != self.version(team_id):
+            return
+        self._snapshots[team_id] = (snapshot, now + self.ttl)
+        self._snapshots.move_to_end(team_id)
+        while len(self._snapshots) > self.max_size:
+            self._snapshots.popitem(last=False)
+
+    async def get_many(self, db, team_ids: Iterable) -> Dict[ObjectId, Dict]:
+        """
+        Instantanés d'un lot de teams, les absents du cache en une seule requête $in
+        :return: {ObjectId: instantané} pour les teams existantes
+        """
+        now = time.monotonic()
+        snapshots, versions = {}, {}
+        for team_id in team_ids:
+            if not team_id:
+                continue
+            team_id = ObjectId(team_id)
+            entry = self._snapshots.get(team_id)
+            if entry and entry[1] > now:
+                self._snapshots.move_to_end(team_id)
+                snapshots[team_id] = entry[0]
+            else:
+                # Version prise avant la lecture en base
+                versions[team_id] = self.version(team_id)
+        if not versions:
+            return snapshots
+
+        teams = await db.teams.find({"_id": {"$in": list(versions)}}, SNAPSHOT_PROJECTION).to_list()
+        await self._backfill_members(db, [t for t in teams if "members" not in t])
+        for team in teams:
+            self._put(team["_id"], team, versions[team["_id"]], now)
+            snapshots[team["_id"]] = team
+        return snapshots
+
+    async def get(self, db, team_id) -> Optional[Dict]:
+        if not team_id:
+            return None
+        return (await self.get_many(db, [team_id])).get(ObjectId(team_id))
+
+    async def _backfill_members(self, db, teams: List[Dict]) -> None:
+        """Complète (et enregistre) le résumé des membres des anciennes teams"""
+        if not teams:
+            return
+        member_ids = [tid for team in teams for tid in team.get("member_ids", [])]
+        players = await db.players.find({"telegram_id": {"$in": member_ids}}, MEMBER_PROJECTION).to_list()
+        for team in teams:
+            team["members"] = member_summaries(players, team.get("member_ids", []))
+            # Gardé par $exists : n'écrase pas un résumé écrit entre-temps par models/teams.py
+            await db.teams.update_one(
+                {"_id": team["_id"], "members": {"$exists": False}},
+                {"$set": {"members": team["members"]}}
+            )
+
+    def invalidate(self, team_id) -> None:
+        """À appeler après toute écriture sur la team ou le pseudo/les trophées d'un membre"""
+        if team_id:
+            team_id = ObjectId(team_id)
+            self._versions[team_id] = self.version(team_id) + 1
+            self._snapshots.pop(team_id, None)
+            team_names.invalidate(team_id)
+
+
+team_snapshots = TeamSnapshots()
+
+
+async def refresh_member(db, telegram_id: int, **fields) -> None:
+    """
+    Reporte un nouveau pseudo ou de nouveaux trophées dans le résumé de la team du joueur
+    :param fields: username et/ou trophies
+    """
+    changes = {f"members.$[m].{field}": value for field, value in fields.items() if field in ("username", "trophies")}
+    if not changes:
+        return
+    team = await db.teams.find_one_and_update(
+        {"member_ids": telegram_id, "members": {"$exists": True}},
+        {"$set": changes},
+        array_filters=[{"m.telegram_id": telegram_id}],
+        projection={"_id": 1}
+    )
+    if team:
+        team_snapshots.invalidate(team["_id"])